@@ -1,12 +1,34 @@
 import os
 import json
 import time
+import gzip
+import zlib
+import queue
+import calendar
+import hashlib
+import threading
 import logging
 from datetime import date, datetime, timedelta
-from flask import Flask, render_template, request, Response, stream_with_context, session, redirect, url_for
+from flask import Flask, render_template, request, Response, stream_with_context, session, redirect, url_for, jsonify, make_response, g, has_request_context
 from dotenv import load_dotenv
+import db
 from db import get_connection
+from executor import Stage, run_stages, ConnectionUnavailable
+from cache import cached_query, query_cache, KeyedMemo, CACHE_TTL_LIVE
+import rollup
+import phone_index
+import poller
+import liveday
+import prewarm
+import metrics
+import querylog
+import tzbucket
+import export
+import assets
+import click
 from collections import defaultdict
+from jinja2.utils import htmlsafe_json_dumps
+from functools import wraps
 
 load_dotenv()
 
@@ -17,6 +39,7 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "change-me-in-production")
 GROUP_ID = int(os.environ.get("LIP_GROUP_ID", 56))
 DASHBOARD_PASSWORD = os.environ.get("DASHBOARD_PASSWORD", "")
+QUERY_CONCURRENCY = int(os.environ.get("QUERY_CONCURRENCY", 3))  # capped at db.POOL_SIZE
 
 # Stamp changes every time the password is updated and the app restarts,
 # invalidating all sessions created with a previous password.
@@ -80,17 +103,153 @@ def post_settings():
     save_settings(data)
     return jsonify({"ok": True})
 
-SHOW_USER_IDS = {181, 182, 183, 152, 53}
+@app.route("/api/cache", methods=["GET"])
+@login_required
+def get_cache_stats():
+    from flask import jsonify
+    return jsonify({**query_cache.stats(), "lead_actions": _lead_actions.stats()})
+
+@app.route("/api/pool", methods=["GET"])
+@login_required
+def get_pool_stats():
+    """This worker's connection pool: open/active/idle/waiting and checkout wait times."""
+    return jsonify(db.pool_stats() or {})
+
+@app.route("/api/queries", methods=["GET"])
+@login_required
+def get_query_stats():
+    """This worker's statements by total time, with the EXPLAIN flags of slow ones."""
+    limit = request.args.get("limit", 50, type=int)
+    return jsonify({"since": querylog.QUERY_LOG.since, "slow_query_ms": querylog.SLOW_QUERY_MS,
+                    "pid": os.getpid(), "statements": querylog.QUERY_LOG.top(limit)})
+
+@app.route("/api/queries/reset", methods=["POST"])
+@login_required
+def post_query_stats_reset():
+    querylog.QUERY_LOG.reset()
+    return jsonify({"ok": True})
+
+@app.route("/debug/queries")
+@login_required
+def debug_queries():
+    """Worst statements by total time; each gunicorn worker keeps its own log."""
+    limit = request.args.get("limit", 50, type=int)
+    return render_template("debug_queries.html", statements=querylog.QUERY_LOG.top(limit),
+                           since=datetime.fromtimestamp(querylog.QUERY_LOG.since),
+                           slow_query_ms=querylog.SLOW_QUERY_MS, pid=os.getpid())
+
+@app.route("/api/cache/invalidate", methods=["POST"])
+@login_required
+def post_cache_invalidate():
+    from flask import jsonify
+    data = request.get_json(silent=True) or {}
+    removed = query_cache.invalidate(data.get("fn"))
+    if not data.get("fn"):
+        with _lead_actions.lock:
+            _lead_actions.clear()
+    return jsonify({"ok": True, "removed": removed})
+
+# ── Request metrics (Server-Timing header + Prometheus /metrics) ─────────────
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")   # bearer token for scrapers; else login required
+
+@app.before_request
+def _start_request_timer():
+    g.request_t0 = time.monotonic()
+
+@app.after_request
+def _record_request(resp):
+    """Server-Timing from the stages this request ran; request duration and bytes for /metrics.
+
+    Registered before the compression hook, so it runs after it and sees wire bytes.
+    """
+    total = time.monotonic() - g.get("request_t0", time.monotonic())
+    resp.headers["Server-Timing"] = metrics.server_timing(g.get("stage_timings", []), total * 1000)
+    if not resp.is_streamed:
+        endpoint = request.endpoint or "unknown"
+        metrics.REGISTRY.observe("lip_request_duration_seconds", total,
+                                 endpoint=endpoint, status=str(resp.status_code))
+        if not resp.direct_passthrough:
+            metrics.REGISTRY.inc("lip_response_bytes_total", len(resp.get_data()), endpoint=endpoint)
+    return resp
+
+def _metrics_gauges():
+    cache, memo, pool = query_cache.stats(), _lead_actions.stats(), db.pool_stats()
+    pool_gauges = [] if pool is None else [
+        ("lip_db_pool_connections", "gauge", "Pooled connections by state", pool[state], {"state": state})
+        for state in ("active", "idle", "waiting")
+    ] + [
+        ("lip_db_pool_timeouts_total", "counter", "Checkouts that gave up waiting", pool["timeouts"], {}),
+        ("lip_db_pool_recycled_total", "counter", "Connections replaced for age", pool["recycled"], {}),
+        ("lip_db_pool_invalidated_total", "counter", "Dead connections discarded on checkout", pool["invalidated"], {}),
+    ]
+    return pool_gauges + [
+        ("lip_query_cache_hits_total", "counter", "Query cache hits", cache["hits"], {}),
+        ("lip_query_cache_misses_total", "counter", "Query cache misses", cache["misses"], {}),
+        ("lip_query_cache_evictions_total", "counter", "Query cache LRU evictions", cache["evictions"], {}),
+        ("lip_query_cache_entries", "gauge", "Query cache entries", cache["size"], {}),
+        ("lip_lead_memo_hits_total", "counter", "Lead action memo hits", memo["hits"], {}),
+        ("lip_lead_memo_misses_total", "counter", "Lead action memo misses", memo["misses"], {}),
+        ("lip_lead_memo_entries", "gauge", "Lead action memo entries", memo["size"], {}),
+    ]
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text format for this worker (series carry a ``pid`` label)."""
+    def render():
+        return Response(metrics.REGISTRY.render(_metrics_gauges()), mimetype="text/plain; version=0.0.4")
+    if METRICS_TOKEN and request.headers.get("Authorization") == f"Bearer {METRICS_TOKEN}":
+        return render()
+    return login_required(render)()
+
 MIN_DATE = "2025-01-01"
-TZ_OFFSET = "+11:00"   # AEDT — single place to change if needed
 CONTACT_THRESHOLD_US = 45_000_000  # 45 seconds in microseconds
-_USER_IDS_SQL = ",".join(str(u) for u in sorted(SHOW_USER_IDS))
 
 CRM_BASE_URL = "https://crm.slife.com.au"
 REMED_TYPE_IDS_SQL = "138,139,140,141,142,143,144,145,162,163,164,165,189,197"
 
-AVATAR_COLORS = {181:"#6366f1",182:"#ec4899",152:"#f59e0b",183:"#10b981",53:"#3b82f6"}
-AVATAR_FILES  = {181:"Nataniel.jpeg",182:"Sam.jpeg",152:"Rebel.jpeg",183:"Gary.jpeg",53:""}
+# ── Adviser groups ───────────────────────────────────────────────────────────
+# Advisers are the members of an account_usergroup_users group, not a fixed
+# list.  LIP_GROUP_ID is shown by default; LIP_GROUP_IDS lists every group that
+# ?group= may pick ("56:LIP,60:Sales") and that the rollup store, live day and
+# pre-warmer cover.  Queries never embed member ids: they semi-join
+# account_usergroup_users on its (usergroup_id, user_id) key, so a statement and
+# its plan are the same for five advisers or five hundred, and every cached
+# result is keyed by its group.
+def _parse_groups(raw, default):
+    groups = {default: f"Group {default}"}
+    for part in raw.split(","):
+        gid, _, label = part.partition(":")
+        if gid.strip():
+            groups[int(gid)] = label.strip() or f"Group {int(gid)}"
+    return groups
+
+GROUPS    = _parse_groups(os.environ.get("LIP_GROUP_IDS", ""), GROUP_ID)   # {group id: label}
+GROUP_IDS = tuple(GROUPS)
+# Group members who are not consultants: left out of the default adviser
+# selection, and their leads count as unassigned
+NON_CONSULTANT_IDS = {int(u) for u in os.environ.get("LIP_NON_CONSULTANT_IDS", "53").split(",") if u.strip()}
+
+def _in_groups(col, *group_ids):
+    """``col IN (members of group_ids)``, as a semi-join on account_usergroup_users."""
+    ids = ",".join(str(int(g)) for g in sorted(set(group_ids)))
+    return f"{col} IN (SELECT ugm.user_id FROM account_usergroup_users ugm WHERE ugm.usergroup_id IN ({ids}))"
+
+# Colours and photos for the original team; anyone else gets a palette colour
+# by id and static/avatars/<user_id>.jpeg (or .png) when it exists.  Photos
+# are served as hashed, immutable thumbnails (assets.py).
+AVATAR_COLORS  = {181:"#6366f1",182:"#ec4899",152:"#f59e0b",183:"#10b981",53:"#3b82f6"}
+AVATAR_PALETTE = ("#6366f1","#ec4899","#f59e0b","#10b981","#3b82f6",
+                  "#8b5cf6","#14b8a6","#ef4444","#0ea5e9","#84cc16")
+ASSETS = assets.Manifest()
+
+def _avatar_files():
+    """{user_id: {"url", "srcset", "webp_srcset"}} for every adviser photo."""
+    names = assets.avatar_sources()
+    by_id = {int(os.path.splitext(n)[0]): n for n in names if os.path.splitext(n)[0].isdigit()}
+    named = {181:"Nataniel.jpeg", 182:"Sam.jpeg", 152:"Rebel.jpeg", 183:"Gary.jpeg"}
+    return {uid: assets.avatar(ASSETS, name) for uid, name in {**by_id, **named}.items() if name in names}
+
+AVATAR_FILES = _avatar_files()
 
 # Exclude test / dummy leads from all analytics — applied to every leads_lead query
 # Uses the table alias expected by each query (l. or bare leads_lead.)
@@ -101,17 +260,20 @@ EXCL_TEST_BARE = _EXCL_TEST.format(pfx="")           # for queries using bare ta
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
 def _utc_range(start, end):
-    """Convert local date range to UTC datetime range for index-friendly WHERE clauses.
+    """Convert local date range to UTC datetime literals for index-friendly WHERE clauses.
 
     Instead of  DATE(CONVERT_TZ(col,'+00:00','+11:00')) BETWEEN start AND end
     which wraps the column in functions and prevents index usage, we convert the
-    boundaries once:  col >= utc_start AND col < utc_end_exclusive
+    boundaries once (with the zone's DST rules, see tzbucket.py):
+    col >= utc_start AND col < utc_end_exclusive
     """
-    utc_start = f"CONVERT_TZ('{start.isoformat()}','{TZ_OFFSET}','+00:00')"
-    # end+1 day exclusive so we cover the full last day
-    end_excl  = (end + timedelta(days=1)).isoformat()
-    utc_end   = f"CONVERT_TZ('{end_excl}','{TZ_OFFSET}','+00:00')"
-    return utc_start, utc_end
+    return tuple(f"'{b:%Y-%m-%d %H:%M:%S}'" for b in tzbucket.utc_bounds(start, end))
+
+def _stage_timer(start=None, end=None):
+    """Timer for run_stages: logs like _timed, feeds /metrics and, inside a
+    request, that request's Server-Timing header."""
+    sink = g.setdefault("stage_timings", []) if has_request_context() else None
+    return metrics.StageTimer(metrics.range_bucket(start, end), sink)
 
 def _timed(label, fn, *args, **kwargs):
     """Run fn, log elapsed time, return result."""
@@ -154,55 +316,440 @@ def color_inforce(monthly):
     if monthly>=15000: return "orange"
     return "red"
 
-def get_advisers(cursor):
+# ── Call-record aggregation engine ───────────────────────────────────────────
+# noojee_callrecord is by far the largest table.  Every call metric on the
+# dashboard is derived from one pass per range over the raw (adviser, created,
+# duration) rows, bucketed into local days or hours in Python (tzbucket.py):
+#   talk_secs  = SUM(duration) of calls > 10s
+#   contacted  = COUNT of calls >= 45s
+#   no_contact = COUNT of calls <  45s
+_TALK_MIN_US = 10_000_000
+
+def _windows_filter(col, bounds):
+    """``(col >= %s AND col < %s OR …)`` over [lo, hi) bounds, and its params."""
+    sql = " OR ".join(f"({col} >= %s AND {col} < %s)" for _ in bounds)
+    return f"({sql})", tuple(b for pair in bounds for b in pair)
+
+def _window_index(value, bounds):
+    """Index of the [lo, hi) bound containing ``value``, or None."""
+    for i, (lo, hi) in enumerate(bounds):
+        if lo <= value < hi:
+            return i
+    return None
+
+def _local_bounds(windows):
+    """[lo, hi) ISO-date bounds of local (start, end) day windows, for local-time columns."""
+    return [(s.isoformat(), (e + timedelta(days=1)).isoformat()) for s, e in windows]
+
+def _scan_calls(cursor, start, end, bucket, groups, windows=None):
+    """Single pass over Hungup calls in the local range, grouped by adviser and bucket.
+
+    Returns ({user_id: {bucket_key: {"talk_secs","contacted","no_contact"}}}, max_created)
+    where bucket_key is the ISO day ("day") or int hour ("hour"), for members
+    of the ``groups`` ids.  ``windows`` limits the scan to those (start, end)
+    day ranges within start..end.
+    """
+    buckets = tzbucket.Buckets(start, end, bucket)
+    where, params = _windows_filter("ncr.created", [tzbucket.utc_bounds(s, e) for s, e in windows]
+                                    if windows else [buckets.bounds])
+    cursor.execute(f"""
+        SELECT up.user_id, ncr.created, ncr.duration
+        FROM noojee_callrecord ncr
+        JOIN account_userprofile up ON up.extension = ncr.extension
+        WHERE {_in_groups("up.user_id", *groups)}
+          AND ncr.status = 'Hungup'
+          AND {where}
+    """, params)
+    locate = buckets.locate
+    aggs, wm = defaultdict(dict), None
+    for r in tzbucket.stream(cursor):
+        created, dur = r["created"], r["duration"]
+        by_key = aggs[r["user_id"]]
+        key = locate(created)
+        b = by_key.get(key)
+        if b is None:
+            b = by_key[key] = {"talk_secs": 0, "contacted": 0, "no_contact": 0}
+        if dur is not None:
+            if dur > _TALK_MIN_US:
+                b["talk_secs"] += dur
+            if dur >= CONTACT_THRESHOLD_US:
+                b["contacted"] += 1
+            else:
+                b["no_contact"] += 1
+        if wm is None or created > wm:
+            wm = created
+    for by_key in aggs.values():
+        for b in by_key.values():
+            b["talk_secs"] = b["talk_secs"] / 1_000_000
+    return dict(aggs), wm
+
+def _scan_quotes(cursor, start, end, bucket, groups):
+    """Latest sent quote per adviser and lead for each local day, bucketed by "day" or "hour".
+
+    Returns ({(user_id, bucket_key): {"quotes","quotes_value"}}, max_created).
+    Quotes tied on the latest time all count, as with the old self-join.
+    """
+    days = tzbucket.Buckets(start, end, "day")
+    keyed = days if bucket == "day" else tzbucket.Buckets(start, end, bucket)
+    latest, wm = _latest_quotes(cursor, [days.bounds], days.locate, groups)
+    out = {}
+    for (uid, _, _), (created, n, value) in latest.items():
+        b = out.setdefault((uid, keyed.locate(created)), {"quotes": 0, "quotes_value": 0.0})
+        b["quotes"] += n
+        b["quotes_value"] += value
+    return out, wm
+
+def _latest_quotes(cursor, bounds, key, groups):
+    """Stream sent quotes within the UTC ``bounds`` by members of ``groups``; keep the latest per adviser, lead and ``key(created)``.
+
+    Returns ({(user_id, lead_id, key): [created, quotes, quotes_value]}, max_created).
+    """
+    where, params = _windows_filter("created", bounds)
+    cursor.execute(f"""
+        SELECT user_id, lead_id, created, value
+        FROM leads_leadquote
+        WHERE sent=1 AND deleted=0
+          AND {_in_groups("user_id", *groups)}
+          AND {where}
+    """, params)
+    latest, wm = {}, None
+    for r in tzbucket.stream(cursor):
+        created, value = r["created"], float(r["value"] or 0)
+        k = (r["user_id"], r["lead_id"], key(created))
+        cur = latest.get(k)
+        if cur is None or created > cur[0]:
+            latest[k] = [created, 1, value]
+        elif created == cur[0]:
+            cur[1] += 1
+            cur[2] += value
+        if wm is None or created > wm:
+            wm = created
+    return latest, wm
+
+@cached_query
+def get_call_aggregates(cursor, start, end, bucket, group):
+    """Call metrics per adviser of ``group`` per bucket ("range", "day" or "hour").
+
+    "range" totals are summed from the day (or, for a single day, hour)
+    buckets, so perf, pipeline and the series functions share one scan.
+    """
+    if bucket == "range":
+        fine = get_call_aggregates(cursor, start, end, "hour" if start == end else "day", group)
+        totals = {}
+        for uid, buckets in fine.items():
+            t = totals[uid] = {"talk_secs": 0.0, "contacted": 0, "no_contact": 0}
+            for b in buckets.values():
+                for k in t:
+                    t[k] += b[k]
+        return {uid: {"range": t} for uid, t in totals.items()}
+    return _scan_calls(cursor, start, end, bucket, (group,))[0]
+
+# ── Rollup store (per-adviser daily aggregates, see rollup.py) ──────────────
+# Fed by tailing each source table past a stored watermark.  Each refresh
+# recomputes whole local days from the watermark's day (minus a small
+# lookback for late edits) through today, so it is idempotent.  Adviser rows
+# cover every group in LIP_GROUP_IDS; after adding a group, re-run
+# `flask rollup-backfill` to load its members' history.
+ROLLUP_REFRESH_SECS  = int(os.environ.get("ROLLUP_REFRESH_SECS", 60))
+ROLLUP_LOOKBACK_DAYS = int(os.environ.get("ROLLUP_LOOKBACK_DAYS", 2))
+_rollup_last_refresh = 0.0
+
+def _month_chunks(first_day, last_day):
+    """Split first_day..last_day into calendar-month windows (bounds backfill query size)."""
+    while first_day <= last_day:
+        nxt = (first_day.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield first_day, min(last_day, nxt - timedelta(days=1))
+        first_day = nxt
+
+def _rollup_calls(cursor, store, first_day, last_day):
+    """Talk secs (>10s), contacted (>=45s) and no-contact (<45s) per adviser per day."""
+    aggs, wm = _scan_calls(cursor, first_day, last_day, "day", GROUP_IDS)
+    rows = [(uid, d, vals) for uid, days in aggs.items() for d, vals in days.items()]
+    store.replace_days(rollup.CALL_COLS, first_day, last_day, rows)
+    return wm
+
+def _rollup_quotes(cursor, store, first_day, last_day):
+    """Distinct leads quoted per adviser per day, valued at the day's latest quote."""
+    aggs, wm = _scan_quotes(cursor, first_day, last_day, "day", GROUP_IDS)
+    rows = [(uid, day, vals) for (uid, day), vals in aggs.items()]
+    store.replace_days(rollup.QUOTE_COLS, first_day, last_day, rows)
+    return wm
+
+def _rollup_userstats(cursor, store, first_day, last_day):
+    """Apps, inforce, contact/quote counters and worked-day flag from reports_userstats."""
+    cursor.execute(f"""
+        SELECT DATE(date) AS dt, user_id,
+               SUM(app_add)       AS apps_count,
+               SUM(app_add_value) AS apps_value,
+               SUM(app_com)       AS inforce_count,
+               SUM(app_com_value) AS inforce_value,
+               SUM(contact)       AS rs_contact,
+               SUM(qut_add)       AS rs_quotes,
+               MAX(CASE WHEN (contact>0 OR qut_add>0 OR app_add>0) THEN 1 ELSE 0 END) AS worked
+        FROM reports_userstats
+        WHERE {_in_groups("user_id", *GROUP_IDS)}
+          AND date BETWEEN %s AND %s
+        GROUP BY DATE(date), user_id
+    """, (first_day.isoformat(), last_day.isoformat()))
+    rows, wm = [], None
+    for r in cursor.fetchall():
+        day = str(r["dt"])[:10]
+        rows.append((r["user_id"], day, {
+            "apps_count":    int(r["apps_count"] or 0),
+            "apps_value":    float(r["apps_value"] or 0),
+            "inforce_count": int(r["inforce_count"] or 0),
+            "inforce_value": float(r["inforce_value"] or 0),
+            "rs_contact":    int(r["rs_contact"] or 0),
+            "rs_quotes":     int(r["rs_quotes"] or 0),
+            "worked":        int(r["worked"] or 0),
+        }))
+        wm = max(wm, day) if wm else day
+    store.replace_days(rollup.USERSTATS_COLS, first_day, last_day, rows)
+    return wm
+
+def _rollup_leads(cursor, store, since):
+    """Mirror leads assigned at/after ``since`` (local datetime) into the lead table."""
+    cursor.execute("""
+        SELECT l.id AS lead_id, l.user_id, DATE(l.assigned) AS dt, l.assigned,
+               EXISTS (
+                 SELECT 1 FROM leads_leadaction la
+                 WHERE la.object_id=l.id AND la.object_type='lead'
+                   AND la.action_type='doccreate'
+                   AND la.note LIKE '%%Life Insurance Questions%%'
+               ) AS booked
+        FROM leads_lead l
+        WHERE l.assigned >= %s
+          {EXCL_TEST}
+    """.format(EXCL_TEST=EXCL_TEST), (str(since),))
+    rows, wm = [], None
+    for r in cursor.fetchall():
+        rows.append((r["lead_id"], r["user_id"], str(r["dt"])[:10], r["booked"]))
+        wm = max(wm, r["assigned"]) if wm else r["assigned"]
+    store.rebuild_lead_buckets(store.upsert_leads(rows))
+    return wm
+
+def _rollup_booked(cursor, store, since_id):
+    """Flag mirrored leads that received an LIQ document after action id ``since_id``."""
+    cursor.execute("""
+        SELECT id, object_id FROM leads_leadaction
+        WHERE id > %s AND object_type='lead'
+          AND action_type='doccreate'
+          AND note LIKE '%%Life Insurance Questions%%'
+    """, (int(since_id),))
+    rows = cursor.fetchall()
+    store.rebuild_lead_buckets(store.mark_booked(r["object_id"] for r in rows))
+    return max((r["id"] for r in rows), default=None)
+
+def refresh_rollup(cursor, store, backfill_from=None):
+    """Bring the rollup store up to date; with ``backfill_from`` reload history from that day."""
+    today = date.today()
+    lookback = today - timedelta(days=ROLLUP_LOOKBACK_DAYS)
+
+    def first_day(key, to_day):
+        if backfill_from:
+            return backfill_from
+        wm = store.get_meta(key)
+        return min(to_day(wm), lookback) if wm else lookback
+
+    utc_day = lambda wm: tzbucket.local_day(datetime.fromisoformat(wm))
+    for key, feed, to_day in (("wm_calls",     _rollup_calls,     utc_day),
+                              ("wm_quotes",    _rollup_quotes,    utc_day),
+                              ("wm_userstats", _rollup_userstats, date.fromisoformat)):
+        for lo, hi in _month_chunks(first_day(key, to_day), today):
+            wm = feed(cursor, store, lo, hi)
+            if wm and str(wm) > (store.get_meta(key) or ""):
+                store.set_meta(**{key: wm})
+
+    if backfill_from:
+        leads_since = backfill_from.isoformat()
+        # The lead query resolves booked itself; only newer LIQ docs need tailing
+        cursor.execute("SELECT MAX(id) AS max_id FROM leads_leadaction")
+        booked_wm = (cursor.fetchone() or {}).get("max_id") or 0
+    else:
+        wm = store.get_meta("wm_leads")
+        leads_since = min(wm, lookback.isoformat()) if wm else lookback.isoformat()
+        booked_wm = _rollup_booked(cursor, store, store.get_meta("wm_booked", 0))
+    wm = _rollup_leads(cursor, store, leads_since)
+    if wm and str(wm) > (store.get_meta("wm_leads") or ""):
+        store.set_meta(wm_leads=wm)
+    if booked_wm:
+        store.set_meta(wm_booked=booked_wm)
+
+def _rollup_for(cursor, start):
+    """Rollup store if it covers ``start`` (refreshed at most every ROLLUP_REFRESH_SECS), else None."""
+    global _rollup_last_refresh
+    store = rollup.get_store()
+    if not store.covers(start):
+        return None
+    with store.refresh_lock:
+        if time.monotonic() - _rollup_last_refresh >= ROLLUP_REFRESH_SECS:
+            _timed("rollup_refresh", refresh_rollup, cursor, store)
+            _rollup_last_refresh = time.monotonic()
+    return store
+
+@app.cli.command("rollup-backfill")
+@click.option("--since", default=MIN_DATE, show_default=True, help="First local day to load (YYYY-MM-DD).")
+def rollup_backfill(since):
+    """Load rollup history from --since to today, then enable rollup reads."""
+    since_day = date.fromisoformat(since)
+    store = rollup.get_store()
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        _timed("rollup_backfill", refresh_rollup, cursor, store, backfill_from=since_day)
+    finally:
+        cursor.close(); conn.close()
+    prev = store.get_meta("backfilled_from")
+    store.set_meta(backfilled_from=min(prev, since) if prev else since)
+    click.echo(f"Rollup backfilled from {store.get_meta('backfilled_from')}")
+
+# ── Phone index (normalized phone → hung-up calls, see phone_index.py) ───────
+# Built once from the whole call table, then tailed: each refresh re-reads the
+# last PHONE_INDEX_LOOKBACK_MINS of calls so rows that hung up or had their
+# duration filled in after we first saw them are picked up.
+PHONE_INDEX_REFRESH_SECS  = int(os.environ.get("PHONE_INDEX_REFRESH_SECS", 60))
+PHONE_INDEX_LOOKBACK_MINS = int(os.environ.get("PHONE_INDEX_LOOKBACK_MINS", 60))
+_PHONE_INDEX_BATCH = 20000
+_phone_index_last_refresh = 0.0
+
+def _index_call_rows(rows):
+    return [(r["id"], r["phone"], None if r["extension"] is None else str(r["extension"]),
+             r["duration"], str(r["created"])[:19]) for r in rows]
+
+def build_phone_index(cursor, index):
+    """Load every hung-up call into the index in id-ordered batches."""
+    last_id, total, max_created = 0, 0, None
+    while True:
+        cursor.execute("""
+            SELECT id, phone, extension, duration, created FROM noojee_callrecord
+            WHERE id > %s AND status = 'Hungup'
+            ORDER BY id LIMIT %s
+        """, (last_id, _PHONE_INDEX_BATCH))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        total += index.upsert_calls(_index_call_rows(rows))
+        last_id = rows[-1]["id"]
+        batch_max = max(r["created"] for r in rows)
+        max_created = batch_max if max_created is None else max(max_created, batch_max)
+        log.info("[phone_index] %d calls indexed (id ≤ %s)", total, last_id)
+    index.set_meta(wm_created=str(max_created or datetime.utcnow())[:19],
+                   built_at=datetime.now().isoformat(timespec="seconds"))
+    return total
+
+def refresh_phone_index(cursor, index):
+    """Upsert calls created since the watermark (minus the lookback window)."""
+    wm = datetime.fromisoformat(index.get_meta("wm_created"))
+    cursor.execute("""
+        SELECT id, phone, extension, duration, created FROM noojee_callrecord
+        WHERE created >= %s AND status = 'Hungup'
+    """, ((wm - timedelta(minutes=PHONE_INDEX_LOOKBACK_MINS)).isoformat(sep=" "),))
+    rows = cursor.fetchall()
+    if rows:
+        index.upsert_calls(_index_call_rows(rows))
+        index.set_meta(wm_created=str(max(wm, max(r["created"] for r in rows)))[:19])
+    return len(rows)
+
+def _phone_index_for(cursor):
+    """Phone index once built (tailed at most every PHONE_INDEX_REFRESH_SECS), else None."""
+    global _phone_index_last_refresh
+    index = phone_index.get_index()
+    if not index.is_built():
+        return None
+    with index.refresh_lock:
+        if time.monotonic() - _phone_index_last_refresh >= PHONE_INDEX_REFRESH_SECS:
+            _timed("phone_index_refresh", refresh_phone_index, cursor, index)
+            _phone_index_last_refresh = time.monotonic()
+    return index
+
+@app.cli.command("phone-index-build")
+def phone_index_build():
+    """Index every hung-up call by normalized phone, then enable index lookups."""
+    index = phone_index.get_index()
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        total = _timed("phone_index_build", build_phone_index, cursor, index)
+    finally:
+        cursor.close(); conn.close()
+    click.echo(f"Phone index built: {total} calls")
+
+@cached_query
+def get_adviser_extensions(cursor):
+    """{user_id: phone extension} for the advisers of every configured group."""
+    cursor.execute(f"""
+        SELECT user_id, extension FROM account_userprofile
+        WHERE {_in_groups("user_id", *GROUP_IDS)}
+    """)
+    return {r["user_id"]: str(r["extension"]) for r in cursor.fetchall() if r["extension"] is not None}
+
+@cached_query
+def get_advisers(cursor, group):
+    """Members of ``group``, by last name."""
     cursor.execute("""
         SELECT u.id, CONCAT(u.first_name,' ',u.last_name) AS name,
                u.first_name, u.last_name
         FROM auth_user u
         JOIN account_usergroup_users ugu ON u.id=ugu.user_id
         WHERE ugu.usergroup_id=%s ORDER BY u.last_name, u.first_name
-    """, (GROUP_ID,))
+    """, (group,))
     return [{"id":r["id"],"name":r["name"].strip(),
              "first_name":r["first_name"],"last_name":r["last_name"]}
-            for r in cursor.fetchall() if r["id"] in SHOW_USER_IDS]
+            for r in cursor.fetchall()]
 
-def get_performance_stats(cursor, start, end):
-    utc_start, utc_end = _utc_range(start, end)
+def _member_ids(cursor, group):
+    """Sorted user ids of ``group`` (rollup and live-day reads)."""
+    return sorted(a["id"] for a in get_advisers(cursor, group))
 
-    # Talk time from noojee_callrecord via extension → user_id
-    cursor.execute(f"""
-        SELECT up.user_id,
-               COALESCE(SUM(ncr.duration),0)/1000000 AS talk_secs
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.status = 'Hungup'
-          AND ncr.duration > 10000000
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY up.user_id
-    """)
-    rows = {r["user_id"]: {"talk_secs": float(r["talk_secs"]),
-                           "apps_count": 0, "apps_value": 0.0,
-                           "inforce_count": 0, "inforce_value": 0.0,
-                           "days_worked": 0}
-            for r in cursor.fetchall()}
+# Performance and pipeline totals are built per list of (start, end) windows
+# so a range and its previous period (?compare=1) share one pass per source.
+def _call_totals(cursor, windows, group):
+    """Call metrics per adviser for each window.
+
+    A single window reuses the shared get_call_aggregates() scan; several are
+    read in one scan over just their days and summed per window.
+    """
+    if len(windows) == 1:
+        start, end = windows[0]
+        return [{uid: b["range"] for uid, b in get_call_aggregates(cursor, start, end, "range", group).items()}]
+    days, _ = _scan_calls(cursor, min(s for s, _ in windows), max(e for _, e in windows), "day",
+                          (group,), windows)
+    bounds = _local_bounds(windows)
+    per = [{} for _ in windows]
+    for uid, by_day in days.items():
+        for day, b in by_day.items():
+            t = per[_window_index(day, bounds)].setdefault(uid, {"talk_secs": 0.0, "contacted": 0, "no_contact": 0})
+            for k in t:
+                t[k] += b[k]
+    return per
+
+def _live_performance_totals(cursor, windows, calls, group):
+    """Talk time, apps, inforce and days worked straight from the source tables."""
+    # Talk time from the shared call-aggregation pass
+    per = [{uid: {"talk_secs": c["talk_secs"],
+                  "apps_count": 0, "apps_value": 0.0,
+                  "inforce_count": 0, "inforce_value": 0.0,
+                  "days_worked": 0}
+            for uid, c in win.items()} for win in calls]
 
     # Apps, inforce, days worked from reports_userstats
+    bounds = _local_bounds(windows)
+    where, params = _windows_filter("date", bounds)
+    cases = " ".join(f"WHEN date >= %s AND date < %s THEN {i}" for i in range(len(bounds)))
     cursor.execute(f"""
-        SELECT user_id,
+        SELECT user_id, CASE {cases} END AS win,
                SUM(app_add)       AS apps_count,
                SUM(app_add_value) AS apps_value,
                SUM(app_com)       AS inforce_count,
                SUM(app_com_value) AS inforce_value,
                SUM(CASE WHEN (contact>0 OR qut_add>0 OR app_add>0) THEN 1 ELSE 0 END) AS days_worked
         FROM reports_userstats
-        WHERE user_id IN ({_USER_IDS_SQL})
-          AND date BETWEEN %s AND %s
-        GROUP BY user_id
-    """, (start.isoformat(), end.isoformat()))
+        WHERE {_in_groups("user_id", group)}
+          AND {where}
+        GROUP BY user_id, win
+    """, params + params)
     for r in cursor.fetchall():
-        uid = r["user_id"]
+        rows, uid = per[int(r["win"])], r["user_id"]
         if uid not in rows:
             rows[uid] = {"talk_secs": 0.0}
         rows[uid]["apps_count"]    = int(r["apps_count"] or 0)
@@ -211,76 +758,75 @@ def get_performance_stats(cursor, start, end):
         rows[uid]["inforce_value"] = float(r["inforce_value"] or 0)
         rows[uid]["days_worked"]   = int(r["days_worked"] or 0)
 
-    # Quotes from leads_leadquote
-    cursor.execute(f"""
-        SELECT lq.user_id, COUNT(*) AS quotes_count, COALESCE(SUM(lq.value),0) AS quotes_value
-        FROM leads_leadquote lq
-        JOIN (
-            SELECT user_id, lead_id, MAX(created) AS max_created
-            FROM leads_leadquote
-            WHERE sent=1 AND deleted=0
-              AND created >= {utc_start}
-              AND created < {utc_end}
-            GROUP BY user_id, lead_id
-        ) latest ON lq.user_id=latest.user_id AND lq.lead_id=latest.lead_id
-               AND lq.created=latest.max_created
-        WHERE lq.sent=1 AND lq.deleted=0 GROUP BY lq.user_id
-    """)
-    for r in cursor.fetchall():
-        uid=r["user_id"]
-        if uid in rows:
-            rows[uid]["quotes_count"]=int(r["quotes_count"])
-            rows[uid]["quotes_value"]=float(r["quotes_value"])
-    return rows
-
-def get_pipeline_stats(cursor, start, end):
-    """
-    Leads funnel logic — all relative to leads ASSIGNED in the period.
-    """
-    utc_start, utc_end = _utc_range(start, end)
+    return per
+
+def _performance_totals(cursor, windows, store, calls, group):
+    """get_performance_stats() rows for each window (``calls`` from _call_totals unless ``store``)."""
+    if store:
+        members = _member_ids(cursor, group)
+        per = [{uid: {"talk_secs": float(t["talk_secs"]),
+                      "apps_count": int(t["apps_count"]), "apps_value": float(t["apps_value"]),
+                      "inforce_count": int(t["inforce_count"]), "inforce_value": float(t["inforce_value"]),
+                      "days_worked": int(t["worked"])}
+                for uid, t in store.totals(start, end, members).items()}
+               for start, end in windows]
+    else:
+        per = _live_performance_totals(cursor, windows, calls, group)
+
+    # Quotes from leads_leadquote — always live: "last quote per lead" over the
+    # whole range is not the sum of per-day rollup counts when a lead is re-quoted
+    bounds = [tzbucket.utc_bounds(s, e) for s, e in windows]
+    latest, _ = _latest_quotes(cursor, bounds, lambda created: _window_index(created, bounds), (group,))
+    for (uid, _, win), (_, n, value) in latest.items():
+        row = per[win].get(uid)
+        if row is not None:
+            row["quotes_count"] = row.get("quotes_count", 0) + n
+            row["quotes_value"] = row.get("quotes_value", 0.0) + value
+    return per
+
+@cached_query
+def get_performance_stats(cursor, start, end, group):
+    store = _rollup_for(cursor, start)
+    calls = None if store else _call_totals(cursor, [(start, end)], group)
+    return _performance_totals(cursor, [(start, end)], store, calls, group)[0]
+
+def _pipeline_totals(cursor, windows, store, calls, group):
+    """get_pipeline_stats() for each window (``calls`` from _call_totals unless ``store``)."""
+    if store:
+        members = _member_ids(cursor, group)
+        per = []
+        for start, end in windows:
+            totals = store.totals(start, end, members)
+            pick = lambda col: {uid: int(t[col]) for uid, t in totals.items()}
+            contacted = pick("contacted")
+            per.append({"assigned": pick("assigned"), "contacted": contacted,
+                        "no_contact": pick("no_contact"), "booked": pick("booked"), "called": contacted})
+        return per
+
+    bounds = _local_bounds(windows)
+    cases = lambda col: " ".join(f"WHEN {col} >= %s AND {col} < %s THEN {i}" for i in range(len(bounds)))
+    flat = tuple(b for pair in bounds for b in pair)
 
     # 1. Assigned
-    cursor.execute("""
-        SELECT user_id, COUNT(*) AS assigned FROM leads_lead
-        WHERE assigned >= %s AND assigned < %s
-          {EXCL_TEST_BARE}
-        GROUP BY user_id
-    """.format(EXCL_TEST_BARE=EXCL_TEST_BARE), (start.isoformat(), (end + timedelta(days=1)).isoformat()))
-    assigned = {r["user_id"]: int(r["assigned"]) for r in cursor.fetchall()}
-
-    # 2. Contacted = calls >= 5 seconds duration
+    where, params = _windows_filter("assigned", bounds)
     cursor.execute(f"""
-        SELECT up.user_id, COUNT(*) AS contacted
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration >= {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY up.user_id
-    """)
-    contacted = {r["user_id"]: int(r["contacted"] or 0) for r in cursor.fetchall()}
+        SELECT user_id, CASE {cases("assigned")} END AS win, COUNT(*) AS assigned FROM leads_lead
+        WHERE {where}
+          AND {_in_groups("user_id", group)}
+          {EXCL_TEST_BARE}
+        GROUP BY user_id, win
+    """, flat + params)
+    assigned = [{} for _ in windows]
+    for r in cursor.fetchall():
+        assigned[int(r["win"])][r["user_id"]] = int(r["assigned"])
 
-    # 2b. No Contact = calls < 5 seconds duration
+    # 2. Booked — of assigned leads, received LIQ doc (anytime on that lead)
+    where, params = _windows_filter("l.assigned", bounds)
     cursor.execute(f"""
-        SELECT up.user_id, COUNT(*) AS no_contact
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration < {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY up.user_id
-    """)
-    no_contact_totals = {r["user_id"]: int(r["no_contact"] or 0) for r in cursor.fetchall()}
-
-    # 3. Booked — of assigned leads, received LIQ doc (anytime on that lead)
-    cursor.execute("""
-        SELECT l.user_id, COUNT(DISTINCT l.id) AS booked
+        SELECT l.user_id, CASE {cases("l.assigned")} END AS win, COUNT(DISTINCT l.id) AS booked
         FROM leads_lead l
-        WHERE l.assigned >= %s AND l.assigned < %s
+        WHERE {where}
+          AND {_in_groups("l.user_id", group)}
           AND EXISTS (
             SELECT 1 FROM leads_leadaction la
             WHERE la.object_id=l.id AND la.object_type='lead'
@@ -288,25 +834,58 @@ def get_pipeline_stats(cursor, start, end):
               AND la.note LIKE '%%Life Insurance Questions%%'
           )
           {EXCL_TEST}
-        GROUP BY l.user_id
-    """.format(EXCL_TEST=EXCL_TEST), (start.isoformat(), (end + timedelta(days=1)).isoformat()))
-    booked = {r["user_id"]: int(r["booked"]) for r in cursor.fetchall()}
-
-    # 4. Called = total calls >= 5s (for daily checks tab)
-    called = contacted  # same query result
+        GROUP BY l.user_id, win
+    """, flat + params)
+    booked = [{} for _ in windows]
+    for r in cursor.fetchall():
+        booked[int(r["win"])][r["user_id"]] = int(r["booked"])
+
+    # 3. Contacted = calls >= 45s, 3b. No Contact = calls < 45s — one shared scan
+    # 4. Called = total calls >= 5s (for daily checks tab) — same result as contacted
+    per = []
+    for win_assigned, win_booked, win_calls in zip(assigned, booked, calls):
+        contacted = {uid: c["contacted"] for uid, c in win_calls.items()}
+        per.append({"assigned": win_assigned, "contacted": contacted,
+                    "no_contact": {uid: c["no_contact"] for uid, c in win_calls.items()},
+                    "booked": win_booked, "called": contacted})
+    return per
+
+@cached_query(current_state=True)
+def get_pipeline_stats(cursor, start, end, group):
+    """
+    Leads funnel logic — all relative to leads ASSIGNED in the period.
+    """
+    store = _rollup_for(cursor, start)
+    calls = None if store else _call_totals(cursor, [(start, end)], group)
+    return _pipeline_totals(cursor, [(start, end)], store, calls, group)[0]
 
-    return {"assigned":assigned,"contacted":contacted,"no_contact":no_contact_totals,"booked":booked,"called":called}
+@cached_query(current_state=True)
+def get_period_comparison(cursor, start, end, prev_start, prev_end, group):
+    """get_performance_stats() and get_pipeline_stats() for a range and its previous period.
 
-def get_schedule_appointments(cursor, today_dt):
+    Every source is read once for both windows — calls in one scan over just
+    their days — or from the rollup store's per-day rows when it covers them.
+    """
+    windows = [(start, end), (prev_start, prev_end)]
+    store = _rollup_for(cursor, prev_start)
+    calls = None if store else _call_totals(cursor, windows, group)
+    perf = _performance_totals(cursor, windows, store, calls, group)
+    pipeline = _pipeline_totals(cursor, windows, store, calls, group)
+    return {"range": (prev_start, prev_end),
+            "current":  {"perf_stats": perf[0], "pipeline": pipeline[0]},
+            "previous": {"perf_stats": perf[1], "pipeline": pipeline[1]}}
+
+@cached_query
+def get_schedule_appointments(cursor, today_dt, group):
     """Count today's and future appointments by type (Discussion / Follow-up / Questions)."""
     _empty = lambda: {"disc":0,"fu":0,"q":0}
     appt_today  = defaultdict(_empty)
     appt_future = defaultdict(_empty)
     try:
-        utc_today_start = f"CONVERT_TZ('{today_dt.isoformat()}','{TZ_OFFSET}','+00:00')"
+        utc_today_start, utc_tomorrow = tzbucket.utc_bounds(today_dt, today_dt)
         cursor.execute(f"""
             SELECT user_id,
-                   DATE(CONVERT_TZ(date,'+00:00','{TZ_OFFSET}')) AS appt_date,
+                   date < %s AS is_today,
                    CASE
                      WHEN text LIKE '%%Discussion%%' THEN 'disc'
                      WHEN text LIKE '%%Follow%%'     THEN 'fu'
@@ -315,17 +894,16 @@ def get_schedule_appointments(cursor, today_dt):
                    END AS appt_type,
                    COUNT(*) AS cnt
             FROM leads_leadschedule
-            WHERE date >= {utc_today_start}
-              AND user_id IS NOT NULL
-            GROUP BY user_id, appt_date, appt_type
-        """)
+            WHERE date >= %s
+              AND {_in_groups("user_id", group)}
+            GROUP BY user_id, is_today, appt_type
+        """, (utc_tomorrow, utc_today_start))
         for r in cursor.fetchall():
-            dt = str(r["appt_date"]) if not hasattr(r["appt_date"], 'isoformat') else r["appt_date"].isoformat()
             uid = r["user_id"]
             atype = r["appt_type"]
             if atype == "other":
                 continue
-            if dt == today_dt.isoformat():
+            if r["is_today"]:
                 appt_today[uid][atype] += int(r["cnt"])
             else:
                 appt_future[uid][atype] += int(r["cnt"])
@@ -334,77 +912,29 @@ def get_schedule_appointments(cursor, today_dt):
     return dict(appt_today), dict(appt_future)
 
 
-def get_hourly_series(cursor, day):
+@cached_query
+def get_hourly_series(cursor, day, group):
     """Hourly performance series for a single day (6am–10pm AEDT)."""
     HOURS = list(range(6, 23))  # 6..22
     day_iso = day.isoformat()
-    next_day_iso = (day + timedelta(days=1)).isoformat()
-    utc_start = f"CONVERT_TZ('{day_iso}','{TZ_OFFSET}','+00:00')"
-    utc_end   = f"CONVERT_TZ('{next_day_iso}','{TZ_OFFSET}','+00:00')"
 
-    # Talk time per hour from noojee_callrecord
-    cursor.execute(f"""
-        SELECT HOUR(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS hr,
-               up.user_id,
-               SUM(ncr.duration)/1000000 AS talk_secs
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.status = 'Hungup'
-          AND ncr.duration > 10000000
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY hr, up.user_id
-    """)
-    talk_hour = defaultdict(lambda: defaultdict(float))
-    for r in cursor.fetchall():
-        talk_hour[r["user_id"]][int(r["hr"])] = float(r["talk_secs"] or 0)
+    # Talk time and contacted (calls >= 45s) per hour — one shared scan
+    calls = get_call_aggregates(cursor, day, day, "hour", group)
+    talk_hour  = {uid: {h: b["talk_secs"] for h, b in hrs.items()} for uid, hrs in calls.items()}
+    calls_hour = {uid: {h: b["contacted"] for h, b in hrs.items()} for uid, hrs in calls.items()}
 
-    # Quotes per hour from leads_leadquote
-    cursor.execute(f"""
-        SELECT HOUR(CONVERT_TZ(lq.created,'+00:00','{TZ_OFFSET}')) AS hr,
-               lq.user_id, COUNT(*) AS cnt
-        FROM leads_leadquote lq
-        JOIN (
-            SELECT user_id, lead_id, MAX(created) AS max_created
-            FROM leads_leadquote
-            WHERE sent=1 AND deleted=0
-              AND created >= {utc_start}
-              AND created < {utc_end}
-            GROUP BY user_id, lead_id
-        ) latest ON lq.user_id=latest.user_id AND lq.lead_id=latest.lead_id
-                AND lq.created=latest.max_created
-        WHERE lq.sent=1 AND lq.deleted=0
-        GROUP BY hr, lq.user_id
-    """)
+    # Quotes per hour — each lead counted at the hour of its latest quote of the day
     quotes_hour = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall():
-        quotes_hour[r["user_id"]][int(r["hr"])] = int(r["cnt"])
-
-    # Contacted (calls >= 5s) per hour
-    cursor.execute(f"""
-        SELECT HOUR(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS hr,
-               up.user_id, COUNT(*) AS cnt
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration >= {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY hr, up.user_id
-    """)
-    calls_hour = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall():
-        calls_hour[r["user_id"]][int(r["hr"])] = int(r["cnt"] or 0)
+    for (uid, h), b in _scan_quotes(cursor, day, day, "hour", (group,))[0].items():
+        quotes_hour[uid][h] = b["quotes"]
 
     # Daily app/inforce totals from reports_userstats (only stored at day granularity)
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT user_id,
                app_add AS apps_count, app_add_value AS apps_value,
                app_com AS inforce_count, app_com_value AS inforce_value
         FROM reports_userstats
-        WHERE user_id IN (181,182,183,152)
+        WHERE {_in_groups("user_id", group)}
           AND date = %s
     """, (day_iso,))
     daily_stats = {}
@@ -419,15 +949,16 @@ def get_hourly_series(cursor, day):
     # Build series per user keyed by hour strings
     # Apps/inforce are daily totals — assign to first hour so total() stays correct
     hours_list = [str(h) for h in HOURS]
+    members = _member_ids(cursor, group)
     user_hour = defaultdict(dict)
     first_hour = str(HOURS[0])
-    for uid in SHOW_USER_IDS:
+    for uid in members:
         ds = daily_stats.get(uid, {})
         for h in HOURS:
             hs = str(h)
             is_first = (hs == first_hour)
             user_hour[uid][hs] = {
-                "talk_time_seconds": talk_hour[uid].get(h, 0),
+                "talk_time_seconds": talk_hour.get(uid, {}).get(h, 0),
                 "leads_quoted": quotes_hour[uid].get(h, 0),
                 "apps_count":    ds.get("apps_count", 0) if is_first else 0,
                 "apps_value":    ds.get("apps_value", 0) if is_first else 0,
@@ -436,78 +967,305 @@ def get_hourly_series(cursor, day):
             }
 
     calls_day_hourly = defaultdict(dict)
-    for uid in SHOW_USER_IDS:
+    for uid in members:
         for h in HOURS:
-            calls_day_hourly[uid][str(h)] = calls_hour[uid].get(h, 0)
+            calls_day_hourly[uid][str(h)] = calls_hour.get(uid, {}).get(h, 0)
 
     return hours_list, dict(user_hour), dict(calls_day_hourly)
 
 
-def get_hourly_pipeline_series(cursor, day):
+@cached_query
+def get_hourly_pipeline_series(cursor, day, group):
     """Hourly pipeline series for a single day (6am–10pm AEDT)."""
     HOURS = list(range(6, 23))
     day_iso = day.isoformat()
     next_day_iso = (day + timedelta(days=1)).isoformat()
-    utc_start = f"CONVERT_TZ('{day_iso}','{TZ_OFFSET}','+00:00')"
-    utc_end   = f"CONVERT_TZ('{next_day_iso}','{TZ_OFFSET}','+00:00')"
 
     # Assigned per hour
     cursor.execute("""
         SELECT user_id, HOUR(assigned) AS hr, COUNT(*) AS cnt
         FROM leads_lead
         WHERE assigned >= %s AND assigned < %s
+          AND {members}
           {EXCL_TEST_BARE}
         GROUP BY user_id, HOUR(assigned)
-    """.format(EXCL_TEST_BARE=EXCL_TEST_BARE), (day_iso, next_day_iso))
+    """.format(members=_in_groups("user_id", group), EXCL_TEST_BARE=EXCL_TEST_BARE), (day_iso, next_day_iso))
     assigned_h = defaultdict(lambda: defaultdict(int))
     for r in cursor.fetchall(): assigned_h[r["user_id"]][int(r["hr"])] = int(r["cnt"])
 
-    # Contacted per hour (calls >= 5s)
-    cursor.execute(f"""
-        SELECT HOUR(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS hr,
-               up.user_id, COUNT(*) AS cnt
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration >= {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY hr, up.user_id
-    """)
-    contacted_h = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall(): contacted_h[r["user_id"]][int(r["hr"])] = int(r["cnt"] or 0)
-
-    # No Contact per hour (calls < 5s)
-    cursor.execute(f"""
-        SELECT HOUR(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS hr,
-               up.user_id, COUNT(*) AS cnt
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration < {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY hr, up.user_id
-    """)
-    no_contact_h = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall(): no_contact_h[r["user_id"]][int(r["hr"])] = int(r["cnt"] or 0)
+    # Contacted (>= 45s) and No Contact (< 45s) per hour — one shared scan
+    calls = get_call_aggregates(cursor, day, day, "hour", group)
+    contacted_h  = {uid: {h: b["contacted"] for h, b in hrs.items()} for uid, hrs in calls.items()}
+    no_contact_h = {uid: {h: b["no_contact"] for h, b in hrs.items()} for uid, hrs in calls.items()}
 
     hours_list = [str(h) for h in HOURS]
     assigned_d, contacted_d, no_contact_d, booked_d = {}, {}, {}, {}
-    for uid in SHOW_USER_IDS:
+    for uid in _member_ids(cursor, group):
         assigned_d[uid]   = {str(h): assigned_h[uid].get(h, 0) for h in HOURS}
-        contacted_d[uid]  = {str(h): contacted_h[uid].get(h, 0) for h in HOURS}
-        no_contact_d[uid] = {str(h): no_contact_h[uid].get(h, 0) for h in HOURS}
+        contacted_d[uid]  = {str(h): contacted_h.get(uid, {}).get(h, 0) for h in HOURS}
+        no_contact_d[uid] = {str(h): no_contact_h.get(uid, {}).get(h, 0) for h in HOURS}
         booked_d[uid]     = {str(h): 0 for h in HOURS}
 
     return assigned_d, contacted_d, no_contact_d, booked_d
 
 
-def get_daily_series(cursor, start, end):
+# ── Live day (in-memory aggregates for today, see liveday.py) ────────────────
+# D0 and the Daily Checks tab for today are served from memory.  Each refresh
+# only reads rows newer than the source's watermark (less a short lookback for
+# late updates), plus calls still in progress and today's quotes, so its cost
+# follows the event rate rather than the day so far.
+# One accumulator holds every configured group; each view picks its members.
+LIVE_DAY_REFRESH_SECS  = int(os.environ.get("LIVE_DAY_REFRESH_SECS", 10))
+LIVE_DAY_LOOKBACK_SECS = int(os.environ.get("LIVE_DAY_LOOKBACK_SECS", 300))
+_live_day = liveday.LiveDay(CONTACT_THRESHOLD_US)
+
+def _live_since(acc, source, floor):
+    wm = acc.watermarks.get(source)
+    return floor if wm is None else max(floor, wm - timedelta(seconds=LIVE_DAY_LOOKBACK_SECS))
+
+def _note_watermark(acc, source, rows, col):
+    if rows:
+        newest = max(r[col] for r in rows)
+        acc.watermarks[source] = max(acc.watermarks.get(source, newest), newest)
+
+def refresh_live_day(cursor, acc, day):
+    """Ingest calls, quotes, assignments and bookings since the last refresh."""
+    if acc.day != day:
+        acc.reset(day)
+    local_start = datetime(day.year, day.month, day.day)
+    local_end   = local_start + timedelta(days=1)
+    utc_start, utc_end = tzbucket.utc_bounds(day, day)
+    to_local    = tzbucket.to_local
+
+    # Calls (created is UTC) — attributed through the adviser's extension
+    ext_users = defaultdict(list)
+    for uid, ext in get_adviser_extensions(cursor).items():
+        ext_users[ext].append(uid)
+    if ext_users:
+        # Rows are inserted when a call starts and only become Hungup, with a
+        # duration, when it ends.  Calls seen before then are re-read by id on
+        # each refresh until they hang up, for up to PHONE_INDEX_LOOKBACK_MINS
+        # (rows that end in another status are dropped after that).
+        marks = ",".join(["%s"] * len(ext_users))
+        cursor.execute(f"""
+            SELECT id, extension, status, duration, created FROM noojee_callrecord
+            WHERE extension IN ({marks})
+              AND created >= %s AND created < %s
+        """, (*ext_users, _live_since(acc, "calls", utc_start), utc_end))
+        rows = cursor.fetchall()
+        _note_watermark(acc, "calls", rows, "created")
+        if "calls" in acc.watermarks:
+            oldest = acc.watermarks["calls"] - timedelta(minutes=PHONE_INDEX_LOOKBACK_MINS)
+            for call_id in [i for i, created in acc.open_calls.items() if created < oldest]:
+                del acc.open_calls[call_id]
+        seen = {r["id"] for r in rows}
+        open_ids = sorted(i for i in acc.open_calls if i not in seen)
+        if open_ids:
+            cursor.execute(f"""
+                SELECT id, extension, status, duration, created FROM noojee_callrecord
+                WHERE id IN ({",".join(["%s"] * len(open_ids))})
+            """, tuple(open_ids))
+            rows += cursor.fetchall()
+        hungup = [r for r in rows if r["status"] == "Hungup" and str(r["extension"]) in ext_users]
+        for r in rows:
+            if r["status"] == "Hungup":
+                acc.open_calls.pop(r["id"], None)
+            else:
+                acc.open_calls[r["id"]] = r["created"]
+        acc.ingest_calls((r["id"], ext_users[str(r["extension"])], to_local(r["created"]).hour, r["duration"])
+                         for r in hungup)
+
+    # Quotes (created is UTC) — a quote can be sent or deleted long after it
+    # was created, so today's quotes are re-read in full (a few hundred rows)
+    cursor.execute(f"""
+        SELECT id, user_id, lead_id, created, value, (sent = 1 AND deleted = 0) AS live
+        FROM leads_leadquote
+        WHERE {_in_groups("user_id", *GROUP_IDS)}
+          AND created >= %s AND created < %s
+    """, (utc_start, utc_end))
+    acc.replace_quotes((r["id"], r["user_id"], r["lead_id"], to_local(r["created"]),
+                        float(r["value"] or 0), bool(r["live"])) for r in cursor.fetchall())
+
+    # Booked: new LIQ documents since the last refresh (leadaction ids only grow)
+    if "actions" not in acc.watermarks:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM leads_leadaction")
+        acc.watermarks["actions"] = int(cursor.fetchone()["max_id"])
+    else:
+        cursor.execute("""
+            SELECT id, object_id FROM leads_leadaction
+            WHERE id > %s AND object_type = 'lead' AND action_type = 'doccreate'
+              AND note LIKE '%%Life Insurance Questions%%'
+        """, (acc.watermarks["actions"],))
+        rows = cursor.fetchall()
+        acc.mark_booked(r["object_id"] for r in rows)
+        _note_watermark(acc, "actions", rows, "id")
+
+    # Assignments (assigned is local time)
+    cursor.execute("""
+        SELECT id, user_id, assigned FROM leads_lead
+        WHERE assigned >= %s AND assigned < %s
+          {EXCL_TEST_BARE}
+    """.format(EXCL_TEST_BARE=EXCL_TEST_BARE), (_live_since(acc, "leads", local_start), local_end))
+    rows = cursor.fetchall()
+    known = set(acc.lead_ids)
+    acc.ingest_leads((r["id"], r["user_id"], r["assigned"].hour) for r in rows)
+    _note_watermark(acc, "leads", rows, "assigned")
+    new_ids = [r["id"] for r in rows if r["id"] not in known]
+    if new_ids:
+        # Newly seen leads may have been booked before today
+        cursor.execute(f"""
+            SELECT DISTINCT object_id FROM leads_leadaction
+            WHERE object_type = 'lead' AND action_type = 'doccreate'
+              AND note LIKE '%%Life Insurance Questions%%'
+              AND object_id IN ({",".join(["%s"] * len(new_ids))})
+        """, tuple(new_ids))
+        acc.mark_booked(r["object_id"] for r in cursor.fetchall())
+
+    # Apps / inforce / worked — reports_userstats only has day totals (one row per adviser)
+    cursor.execute(f"""
+        SELECT user_id, app_add, app_add_value, app_com, app_com_value,
+               (contact > 0 OR qut_add > 0 OR app_add > 0) AS worked
+        FROM reports_userstats
+        WHERE {_in_groups("user_id", *GROUP_IDS)} AND date = %s
+    """, (day.isoformat(),))
+    acc.userstats = {r["user_id"]: {
+        "apps_count":    int(r["app_add"] or 0),
+        "apps_value":    float(r["app_add_value"] or 0),
+        "inforce_count": int(r["app_com"] or 0),
+        "inforce_value": float(r["app_com_value"] or 0),
+        "days_worked":   int(bool(r["worked"])),
+    } for r in cursor.fetchall()}
+
+    acc.refreshed_at = time.monotonic()
+
+def live_day_query(build):
+    """Turn ``build(acc, members)`` into a stage function ``fn(cursor, day, group)`` served from the live day.
+
+    Like ``cached_query`` it exposes ``cache_lookup`` so the executor skips the
+    connection checkout while the accumulator and the group's members are fresh.
+    """
+    @wraps(build)
+    def stage(cursor, day, group):
+        members = _member_ids(cursor, group)
+        with _live_day.lock:
+            if not _live_day.is_fresh(day, LIVE_DAY_REFRESH_SECS):
+                _timed("live_day_refresh", refresh_live_day, cursor, _live_day, day)
+            return build(_live_day, members)
+
+    def cache_lookup(day, group):
+        hit, advisers = get_advisers.cache_lookup(group)
+        if not hit:
+            return False, None
+        with _live_day.lock:
+            if _live_day.is_fresh(day, LIVE_DAY_REFRESH_SECS):
+                return True, build(_live_day, sorted(a["id"] for a in advisers))
+        return False, None
+
+    stage.cache_lookup = cache_lookup
+    return stage
+
+@live_day_query
+def live_hourly_series(acc, members):
+    """get_hourly_series() for today."""
+    calls, quotes = acc.call_hours(), acc.latest_quotes()
+    user_hour, calls_hour = {}, {}
+    for uid in members:
+        ds = acc.userstats.get(uid, {})
+        q = defaultdict(int)
+        for hour, _ in quotes.get(uid, []):
+            q[hour] += 1
+        user_hour[uid] = {str(h): {
+            "talk_time_seconds": calls[uid][h]["talk_secs"] if uid in calls and h in calls[uid] else 0,
+            "leads_quoted": q[h],
+            # Apps/inforce are daily totals — assign to first hour so total() stays correct
+            **{k: (ds.get(k, 0) if h == liveday.HOURS[0] else 0)
+               for k in ("apps_count", "apps_value", "inforce_count", "inforce_value")},
+        } for h in liveday.HOURS}
+        calls_hour[uid] = {str(h): calls[uid][h]["contacted"] if uid in calls and h in calls[uid] else 0
+                           for h in liveday.HOURS}
+    return [str(h) for h in liveday.HOURS], user_hour, calls_hour
+
+@live_day_query
+def live_hourly_pipeline_series(acc, members):
+    """get_hourly_pipeline_series() for today."""
+    calls = acc.call_hours()
+    assigned, _ = acc.leads_by_hour()
+    pick = lambda uid, col: {str(h): calls[uid][h][col] if uid in calls and h in calls[uid] else 0
+                             for h in liveday.HOURS}
+    return ({uid: {str(h): assigned[uid].get(h, 0) for h in liveday.HOURS} for uid in members},
+            {uid: pick(uid, "contacted") for uid in members},
+            {uid: pick(uid, "no_contact") for uid in members},
+            {uid: {str(h): 0 for h in liveday.HOURS} for uid in members})
+
+@live_day_query
+def live_performance_stats(acc, members):
+    """get_performance_stats() for today."""
+    calls, quotes = acc.call_hours(), acc.latest_quotes()
+    members = set(members)
+    rows = {}
+    for uid in (set(calls) | set(acc.userstats)) & members:
+        rows[uid] = {"talk_secs": sum(b["talk_secs"] for b in calls.get(uid, {}).values()),
+                     "apps_count": 0, "apps_value": 0.0, "inforce_count": 0, "inforce_value": 0.0,
+                     "days_worked": 0, **acc.userstats.get(uid, {})}
+    for uid, qs in quotes.items():
+        if uid in rows:
+            rows[uid]["quotes_count"] = len(qs)
+            rows[uid]["quotes_value"] = sum(v for _, v in qs)
+    return rows
+
+@live_day_query
+def live_pipeline_stats(acc, members):
+    """get_pipeline_stats() for today."""
+    calls = acc.call_hours()
+    assigned, booked = acc.leads_by_hour()
+    members = set(members)
+    contacted = {uid: sum(b["contacted"] for b in hrs.values()) for uid, hrs in calls.items() if uid in members}
+    return {"assigned": {uid: sum(hrs.values()) for uid, hrs in assigned.items() if uid in members},
+            "contacted": contacted,
+            "no_contact": {uid: sum(b["no_contact"] for b in hrs.values())
+                           for uid, hrs in calls.items() if uid in members},
+            "booked": {uid: n for uid, n in booked.items() if n and uid in members},
+            "called": contacted}
+
+def _daily_series_from_rollup(store, start, end, members):
+    """get_daily_series() shape built from rollup rows (userstats fields on weekdays only)."""
+    dates_set, user_day, calls_day = set(), defaultdict(dict), defaultdict(dict)
+    for uid, days in store.daily(start, end, members).items():
+        for d, r in days.items():
+            weekday = date.fromisoformat(d).weekday() < 5
+            if not (weekday or r["talk_secs"]):
+                continue
+            dates_set.add(d)
+            user_day[uid][d] = {
+                "talk_time_seconds": float(r["talk_secs"]),
+                "leads_quoted":  int(r["rs_quotes"]) if weekday else 0,
+                "apps_count":    int(r["apps_count"]) if weekday else 0,
+                "apps_value":    float(r["apps_value"]) if weekday else 0,
+                "inforce_count": int(r["inforce_count"]) if weekday else 0,
+                "inforce_value": float(r["inforce_value"]) if weekday else 0,
+            }
+            if weekday:
+                calls_day[uid][d] = int(r["rs_contact"])
+    return sorted(dates_set), dict(user_day), dict(calls_day)
+
+def _daily_pipeline_from_rollup(store, start, end, members):
+    """get_daily_pipeline_series() shape built from rollup rows (assigned/booked on weekdays only)."""
+    assigned_d, contacted_d, no_contact_d, booked_d = (defaultdict(lambda: defaultdict(int)) for _ in range(4))
+    for uid, days in store.daily(start, end, members).items():
+        for d, r in days.items():
+            if date.fromisoformat(d).weekday() < 5:
+                if r["assigned"]: assigned_d[uid][d] = int(r["assigned"])
+                if r["booked"]:   booked_d[uid][d]   = int(r["booked"])
+            if r["contacted"]:  contacted_d[uid][d]  = int(r["contacted"])
+            if r["no_contact"]: no_contact_d[uid][d] = int(r["no_contact"])
+    return dict(assigned_d), dict(contacted_d), dict(no_contact_d), dict(booked_d)
+
+@cached_query
+def get_daily_series(cursor, start, end, group):
     """Performance + call-contact daily series per adviser."""
-    utc_start, utc_end = _utc_range(start, end)
+    store = _rollup_for(cursor, start)
+    if store:
+        return _daily_series_from_rollup(store, start, end, _member_ids(cursor, group))
 
     # Daily stats from reports_userstats
     cursor.execute(f"""
@@ -516,7 +1274,7 @@ def get_daily_series(cursor, start, end):
                app_add AS apps_count, app_add_value AS apps_value,
                app_com AS inforce_count, app_com_value AS inforce_value
         FROM reports_userstats
-        WHERE user_id IN ({_USER_IDS_SQL})
+        WHERE {_in_groups("user_id", group)}
           AND date BETWEEN %s AND %s
           AND DAYOFWEEK(date) NOT IN (1,7)
         ORDER BY stat_date, user_id
@@ -535,28 +1293,16 @@ def get_daily_series(cursor, start, end):
             "inforce_value":  float(r["inforce_value"] or 0),
         }
 
-    # Talk time per day from noojee_callrecord
-    cursor.execute(f"""
-        SELECT DATE(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS dt,
-               up.user_id,
-               SUM(ncr.duration)/1000000 AS talk_secs
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.status = 'Hungup'
-          AND ncr.duration > 10000000
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY dt, up.user_id
-    """)
-    for r in cursor.fetchall():
-        d = str(r["dt"])[:10]
-        uid = r["user_id"]
-        if d not in user_day[uid]:
-            user_day[uid][d] = {"leads_quoted":0,"apps_count":0,"apps_value":0,"inforce_count":0,"inforce_value":0}
-            if d not in dates_set:
-                dates_set.append(d)
-        user_day[uid][d]["talk_time_seconds"] = float(r["talk_secs"] or 0)
+    # Talk time per day from the shared call-aggregation pass
+    for uid, days in get_call_aggregates(cursor, start, end, "day", group).items():
+        for d, b in days.items():
+            if not b["talk_secs"]:
+                continue
+            if d not in user_day[uid]:
+                user_day[uid][d] = {"leads_quoted":0,"apps_count":0,"apps_value":0,"inforce_count":0,"inforce_value":0}
+                if d not in dates_set:
+                    dates_set.append(d)
+            user_day[uid][d]["talk_time_seconds"] = b["talk_secs"]
 
     dates_set = sorted(set(dates_set))
 
@@ -564,7 +1310,7 @@ def get_daily_series(cursor, start, end):
     cursor.execute(f"""
         SELECT DATE(date) AS dt, user_id, contact AS cnt
         FROM reports_userstats
-        WHERE user_id IN ({_USER_IDS_SQL})
+        WHERE {_in_groups("user_id", group)}
           AND date BETWEEN %s AND %s
           AND DAYOFWEEK(date) NOT IN (1,7)
     """, (start.isoformat(), end.isoformat()))
@@ -574,58 +1320,39 @@ def get_daily_series(cursor, start, end):
 
     return dates_set, dict(user_day), dict(calls_day)
 
-def get_daily_pipeline_series(cursor, start, end, dates_list):
+@cached_query(current_state=True)
+def get_daily_pipeline_series(cursor, start, end, dates_list, group):
     """Daily funnel series for Leads charts (assigned, contacted, no_contact, booked)."""
-    utc_start, utc_end = _utc_range(start, end)
+    store = _rollup_for(cursor, start)
+    if store:
+        return _daily_pipeline_from_rollup(store, start, end, _member_ids(cursor, group))
 
     # Assigned per day
     cursor.execute("""
         SELECT user_id, DATE(assigned) AS dt, COUNT(*) AS cnt
         FROM leads_lead
         WHERE assigned >= %s AND assigned < %s AND DAYOFWEEK(assigned) NOT IN (1,7)
+          AND {members}
           {EXCL_TEST_BARE}
         GROUP BY user_id, DATE(assigned)
-    """.format(EXCL_TEST_BARE=EXCL_TEST_BARE), (start.isoformat(), (end + timedelta(days=1)).isoformat()))
+    """.format(members=_in_groups("user_id", group), EXCL_TEST_BARE=EXCL_TEST_BARE),
+        (start.isoformat(), (end + timedelta(days=1)).isoformat()))
     assigned_d = defaultdict(lambda: defaultdict(int))
     for r in cursor.fetchall(): assigned_d[r["user_id"]][str(r["dt"])[:10]]=int(r["cnt"])
 
-    # Contacted per day = calls >= 5 seconds duration
-    cursor.execute(f"""
-        SELECT DATE(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS dt,
-               up.user_id, COUNT(*) AS cnt
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration >= {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY dt, up.user_id
-    """)
-    contacted_d = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall(): contacted_d[r["user_id"]][str(r["dt"])[:10]] = int(r["cnt"] or 0)
-
-    # No Contact per day = calls < 5 seconds duration
-    cursor.execute(f"""
-        SELECT DATE(CONVERT_TZ(ncr.created,'+00:00','{TZ_OFFSET}')) AS dt,
-               up.user_id, COUNT(*) AS cnt
-        FROM noojee_callrecord ncr
-        JOIN account_userprofile up ON up.extension = ncr.extension
-        WHERE up.user_id IN ({_USER_IDS_SQL})
-          AND ncr.duration < {CONTACT_THRESHOLD_US}
-          AND ncr.status = 'Hungup'
-          AND ncr.created >= {utc_start}
-          AND ncr.created < {utc_end}
-        GROUP BY dt, up.user_id
-    """)
-    no_contact_d = defaultdict(lambda: defaultdict(int))
-    for r in cursor.fetchall(): no_contact_d[r["user_id"]][str(r["dt"])[:10]] = int(r["cnt"] or 0)
+    # Contacted (>= 45s) and No Contact (< 45s) per day — one shared scan
+    calls = get_call_aggregates(cursor, start, end, "day", group)
+    contacted_d  = {uid: {d: b["contacted"] for d, b in days.items() if b["contacted"]}
+                    for uid, days in calls.items()}
+    no_contact_d = {uid: {d: b["no_contact"] for d, b in days.items() if b["no_contact"]}
+                    for uid, days in calls.items()}
 
     # Booked per day (leads assigned that day that received LIQ doc)
     cursor.execute("""
         SELECT l.user_id, DATE(l.assigned) AS dt, COUNT(DISTINCT l.id) AS cnt
         FROM leads_lead l
         WHERE l.assigned >= %s AND l.assigned < %s AND DAYOFWEEK(l.assigned) NOT IN (1,7)
+          AND {members}
           AND EXISTS (
             SELECT 1 FROM leads_leadaction la
             WHERE la.object_id=l.id AND la.object_type='lead'
@@ -634,15 +1361,108 @@ def get_daily_pipeline_series(cursor, start, end, dates_list):
           )
           {EXCL_TEST}
         GROUP BY l.user_id, DATE(l.assigned)
-    """.format(EXCL_TEST=EXCL_TEST), (start.isoformat(), (end + timedelta(days=1)).isoformat()))
+    """.format(members=_in_groups("l.user_id", group), EXCL_TEST=EXCL_TEST),
+        (start.isoformat(), (end + timedelta(days=1)).isoformat()))
     booked_d = defaultdict(lambda: defaultdict(int))
     for r in cursor.fetchall(): booked_d[r["user_id"]][str(r["dt"])[:10]]=int(r["cnt"])
 
-    return dict(assigned_d), dict(contacted_d), dict(no_contact_d), dict(booked_d)
-
-
-def get_remediation_stats(cursor, start, end):
+    return dict(assigned_d), contacted_d, no_contact_d, dict(booked_d)
+
+
+def _with_calendar_dates(dates_list, start, end):
+    """Ensure ALL calendar dates are in dates_list (not just dates with data)."""
+    all_dates = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    return sorted(set(dates_list) | set(all_dates))
+
+def _daily_pipeline_for_series(cursor, start, end, group, daily_series):
+    """get_daily_pipeline_series keyed off the dates produced by get_daily_series."""
+    dates_list = _with_calendar_dates(daily_series[0], start, end)
+    return get_daily_pipeline_series(cursor, start, end, dates_list, group)
+
+# ── Chart resolution ─────────────────────────────────────────────────────────
+# Long ranges are charted per week or month instead of per day: a year is ~52
+# points rather than ~260, and with the rollup store the buckets are read
+# precomputed (see rollup.py) instead of grouped per day in MySQL.  Week and
+# month buckets are weekday sums keyed by their first day, like the daily
+# charts, which plot Mon-Fri only.
+CHART_DAY_MAX_DAYS  = int(os.environ.get("CHART_DAY_MAX_DAYS", 92))    # longer ranges chart by week
+CHART_WEEK_MAX_DAYS = int(os.environ.get("CHART_WEEK_MAX_DAYS", 366))  # longer ranges chart by month
+
+def chart_resolution(start, end):
+    """Chart bucket for start..end: "hour", "day", "week" or "month"."""
+    days = (end - start).days + 1
+    if days == 1:
+        return "hour"
+    if days <= CHART_DAY_MAX_DAYS:
+        return "day"
+    return "week" if days <= CHART_WEEK_MAX_DAYS else "month"
+
+def _fold_weekdays(by_day, unit):
+    """``{uid: {day_iso: n or {field: n}}}`` summed over weekdays into ``{uid: {period_iso: ...}}``."""
+    out = {}
+    for uid, days in by_day.items():
+        periods = out.setdefault(uid, {})
+        for d, v in days.items():
+            day = date.fromisoformat(d)
+            if day.weekday() >= 5:
+                continue
+            key = rollup.period_start(day, unit).isoformat()
+            if isinstance(v, dict):
+                acc = periods.setdefault(key, {})
+                for k, n in v.items():
+                    acc[k] = acc.get(k, 0) + n
+            else:
+                periods[key] = periods.get(key, 0) + v
+    return out
+
+@cached_query
+def get_period_series(cursor, start, end, unit, group):
+    """get_daily_series() shape over week or month buckets keyed by their first day."""
+    keys = [p.isoformat() for p in rollup.period_starts(start, end, unit)]
+    store = _rollup_for(cursor, start)
+    if not store:
+        _, user_day, calls_day = get_daily_series(cursor, start, end, group)
+        return keys, _fold_weekdays(user_day, unit), _fold_weekdays(calls_day, unit)
+
+    user_period, calls_period = defaultdict(dict), defaultdict(dict)
+    for uid, periods in store.periods(start, end, _member_ids(cursor, group), unit).items():
+        for p, r in periods.items():
+            user_period[uid][p] = {
+                "talk_time_seconds": float(r["talk_secs"]),
+                "leads_quoted":  int(r["rs_quotes"]),
+                "apps_count":    int(r["apps_count"]),
+                "apps_value":    float(r["apps_value"]),
+                "inforce_count": int(r["inforce_count"]),
+                "inforce_value": float(r["inforce_value"]),
+            }
+            calls_period[uid][p] = int(r["rs_contact"])
+    return keys, dict(user_period), dict(calls_period)
+
+@cached_query(current_state=True)
+def get_period_pipeline_series(cursor, start, end, unit, group):
+    """get_daily_pipeline_series() shape over week or month buckets."""
+    store = _rollup_for(cursor, start)
+    if not store:
+        daily = get_daily_pipeline_series(cursor, start, end, _with_calendar_dates([], start, end), group)
+        return tuple(_fold_weekdays(d, unit) for d in daily)
+
+    series = {c: defaultdict(dict) for c in ("assigned", "contacted", "no_contact", "booked")}
+    for uid, periods in store.periods(start, end, _member_ids(cursor, group), unit).items():
+        for p, r in periods.items():
+            for c, out in series.items():
+                if r[c]:
+                    out[uid][p] = int(r[c])
+    return tuple(dict(series[c]) for c in ("assigned", "contacted", "no_contact", "booked"))
+
+
+@cached_query(current_state=True)
+def get_remediation_stats(cursor, start, end, group):
     """Remediation aggregate counts per adviser + pending detail for popup."""
+    return get_remediation_counts(cursor, start, end, group), get_remediation_details(cursor, start, end, group)
+
+@cached_query(current_state=True)
+def get_remediation_counts(cursor, start, end, group):
+    """Total (any status) and Pending (status 0/1) remediations per adviser in the range."""
     utc_start, utc_end = _utc_range(start, end)
 
     # 1. Aggregate counts: Total (any status) and Pending (status 0/1) in date range
@@ -653,7 +1473,7 @@ def get_remediation_stats(cursor, start, end):
         FROM leads_leadrequirement lr
         JOIN leads_lead l ON l.id = lr.lead_id
         WHERE lr.type_id IN ({REMED_TYPE_IDS_SQL})
-          AND l.user_id IN ({_USER_IDS_SQL})
+          AND {_in_groups("l.user_id", group)}
           AND lr.created >= {utc_start}
           AND lr.created <  {utc_end}
           {EXCL_TEST}
@@ -665,8 +1485,11 @@ def get_remediation_stats(cursor, start, end):
             "total": int(r["total_remed"]),
             "pending": int(r["pending_remed"] or 0),
         }
+    return counts
 
-    # 2. Detailed records — all statuses (pending + resolved) for slide-in panel
+def _execute_remediation_details(cursor, start, end, group):
+    """Run the remediation detail query (all statuses, oldest first); rows are left to the caller."""
+    utc_start, utc_end = _utc_range(start, end)
     cursor.execute(f"""
         SELECT lr.id            AS req_id,
                lr.lead_id,
@@ -676,36 +1499,43 @@ def get_remediation_stats(cursor, start, end):
                lr.description,
                lr.last_note,
                lr.status,
-               DATE(CONVERT_TZ(lr.created,'+00:00','{TZ_OFFSET}')) AS created_date,
+               lr.created,
                l.user_id        AS adviser_id,
                CONCAT(l.first_name,' ',l.last_name)               AS client_name,
                CASE WHEN lr.object_type='application' THEN lr.object_id ELSE NULL END AS app_id
         FROM leads_leadrequirement lr
         JOIN leads_lead l ON l.id = lr.lead_id
         WHERE lr.type_id IN ({REMED_TYPE_IDS_SQL})
-          AND l.user_id IN ({_USER_IDS_SQL})
+          AND {_in_groups("l.user_id", group)}
           AND lr.created >= {utc_start}
           AND lr.created <  {utc_end}
           {EXCL_TEST}
         ORDER BY lr.created ASC
     """)
+
+def _remediation_record(r):
+    return {
+        "req_id": r["req_id"],
+        "lead_id": r["lead_id"],
+        "object_type": r["object_type"],
+        "object_id": r["object_id"],
+        "task_name": r["task_name"],
+        "description": (r["description"] or "").strip(),
+        "last_note": (r["last_note"] or "").strip(),
+        "status": int(r["status"]),
+        "created_date": tzbucket.local_day(r["created"]).isoformat(),
+        "client_name": (r["client_name"] or "").strip(),
+        "app_id": r["app_id"],
+    }
+
+@cached_query(current_state=True)
+def get_remediation_details(cursor, start, end, group):
+    """Remediation records — all statuses (pending + resolved) — per adviser for the slide-in panel."""
+    _execute_remediation_details(cursor, start, end, group)
     details = defaultdict(list)
     for r in cursor.fetchall():
-        details[r["adviser_id"]].append({
-            "req_id": r["req_id"],
-            "lead_id": r["lead_id"],
-            "object_type": r["object_type"],
-            "object_id": r["object_id"],
-            "task_name": r["task_name"],
-            "description": (r["description"] or "").strip(),
-            "last_note": (r["last_note"] or "").strip(),
-            "status": int(r["status"]),
-            "created_date": str(r["created_date"]),
-            "client_name": (r["client_name"] or "").strip(),
-            "app_id": r["app_id"],
-        })
-
-    return counts, dict(details)
+        details[r["adviser_id"]].append(_remediation_record(r))
+    return dict(details)
 
 
 # Lead status map — matches actual CRM pipeline stages
@@ -717,12 +1547,127 @@ LEAD_STATUS_ACTIVE = {0, 1, 2, 3, 4}  # "Active" tab
 LEAD_STATUS_CLOSED = {5, 6}            # "Closed" tab
 
 
-def get_assigned_lead_details(cursor, start, end):
-    """All leads assigned in the period, per adviser — for the slide-in panel.
+# ── Lead action resolver ─────────────────────────────────────────────────────
+# Latest note / status / open-close action per lead, resolved for a whole batch
+# of leads in one window-function pass and memoized per lead id.  The memo
+# tails leads_leadaction by id and drops any lead that gained a newer action.
+LEAD_MEMO_MAX   = int(os.environ.get("LEAD_MEMO_MAX", 50000))
+_LEAD_ACTION_CHUNK = 1000
+_lead_actions = KeyedMemo(LEAD_MEMO_MAX)
+
+def _tail_lead_actions(cursor):
+    """Invalidate memoized leads that have actions past the watermark."""
+    if _lead_actions.watermark is None:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM leads_leadaction")
+        _lead_actions.watermark = int(cursor.fetchone()["max_id"])
+        return
+    cursor.execute("""
+        SELECT object_id, MAX(id) AS max_id FROM leads_leadaction
+        WHERE id > %s AND object_type = 'lead'
+        GROUP BY object_id
+    """, (_lead_actions.watermark,))
+    rows = cursor.fetchall()
+    if rows:
+        _lead_actions.discard(int(r["object_id"]) for r in rows)
+        _lead_actions.watermark = max(_lead_actions.watermark, *(int(r["max_id"]) for r in rows))
+
+def _fetch_lead_actions(cursor, lead_ids):
+    """One pass over leads_leadaction for ``lead_ids`` → {lead_id: record}.
+
+    Each ROW_NUMBER window ranks a lead's actions within one kind; the outer
+    filter keeps the newest action of each kind:
+      user_note    last human-written note
+      system_note  last anything-else (auto-generated notes, status changes…)
+      last_stage   furthest stage implied by the last qualifying status change
+      is_closed    last open/close action was a close
+    """
+    out = {lid: {"user_note": "", "system_note": "", "last_stage": None, "is_closed": False}
+           for lid in lead_ids}
+    marks = ",".join(["%s"] * len(lead_ids))
+    cursor.execute(f"""
+        SELECT object_id, action_type, note, stage, is_user_note, note_rn,
+               is_stage = 1 AND stage_rn = 1     AS newest_stage,
+               is_open_close = 1 AND oc_rn = 1   AS newest_open_close
+        FROM (
+          SELECT la.object_id, la.action_type,
+                 LEFT(la.note, 500) AS note,
+                 (la.action_type = 'note' AND la.user_id IS NOT NULL) AS is_user_note,
+                 (la.action_type = 'status'
+                  AND la.note NOT LIKE '%%Client%%'
+                  AND la.note NOT LIKE '%%On Hold%%'
+                  AND la.note NOT LIKE '%%Not Interested%%') AS is_stage,
+                 (la.action_type IN ('close','open')) AS is_open_close,
+                 CASE
+                   WHEN la.note LIKE '%%Application%%' OR la.note LIKE '%%Documents%%' THEN 4
+                   WHEN la.note LIKE '%%Quote%%' THEN 3
+                   ELSE 1
+                 END AS stage,
+                 ROW_NUMBER() OVER (PARTITION BY la.object_id,
+                                    (la.action_type = 'note' AND la.user_id IS NOT NULL)
+                                    ORDER BY la.created DESC, la.id DESC) AS note_rn,
+                 ROW_NUMBER() OVER (PARTITION BY la.object_id,
+                                    (la.action_type = 'status'
+                                     AND la.note NOT LIKE '%%Client%%'
+                                     AND la.note NOT LIKE '%%On Hold%%'
+                                     AND la.note NOT LIKE '%%Not Interested%%')
+                                    ORDER BY la.created DESC, la.id DESC) AS stage_rn,
+                 ROW_NUMBER() OVER (PARTITION BY la.object_id, la.action_type IN ('close','open')
+                                    ORDER BY la.created DESC, la.id DESC) AS oc_rn
+          FROM leads_leadaction la
+          WHERE la.object_type = 'lead' AND la.object_id IN ({marks})
+        ) ranked
+        WHERE note_rn = 1 OR (stage_rn = 1 AND is_stage = 1) OR (oc_rn = 1 AND is_open_close = 1)
+    """, tuple(lead_ids))
+    for r in cursor.fetchall():
+        rec = out[int(r["object_id"])]
+        # A row can be the newest of several kinds at once
+        if r["note_rn"] == 1:
+            rec["user_note" if r["is_user_note"] else "system_note"] = (r["note"] or "").strip()
+        if r["newest_stage"]:
+            rec["last_stage"] = int(r["stage"])
+        if r["newest_open_close"]:
+            rec["is_closed"] = r["action_type"] == "close"
+    return out
+
+def resolve_lead_actions(cursor, lead_ids):
+    """Latest-action record per lead id (shared by every lead-detail query).
+
+    Records are memoized and must not be mutated by callers.  Note that a
+    record only holds the rows that are newest within their kind — e.g. a
+    status row can be both the lead's ``system_note`` and its ``last_stage``.
+    """
+    lead_ids = list(dict.fromkeys(int(l) for l in lead_ids))
+    if not lead_ids:
+        return {}
+    with _lead_actions.lock:
+        _tail_lead_actions(cursor)
+        found, missing = _lead_actions.get_many(lead_ids)
+        for i in range(0, len(missing), _LEAD_ACTION_CHUNK):
+            fetched = _fetch_lead_actions(cursor, missing[i:i + _LEAD_ACTION_CHUNK])
+            _lead_actions.put_many(fetched)
+            found.update(fetched)
+    return found
+
+def _working_stage(status, actions):
+    """Closed leads (Won/Lost) report the stage they reached before closing."""
+    if status in LEAD_STATUS_CLOSED:
+        return actions["last_stage"] or 0
+    return status
+
+
+@cached_query(current_state=True)
+def get_lead_details(cursor, start, end, group):
+    """Every lead an adviser touched in the period, per adviser — for the slide-in panels.
+
+    One query serves both workbench modes.  Each lead is tagged with
+    ``assigned_in_period`` (assigned during the range — the funnel cohort) and
+    ``active_in_period`` (any leads_leadaction during the range); the
+    activity view is the union of both.  Use ``leads_for_mode`` to filter.
 
     Returns user_note (last human-written note) and system_note (last auto-generated)
     separately so the panel can display them in two accordions.
     """
+    range_params = (start.isoformat(), (end + timedelta(days=1)).isoformat())
     cursor.execute("""
         SELECT l.id          AS lead_id,
                l.user_id     AS adviser_id,
@@ -735,166 +1680,68 @@ def get_assigned_lead_details(cursor, start, end):
                l.created                               AS created_at,
                DATE(l.assigned)                        AS assigned_date,
                l.assigned                              AS assigned_at,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND la.action_type = 'note' AND la.user_id IS NOT NULL
-                ORDER BY la.created DESC LIMIT 1) AS user_note,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND (la.action_type != 'note' OR la.user_id IS NULL)
-                ORDER BY la.created DESC LIMIT 1) AS system_note,
-               CASE WHEN l.status IN (5,6) THEN
-                 COALESCE(
-                   (SELECT
-                      CASE
-                        WHEN la_ps.note LIKE '%%Application%%' OR la_ps.note LIKE '%%Documents%%' THEN 4
-                        WHEN la_ps.note LIKE '%%Quote%%' THEN 3
-                        ELSE 1
-                      END
-                    FROM leads_leadaction la_ps
-                    WHERE la_ps.object_id = l.id
-                      AND la_ps.object_type = 'lead'
-                      AND la_ps.action_type = 'status'
-                      AND la_ps.note NOT LIKE '%%Client%%'
-                      AND la_ps.note NOT LIKE '%%On Hold%%'
-                      AND la_ps.note NOT LIKE '%%Not Interested%%'
-                    ORDER BY la_ps.created DESC
-                    LIMIT 1
-                   ), 0)
-               ELSE l.status
-               END AS working_stage,
-               COALESCE(
-                 (SELECT la_co.action_type = 'close'
-                  FROM leads_leadaction la_co
-                  WHERE la_co.object_id = l.id
-                    AND la_co.object_type = 'lead'
-                    AND la_co.action_type IN ('close','open')
-                  ORDER BY la_co.created DESC
-                  LIMIT 1
-                 ), 0) AS is_closed
+               (l.assigned >= %s AND l.assigned < %s)  AS assigned_in_period,
+               (act.object_id IS NOT NULL)             AS active_in_period
         FROM leads_lead l
         LEFT JOIN leads_leadsource ls ON ls.id = l.source_id
-        WHERE l.assigned >= %s AND l.assigned < %s
-          AND l.user_id IN ({uids})
+        LEFT JOIN (
+            SELECT DISTINCT la.object_id FROM leads_leadaction la
+            WHERE la.object_type = 'lead'
+              AND la.created >= %s AND la.created < %s
+        ) act ON act.object_id = l.id
+        WHERE {members}
+          AND ((l.assigned >= %s AND l.assigned < %s) OR act.object_id IS NOT NULL)
           {excl}
         ORDER BY l.assigned ASC
-    """.format(uids=_USER_IDS_SQL, excl=EXCL_TEST),
-        (start.isoformat(), (end + timedelta(days=1)).isoformat()),
+    """.format(members=_in_groups("l.user_id", group), excl=EXCL_TEST),
+        range_params * 3,
     )
+    rows = cursor.fetchall()
+    actions = resolve_lead_actions(cursor, [r["lead_id"] for r in rows])
     details = defaultdict(list)
-    for r in cursor.fetchall():
-        details[r["adviser_id"]].append({
-            "lead_id": r["lead_id"],
-            "client_name": (r["client_name"] or "").strip(),
-            "status": int(r["status"]),
-            "source": (r["source_name"] or "").strip(),
-            "referrer": (r["referrer_name"] or "").strip(),
-            "created_date": str(r["created_date"]) if r["created_date"] else "",
-            "created_at": str(r["created_at"]) if r["created_at"] else "",
-            "assigned_date": str(r["assigned_date"]),
-            "assigned_at": str(r["assigned_at"]) if r["assigned_at"] else "",
-            "user_note": (r["user_note"] or "").strip(),
-            "system_note": (r["system_note"] or "").strip(),
-            "working_stage": int(r["working_stage"]) if r["working_stage"] is not None else int(r["status"]),
-            "is_closed": bool(r["is_closed"]),
-        })
+    for r in rows:
+        details[r["adviser_id"]].append(_lead_record(r, actions[int(r["lead_id"])]))
     return dict(details)
 
-
-def get_total_activity_lead_details(cursor, start, end):
-    """All leads an adviser touched during the period — regardless of assignment date.
-
-    A lead is included if it was assigned during the period OR had any
-    leads_leadaction activity during the period.  This gives a full workload
-    view rather than the cohort/funnel view.
+def _lead_record(r, a):
+    """Panel record for a lead-detail row and its latest-action record."""
+    return {
+        "lead_id": r["lead_id"],
+        "client_name": (r["client_name"] or "").strip(),
+        "status": int(r["status"]),
+        "source": (r["source_name"] or "").strip(),
+        "referrer": (r["referrer_name"] or "").strip(),
+        "created_date": str(r["created_date"]) if r["created_date"] else "",
+        "created_at": str(r["created_at"]) if r["created_at"] else "",
+        "assigned_date": str(r["assigned_date"]),
+        "assigned_at": str(r["assigned_at"]) if r["assigned_at"] else "",
+        "user_note": a["user_note"],
+        "system_note": a["system_note"],
+        "working_stage": _working_stage(int(r["status"]), a),
+        "is_closed": a["is_closed"],
+        "assigned_in_period": bool(r["assigned_in_period"]),
+        "active_in_period": bool(r["active_in_period"]),
+    }
+
+
+def leads_for_mode(details, wb_mode):
+    """Filter ``get_lead_details`` output for a workbench mode.
+
+    funnel   — leads assigned in the period (cohort view)
+    activity — every lead assigned or worked in the period (workload view)
     """
-    cursor.execute("""
-        SELECT DISTINCT l.id          AS lead_id,
-               l.user_id     AS adviser_id,
-               CONCAT(l.first_name,' ',l.last_name) AS client_name,
-               l.status,
-               COALESCE(NULLIF(l.source_code,''), ls.name, NULLIF(l.groups_cache,''), '') AS source_name,
-               COALESCE(NULLIF(l.source_refer,''),
-                        l.datafields->>'$.affiliate_user', '') AS referrer_name,
-               DATE(l.created)                        AS created_date,
-               l.created                               AS created_at,
-               DATE(l.assigned)                        AS assigned_date,
-               l.assigned                              AS assigned_at,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND la.action_type = 'note' AND la.user_id IS NOT NULL
-                ORDER BY la.created DESC LIMIT 1) AS user_note,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND (la.action_type != 'note' OR la.user_id IS NULL)
-                ORDER BY la.created DESC LIMIT 1) AS system_note,
-               CASE WHEN l.status IN (5,6) THEN
-                 COALESCE(
-                   (SELECT
-                      CASE
-                        WHEN la_ps.note LIKE '%%Application%%' OR la_ps.note LIKE '%%Documents%%' THEN 4
-                        WHEN la_ps.note LIKE '%%Quote%%' THEN 3
-                        ELSE 1
-                      END
-                    FROM leads_leadaction la_ps
-                    WHERE la_ps.object_id = l.id
-                      AND la_ps.object_type = 'lead'
-                      AND la_ps.action_type = 'status'
-                      AND la_ps.note NOT LIKE '%%Client%%'
-                      AND la_ps.note NOT LIKE '%%On Hold%%'
-                      AND la_ps.note NOT LIKE '%%Not Interested%%'
-                    ORDER BY la_ps.created DESC
-                    LIMIT 1
-                   ), 0)
-               ELSE l.status
-               END AS working_stage,
-               COALESCE(
-                 (SELECT la_co.action_type = 'close'
-                  FROM leads_leadaction la_co
-                  WHERE la_co.object_id = l.id
-                    AND la_co.object_type = 'lead'
-                    AND la_co.action_type IN ('close','open')
-                  ORDER BY la_co.created DESC
-                  LIMIT 1
-                 ), 0) AS is_closed
-        FROM leads_lead l
-        LEFT JOIN leads_leadsource ls ON ls.id = l.source_id
-        WHERE l.user_id IN ({uids})
-          AND (
-            (l.assigned >= %s AND l.assigned < %s)
-            OR EXISTS (
-              SELECT 1 FROM leads_leadaction la
-              WHERE la.object_id = l.id AND la.object_type = 'lead'
-                AND la.created >= %s AND la.created < %s
-            )
-          )
-          {excl}
-        ORDER BY l.assigned ASC
-    """.format(uids=_USER_IDS_SQL, excl=EXCL_TEST),
-        (start.isoformat(), (end + timedelta(days=1)).isoformat(),
-         start.isoformat(), (end + timedelta(days=1)).isoformat()),
-    )
-    details = defaultdict(list)
-    for r in cursor.fetchall():
-        details[r["adviser_id"]].append({
-            "lead_id": r["lead_id"],
-            "client_name": (r["client_name"] or "").strip(),
-            "status": int(r["status"]),
-            "source": (r["source_name"] or "").strip(),
-            "referrer": (r["referrer_name"] or "").strip(),
-            "created_date": str(r["created_date"]) if r["created_date"] else "",
-            "created_at": str(r["created_at"]) if r["created_at"] else "",
-            "assigned_date": str(r["assigned_date"]),
-            "assigned_at": str(r["assigned_at"]) if r["assigned_at"] else "",
-            "user_note": (r["user_note"] or "").strip(),
-            "system_note": (r["system_note"] or "").strip(),
-            "working_stage": int(r["working_stage"]) if r["working_stage"] is not None else int(r["status"]),
-            "is_closed": bool(r["is_closed"]),
-        })
-    return dict(details)
+    if wb_mode == "activity":
+        return details
+    out = {}
+    for uid, leads in details.items():
+        cohort = [l for l in leads if l["assigned_in_period"]]
+        if cohort:
+            out[uid] = cohort
+    return out
 
 
-def get_pipeline_tile_data(cursor, start, end):
+@cached_query(current_state=True)
+def get_pipeline_tile_data(cursor, start, end, group):
     """Pipeline tile data: leads classified into 4 stages with per-lead call counts.
 
     Stages (hierarchical — highest wins):
@@ -916,9 +1763,9 @@ def get_pipeline_tile_data(cursor, start, end):
                DATE(l.assigned) AS assigned_date
         FROM leads_lead l
         WHERE l.assigned >= %s AND l.assigned < %s
-          AND l.user_id IN ({uids})
+          AND {members}
         ORDER BY l.assigned ASC
-    """.format(uids=_USER_IDS_SQL),
+    """.format(members=_in_groups("l.user_id", group)),
         (start.isoformat(), (end + timedelta(days=1)).isoformat()),
     )
     leads = []
@@ -946,47 +1793,16 @@ def get_pipeline_tile_data(cursor, start, end):
     #    Also get ALL call details for the calls slider
     phone_to_leads = defaultdict(list)
     for lid, phone in lead_phones.items():
-        clean = phone.replace(" ", "").replace("-", "")
-        phone_to_leads[clean].append(lid)
+        phone_to_leads[phone_index.normalize_phone(phone)].append(lid)
 
     # Build call count and detail data
     call_counts = defaultdict(int)    # lead_id -> count of 45s+ calls
     call_details = defaultdict(list)  # lead_id -> list of call records
 
-    if phone_to_leads:
-        phones_sql = ",".join(f"'{p}'" for p in phone_to_leads.keys())
-        cursor.execute(f"""
-            SELECT ncr.id          AS call_id,
-                   REPLACE(REPLACE(ncr.phone, ' ', ''), '-', '') AS clean_phone,
-                   ncr.extension,
-                   ncr.duration,
-                   ncr.duration / 1000000 AS duration_secs,
-                   CONVERT_TZ(ncr.created, '+00:00', '{TZ_OFFSET}') AS call_time,
-                   up.user_id      AS caller_id
-            FROM noojee_callrecord ncr
-            JOIN account_userprofile up ON up.extension = ncr.extension
-            WHERE REPLACE(REPLACE(ncr.phone, ' ', ''), '-', '') IN ({phones_sql})
-              AND ncr.status = 'Hungup'
-              AND up.user_id IN ({_USER_IDS_SQL})
-            ORDER BY ncr.created DESC
-        """)
-        for r in cursor.fetchall():
-            clean_phone = r["clean_phone"]
-            caller_id = r["caller_id"]
-            dur_secs = float(r["duration_secs"] or 0)
-            for lid in phone_to_leads.get(clean_phone, []):
-                # Only count calls from the assigned adviser
-                if lead_advisers.get(lid) != caller_id:
-                    continue
-                call_detail = {
-                    "call_id": r["call_id"],
-                    "duration_secs": round(dur_secs, 1),
-                    "call_time": str(r["call_time"])[:19] if r["call_time"] else "",
-                    "lead_id": lid,
-                }
-                call_details[lid].append(call_detail)
-                if r["duration"] and r["duration"] >= CONTACT_THRESHOLD_US:
-                    call_counts[lid] += 1
+    for lid, call_detail, contact in _lead_calls(cursor, phone_to_leads, lead_advisers):
+        call_details[lid].append(call_detail)
+        if contact:
+            call_counts[lid] += 1
 
     # 3. Classify leads into 4 stages
     # Stages: not_contacted, contacted, quoted, submitted
@@ -1023,12 +1839,100 @@ def get_pipeline_tile_data(cursor, start, end):
     return dict(tiles), dict(call_counts), dict(call_details)
 
 
-def get_contact_before_close(cursor, start, end):
+def _lead_calls(cursor, phone_to_leads, lead_advisers):
+    """Calls to each lead's phone from its assigned adviser, newest first.
+
+    ``phone_to_leads`` maps normalized phones to lead ids.  Yields
+    ``(lead_id, call detail, 45s+ contact)``.
+    """
+    index = _phone_index_for(cursor) if phone_to_leads else None
+    if index is not None:
+        calls = _indexed_adviser_calls(cursor, index, phone_to_leads.keys())
+    elif phone_to_leads:
+        phones_sql = ",".join(f"'{p}'" for p in phone_to_leads.keys())
+        cursor.execute(f"""
+            SELECT ncr.id          AS call_id,
+                   REPLACE(REPLACE(ncr.phone, ' ', ''), '-', '') AS clean_phone,
+                   ncr.extension,
+                   ncr.duration,
+                   ncr.duration / 1000000 AS duration_secs,
+                   ncr.created     AS call_time,
+                   up.user_id      AS caller_id
+            FROM noojee_callrecord ncr
+            JOIN account_userprofile up ON up.extension = ncr.extension
+            WHERE REPLACE(REPLACE(ncr.phone, ' ', ''), '-', '') IN ({phones_sql})
+              AND ncr.status = 'Hungup'
+              AND {_in_groups("up.user_id", *GROUP_IDS)}
+            ORDER BY ncr.created DESC
+        """)
+        calls = [{**r, "call_time": tzbucket.to_local(r["call_time"])} for r in cursor.fetchall()]
+    else:
+        calls = []
+    for r in calls:
+        dur_secs = float(r["duration_secs"] or 0)
+        for lid in phone_to_leads.get(r["clean_phone"], []):
+            # Only count calls from the assigned adviser
+            if lead_advisers.get(lid) != r["caller_id"]:
+                continue
+            yield lid, {
+                "call_id": r["call_id"],
+                "duration_secs": round(dur_secs, 1),
+                "call_time": str(r["call_time"])[:19] if r["call_time"] else "",
+                "lead_id": lid,
+            }, bool(r["duration"] and r["duration"] >= CONTACT_THRESHOLD_US)
+
+def _indexed_adviser_calls(cursor, index, phones):
+    """Adviser calls to ``phones`` from the phone index, newest first.
+
+    Rows have the same shape as the live call query in get_pipeline_tile_data.
+    """
+    ext_users = defaultdict(list)
+    for uid, ext in get_adviser_extensions(cursor).items():
+        ext_users[ext].append(uid)
+    rows = []
+    for phone, calls in index.lookup(phones, extensions=ext_users.keys()).items():
+        for c in calls:
+            local = tzbucket.to_local(datetime.fromisoformat(c["created"]))
+            for uid in ext_users[c["extension"]]:
+                rows.append({"call_id": c["call_id"], "clean_phone": phone,
+                             "extension": c["extension"], "duration": c["duration"],
+                             "duration_secs": c["duration"] / 1_000_000,
+                             "call_time": local, "caller_id": uid})
+    rows.sort(key=lambda r: r["call_time"], reverse=True)
+    return rows
+
+def _contact_before_close_indexed(cursor, index, start, end, group):
+    """get_contact_before_close, counting calls via the phone index."""
+    extensions = get_adviser_extensions(cursor)
+    cursor.execute(f"""
+        SELECT l.user_id, l.id AS lead_id, l.phone
+        FROM leads_lead l
+        INNER JOIN account_userprofile up ON up.user_id = l.user_id
+        WHERE {_in_groups("l.user_id", group)}
+          AND l.status IN (5, 6)
+          AND l.assigned >= %s AND l.assigned < %s
+          {EXCL_TEST}
+    """, (start.isoformat(), (end + timedelta(days=1)).isoformat()))
+    leads = cursor.fetchall()
+    calls = index.lookup((r["phone"] for r in leads), extensions=set(extensions.values()))
+    per_user = defaultdict(list)
+    for r in leads:
+        ext = extensions.get(r["user_id"])
+        per_user[r["user_id"]].append(sum(
+            1 for c in calls.get(phone_index.normalize_phone(r["phone"]), [])
+            if c["extension"] == ext and c["duration"] >= CONTACT_THRESHOLD_US))
+    return {uid: round(sum(n) / len(n), 1) for uid, n in per_user.items()}
+
+@cached_query(current_state=True)
+def get_contact_before_close(cursor, start, end, group):
     """Average 45s+ calls per closed lead (Won/Lost), per adviser.
 
     For each closed lead, counts how many 45s+ calls the adviser made to that
     lead's phone number, then averages across all closed leads for the adviser.
     """
+    index = _phone_index_for(cursor)
+    if index is not None:
+        return _contact_before_close_indexed(cursor, index, start, end, group)
     cursor.execute(f"""
         SELECT sub.user_id,
                AVG(sub.calls) AS avg_cbc
@@ -1043,7 +1947,7 @@ def get_contact_before_close(cursor, start, end):
                 AND ncr.phone = REPLACE(REPLACE(l.phone, ' ', ''), '-', '')
                 AND ncr.duration >= {CONTACT_THRESHOLD_US}
                 AND ncr.status = 'Hungup'
-            WHERE l.user_id IN ({_USER_IDS_SQL})
+            WHERE {_in_groups("l.user_id", group)}
               AND l.status IN (5, 6)
               AND l.assigned >= %s AND l.assigned < %s
               {EXCL_TEST}
@@ -1064,13 +1968,14 @@ _TEST_NAMES = (
 _TEST_NAMES_SQL = ",".join(f"'{n}'" for n in _TEST_NAMES)
 
 
-# Consultants whose leads are NOT considered unassigned
-_CONSULTANT_IDS = {181, 182, 183, 152}  # Nate, Sam, Gary B, Rebel
-_CONSULTANT_IDS_SQL = ",".join(str(u) for u in sorted(_CONSULTANT_IDS))
+# Consultants (whose leads are NOT considered unassigned) are the group's
+# members other than NON_CONSULTANT_IDS
+_NON_CONSULTANT_IDS_SQL = ",".join(str(u) for u in sorted(NON_CONSULTANT_IDS)) or "NULL"
 
 
-def get_unassigned_leads(cursor):
-    """LIP (Ltd) leads not assigned to a consultant (Nate/Sam/Gary B/Rebel),
+@cached_query
+def get_unassigned_leads(cursor, group):
+    """LIP (Ltd) leads not assigned to one of the group's consultants,
        within the last 60 days, excluding test/fake leads."""
     cursor.execute(f"""
         SELECT l.id          AS lead_id,
@@ -1078,19 +1983,12 @@ def get_unassigned_leads(cursor):
                l.status,
                l.source_code,
                DATE(l.assigned) AS assigned_date,
-               l.assigned       AS assigned_at,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND la.action_type = 'note' AND la.user_id IS NOT NULL
-                ORDER BY la.created DESC LIMIT 1) AS user_note,
-               (SELECT LEFT(la.note, 500) FROM leads_leadaction la
-                WHERE la.object_id = l.id AND la.object_type = 'lead'
-                  AND (la.action_type != 'note' OR la.user_id IS NULL)
-                ORDER BY la.created DESC LIMIT 1) AS system_note
+               l.assigned       AS assigned_at
         FROM leads_lead l
         WHERE l.groups_cache = 'LIP (Ltd)'
           AND l.status IN (0, 1, 2, 3, 4)
-          AND (l.user_id IS NULL OR l.user_id NOT IN ({_CONSULTANT_IDS_SQL}))
+          AND (l.user_id IS NULL OR l.user_id IN ({_NON_CONSULTANT_IDS_SQL})
+               OR NOT {_in_groups("l.user_id", group)})
           AND l.assigned >= DATE_SUB(CURDATE(), INTERVAL 60 DAY)
           AND LOWER(TRIM(l.first_name)) NOT IN ({_TEST_NAMES_SQL})
           AND LOWER(TRIM(l.last_name))  NOT IN ({_TEST_NAMES_SQL})
@@ -1099,8 +1997,11 @@ def get_unassigned_leads(cursor):
           {EXCL_TEST}
         ORDER BY l.assigned ASC
     """)
+    rows = cursor.fetchall()
+    actions = resolve_lead_actions(cursor, [r["lead_id"] for r in rows])
     leads = []
-    for r in cursor.fetchall():
+    for r in rows:
+        a = actions[int(r["lead_id"])]
         leads.append({
             "lead_id": r["lead_id"],
             "client_name": (r["client_name"] or "").strip(),
@@ -1108,78 +2009,23 @@ def get_unassigned_leads(cursor):
             "source": (r["source_code"] or "").strip(),
             "assigned_date": str(r["assigned_date"]),
             "assigned_at": str(r["assigned_at"]) if r["assigned_at"] else "",
-            "user_note": (r["user_note"] or "").strip(),
-            "system_note": (r["system_note"] or "").strip(),
+            "user_note": a["user_note"],
+            "system_note": a["system_note"],
         })
     return leads
 
 
-@app.route("/")
-@login_required
-def index():
-    req_t0 = time.monotonic()
-    today     = date.today()
-    lbd       = last_biz_day()
+def _requested_range(today=None):
+    """(start, end) from ?start=&end=, clamped to MIN_DATE..today.  Default view = M0 (month-to-date)."""
+    today = today or date.today()
     min_date_obj = date.fromisoformat(MIN_DATE)
-    data_updated_str = datetime.now().strftime("%d/%m/%y")
-    db_max_date = lbd  # picker upper bound — set properly below after DB query
-
-    # ── Query DB for actual refresh time and last full data day ──────────────
-    try:
-        _conn = get_connection()
-        _cur  = _conn.cursor(dictionary=True)
-        try:
-            _cur.execute("""
-                SELECT MAX(created) AS max_utc FROM noojee_callrecord
-            """)
-            _ref = _cur.fetchone()
-            if _ref and _ref["max_utc"]:
-                raw_utc = _ref["max_utc"]
-                if hasattr(raw_utc, 'strftime'):
-                    # Convert UTC to local manually
-                    raw_dt = raw_utc + timedelta(hours=11)
-                    m = raw_dt.month
-                    tz_abbr = 'AEDT' if (m >= 10 or m <= 4) else 'AEST'
-                    data_updated_str = raw_dt.strftime("%d/%m/%y · %I:%M %p ").lstrip('0') + tz_abbr
-                    db_max_date = raw_dt.date()
-        except Exception as _e:
-            log.warning("[refresh_dt] %s", _e)
-        try:
-            # Last full day of data — use index-friendly range scan from recent dates
-            _cur.execute(f"""
-                SELECT DATE(CONVERT_TZ(created,'+00:00','{TZ_OFFSET}')) AS day, COUNT(*) AS cnt
-                FROM noojee_callrecord
-                WHERE created >= DATE_SUB(NOW(), INTERVAL 14 DAY)
-                GROUP BY day HAVING cnt > 10
-                ORDER BY day DESC LIMIT 1
-            """)
-            _mx = _cur.fetchone()
-            if _mx and _mx["day"]:
-                raw = _mx["day"]
-                last_full_day = raw if hasattr(raw, 'year') else date.fromisoformat(str(raw)[:10])
-                while last_full_day.weekday() >= 5:
-                    last_full_day -= timedelta(days=1)
-                lbd = last_full_day
-        except Exception as _e:
-            log.warning("[last_full_day] %s", _e)
-        _cur.close(); _conn.close()
-    except Exception as _e:
-        log.warning("[db_init] %s", _e)
-    # ────────────────────────────────────────────────────────────────────────
-
-    # Default view = M0 (month-to-date)
     default_end   = today
     default_start = max(today.replace(day=1), min_date_obj)
     if default_start > default_end:
         default_start = max(default_end-timedelta(days=20), min_date_obj)
 
-    start_str        = request.args.get("start", default_start.isoformat())
-    end_str          = request.args.get("end",   default_end.isoformat())
-    active_tab       = request.args.get("tab","perf")
-    wb_mode          = request.args.get("mode","funnel")
-    if wb_mode not in ("funnel","activity"):
-        wb_mode = "funnel"
-
+    start_str = request.args.get("start", default_start.isoformat())
+    end_str   = request.args.get("end",   default_end.isoformat())
     try:
         start=date.fromisoformat(start_str); end=date.fromisoformat(end_str)
     except ValueError:
@@ -1190,74 +2036,180 @@ def index():
     # Hard cap — never allow end beyond today to prevent pool exhaustion
     if end > today: end = today
     if start > today: start = today
+    return start, end
 
-    log.info("Dashboard request: %s to %s", start, end)
+def _requested_mode():
+    wb_mode = request.args.get("mode","funnel")
+    return wb_mode if wb_mode in ("funnel","activity") else "funnel"
 
-    # Single connection for ALL queries — avoids pool exhaustion from multiple connections
-    conn=None
-    try:
-        conn=get_connection()
-    except Exception as e:
-        return render_template("error.html", error_msg=str(e)), 503
+def _add_months(d, n):
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, min(d.day, calendar.monthrange(d.year + y, m + 1)[1]))
 
-    is_single_day = (start == end)
+def previous_range(start, end):
+    """The period ``start..end`` is compared against, or None before MIN_DATE.
 
-    cursor=conn.cursor(dictionary=True)
-    try:
-        advisers       = _timed("advisers",    get_advisers, cursor)
-        perf           = _timed("perf_stats",  get_performance_stats, cursor, start, end)
-        pipeline       = _timed("pipeline",    get_pipeline_stats, cursor, start, end)
-        biz_days       = biz_days_in_range(start, end)
-        if is_single_day:
-            dates_list, daily_by_user, calls_day = _timed("hourly_series", get_hourly_series, cursor, start)
-            assigned_d, contacted_d, no_contact_d, booked_d = _timed("hourly_pipeline", get_hourly_pipeline_series, cursor, start)
-        else:
-            dates_list, daily_by_user, calls_day = _timed("daily_series", get_daily_series, cursor, start, end)
-            # Ensure ALL calendar dates are in dates_list (not just dates with data)
-            all_dates = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
-            dates_list = sorted(set(dates_list) | set(all_dates))
-            assigned_d, contacted_d, no_contact_d, booked_d = _timed("daily_pipeline", get_daily_pipeline_series, cursor, start, end, dates_list)
+    Ranges starting on the 1st map to the same days of the month(s) before —
+    M0 to the same span of last month, M1 to the whole month before it.
+    Anything else moves back by whole weeks so weekdays line up (D0 → the
+    same weekday last week, W0 → the same days of last week).
+    """
+    if start.day == 1:
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        after = end + timedelta(days=1)
+        prev_start = _add_months(start, -months)
+        prev_end = (_add_months(after, -months) - timedelta(days=1) if after.day == 1
+                    else _add_months(end, -months))
+    else:
+        shift = timedelta(weeks=-(-((end - start).days + 1) // 7))
+        prev_start, prev_end = start - shift, end - shift
+    min_date_obj = date.fromisoformat(MIN_DATE)
+    if prev_end < min_date_obj:
+        return None
+    return max(prev_start, min_date_obj), prev_end
+
+def _requested_compare(start, end):
+    """Previous period for ?compare=1, else None."""
+    return previous_range(start, end) if request.args.get("compare") == "1" else None
+
+def _run_one(name, fn, *args):
+    """Run a single get_* stage (cache-aware, on its own pooled connection)."""
+    dates = [a for a in args if isinstance(a, date)]
+    timer = _stage_timer(min(dates), max(dates)) if dates else _stage_timer()
+    return run_stages([Stage(name, fn, *args)], timer)[name]
+
+def _shell_stages(start, end, today, wb_mode, group, compare=None):
+    """Stages needed to render the page shell (tables + charts).
+
+    Lead details, pipeline tiles, remediation details and unassigned leads are
+    served separately by the /api/... endpoints and fetched by the page on demand.
+    With ``compare`` (the previous period) one comparison stage replaces the
+    performance and pipeline totals, see _expand_comparison.
+    """
+    totals_stages = [
+        Stage("pipeline",             get_pipeline_stats, start, end, group),
+        Stage("perf_stats",           get_performance_stats, start, end, group),
+    ]
+    if start == end == today:
+        # Today (D0, Daily Checks): tables and hourly charts come from the live day
+        series_stages = [
+            Stage("hourly_series",   live_hourly_series, start, group),
+            Stage("hourly_pipeline", live_hourly_pipeline_series, start, group),
+        ]
+        totals_stages = [
+            Stage("pipeline",        live_pipeline_stats, start, group),
+            Stage("perf_stats",      live_performance_stats, start, group),
+        ]
+    elif start == end:
+        series_stages = [
+            Stage("hourly_series",   get_hourly_series, start, group),
+            Stage("hourly_pipeline", get_hourly_pipeline_series, start, group),
+        ]
+    elif chart_resolution(start, end) == "day":
+        series_stages = [
+            Stage("daily_series",   get_daily_series, start, end, group),
+            Stage("daily_pipeline", _daily_pipeline_for_series, start, end, group, needs=("daily_series",)),
+        ]
+    else:
+        unit = chart_resolution(start, end)
+        series_stages = [
+            Stage("period_series",   get_period_series, start, end, unit, group),
+            Stage("period_pipeline", get_period_pipeline_series, start, end, unit, group),
+        ]
+    if compare:
+        # Both periods from the same sources (today too), so the deltas are like for like
+        totals_stages = [Stage("comparison", get_period_comparison, start, end, *compare, group)]
+    stages = [
+        Stage("contact_before_close", get_contact_before_close, start, end, group),
+        *series_stages,
+        *totals_stages,
+        Stage("remediations",         get_remediation_counts, start, end, group),
+        Stage("appointments",         get_schedule_appointments, today, group),
+        Stage("advisers",             get_advisers, group),
+    ]
+    if wb_mode == "activity":
+        # Activity mode replaces the assigned counts with the activity lead set
+        stages.insert(0, Stage("lead_details", get_lead_details, start, end, group))
+    return stages
+
+# The page is built in three sections, each from its own subset of the shell
+# stages, so a streamed render can send one as soon as its stages are done.
+def perf_section_stages(wb_mode):
+    stages = ("advisers", "perf_stats", "pipeline", "remediations")
+    return stages + ("lead_details",) if wb_mode == "activity" else stages
+
+def checks_section_stages(wb_mode):
+    return perf_section_stages(wb_mode) + ("appointments", "contact_before_close")
+
+def _expand_comparison(res):
+    """Put a comparison stage's current-period totals under the usual stage names."""
+    res.update(res["comparison"]["current"])
+
+def _previous(res):
+    """Stage results with the previous period's totals in place of the current ones."""
+    prev = {k: v for k, v in res.items() if k != "comparison"}
+    prev.update(res["comparison"]["previous"])
+    return prev
+
+# Row fields that get a previous-period value (row["prev"]) under ?compare=1
+_PERF_DELTAS   = ("assigned", "talk_time_s", "talk_per_day_s", "quotes_count", "quote_total",
+                  "quotes_per_day", "apps_count", "apps_value", "apps_per_day",
+                  "inforce_count", "inforce_value")
+_CHECKS_DELTAS = ("assigned", "contacted", "not_contacted", "booked", "conv_ac", "conv_cb", "conv_ab")
+# Total Activity's assigned set has no previous-period equivalent
+_ACTIVITY_NO_DELTA = {"assigned", "conv_ac", "conv_ab"}
+
+def _attach_previous(rows, prev_rows, keys, wb_mode):
+    prev_by_uid = {r["user_id"]: r for r in prev_rows}
+    for r in rows:
+        p = prev_by_uid.get(r["user_id"], {})
+        r["prev"] = {k: None if wb_mode == "activity" and k in _ACTIVITY_NO_DELTA else p.get(k, 0)
+                     for k in keys}
 
-        # For weekly mode keep weekdays (Mon-Fri); for daily/monthly also strip weekends
-        if not is_single_day:
-            dates_list = [d for d in dates_list if date.fromisoformat(d).weekday() < 5]
-        appt_today, appt_future = _timed("appointments", get_schedule_appointments, cursor, today)
-        remed_counts, remed_details = _timed("remediations", get_remediation_stats, cursor, start, end)
-        assigned_details = _timed("assigned_details", get_assigned_lead_details, cursor, start, end)
-        activity_details = _timed("activity_details", get_total_activity_lead_details, cursor, start, end)
-        pipeline_tiles, pipeline_call_counts, pipeline_call_details = _timed("pipeline_tiles", get_pipeline_tile_data, cursor, start, end)
-        cbc_counts = _timed("contact_before_close", get_contact_before_close, cursor, start, end)
-        unassigned_leads = _timed("unassigned_leads", get_unassigned_leads, cursor)
-    finally:
-        cursor.close(); conn.close()
+def _mode_pipeline(res, wb_mode):
+    """Pipeline counts; in Total Activity mode assigned comes from the broader lead set.
 
-    # In Total Activity mode, override assigned counts and use broader lead set
+    (Copied — stage results may be shared cache entries.)
+    """
+    pipeline = res["pipeline"]
     if wb_mode == "activity":
-        pipeline["assigned"] = {int(uid): len(leads) for uid, leads in activity_details.items()}
-        effective_details = activity_details
-    else:
-        effective_details = assigned_details
-
-    # Determine chart axis mode
-    if is_single_day:
-        chart_mode = "hourly"
+        pipeline = {**pipeline, "assigned": {int(uid): len(leads) for uid, leads in res["lead_details"].items()}}
+    return pipeline
+
+def _adviser_base(adv):
+    uid = adv["id"]
+    avatar = AVATAR_FILES.get(uid, {})
+    return {"name": adv["name"], "user_id": uid,
+            "initials": ((adv["first_name"] or " ")[0]+(adv["last_name"] or " ")[0]).strip().upper() or "?",
+            "avatar_color": AVATAR_COLORS.get(uid) or AVATAR_PALETTE[uid % len(AVATAR_PALETTE)],
+            "avatar_url": avatar.get("url", ""), "avatar_srcset": avatar.get("srcset", ""),
+            "avatar_webp_srcset": avatar.get("webp_srcset", "")}
+
+def _team_avgs(perf_rows):
+    """Team averages matching the Performance tfoot row exactly."""
+    n_adv = len(perf_rows)
+    if n_adv:
+        avg_talk_s  = sum(r["talk_per_day_s"]   for r in perf_rows) / n_adv
+        avg_qpd     = sum(r["quotes_per_day"]    for r in perf_rows) / n_adv
+        avg_apd     = sum(r["apps_per_day"]      for r in perf_rows) / n_adv
+        avg_talk_hm = f"{int(avg_talk_s//3600)}:{int((avg_talk_s%3600)//60):02d}"
     else:
-        span = (end - start).days
-        if span <= 4 and start.weekday() == 0:  # starts on Monday, ≤5 days
-            chart_mode = "weekly"
-        else:
-            chart_mode = "daily"
-
+        avg_talk_s = avg_qpd = avg_apd = 0
+        avg_talk_hm = "0:00"
+    return {"talk_mins": round(avg_talk_s/60, 2), "talk_fmt": avg_talk_hm,
+            "qpd": round(avg_qpd, 2), "apd": round(avg_apd, 2)}
+
+def perf_section(res, start, end, wb_mode):
+    """Performance table rows and team averages (needs perf_section_stages)."""
+    perf         = res["perf_stats"]
+    pipeline     = _mode_pipeline(res, wb_mode)
+    remed_counts = res["remediations"]
+    biz_days     = biz_days_in_range(start, end)
     months=biz_days/20 if biz_days else 1
-    perf_rows,checks_rows=[],[]
-
-    for adv in advisers:
-        uid=adv["id"]; name=adv["name"]
-        initials=(adv["first_name"][0]+adv["last_name"][0]).upper()
-        avatar_color=AVATAR_COLORS.get(uid,"#6b7280")
-        avatar_file=AVATAR_FILES.get(uid,"")
-        avatar_url=f"/static/avatars/{avatar_file}" if avatar_file else ""
+    perf_rows=[]
 
+    for adv in res["advisers"]:
+        uid=adv["id"]
         p=perf.get(uid,{})
         days_worked=int(p.get("days_worked",0))
         talk_secs=int(p.get("talk_secs",0))
@@ -1275,21 +2227,7 @@ def index():
         apps_avg=round(apps_value/apps_count,2) if apps_count else 0
         monthly_inf=inforce_value/months if months else 0
 
-        assigned  = pipeline["assigned"].get(uid,0)
-        contacted = pipeline["contacted"].get(uid,0)
-        booked    = pipeline["booked"].get(uid,0)
-        no_contact  = pipeline["no_contact"].get(uid,0)
-        conv_ac = round(contacted/assigned*100,1) if assigned else 0
-        conv_cb = round(booked/contacted*100,1)   if contacted else 0
-        conv_ab = round(booked/assigned*100,1)    if assigned else 0
-
-        _at = appt_today.get(uid,{})  if isinstance(appt_today.get(uid), dict) else {"disc":0,"fu":0,"q":0}
-        _af = appt_future.get(uid,{}) if isinstance(appt_future.get(uid), dict) else {"disc":0,"fu":0,"q":0}
-
-        base={"name":name,"user_id":uid,"initials":initials,
-              "avatar_color":avatar_color,"avatar_url":avatar_url}
-
-        perf_rows.append({**base,
+        perf_rows.append({**_adviser_base(adv),
             "days_worked":days_worked,
             "talk_time":fmt_hms(talk_secs), "talk_per_day":fmt_hms(talk_per_day_s),
             "talk_per_day_s":talk_per_day_s, "talk_time_s":talk_secs,
@@ -1301,31 +2239,97 @@ def index():
             "q2a_pct":round(q2a_pct,1),
             "inforce_count":inforce_count,"inforce_value":inforce_value,
             "inforce_color":color_inforce(monthly_inf),
-            "assigned":assigned,
+            "assigned":pipeline["assigned"].get(uid,0),
             "remed_pending":remed_counts.get(uid,{}).get("pending",0),
             "remed_total":remed_counts.get(uid,{}).get("total",0),
         })
-        checks_rows.append({**base,
+
+    team_avgs = _team_avgs(perf_rows)
+
+    if "comparison" in res:
+        prev_start, prev_end = res["comparison"]["range"]
+        _attach_previous(perf_rows, perf_section(_previous(res), prev_start, prev_end, "funnel")["perf_rows"],
+                         _PERF_DELTAS, wb_mode)
+
+    return {"biz_days": biz_days, "months": months, "perf_rows": perf_rows, "team_avgs": team_avgs}
+
+def checks_section(res, wb_mode):
+    """Daily Checks rows (needs checks_section_stages)."""
+    perf     = res["perf_stats"]
+    pipeline = _mode_pipeline(res, wb_mode)
+    appt_today, appt_future = res["appointments"]
+    cbc_counts = res["contact_before_close"]
+    checks_rows=[]
+
+    for adv in res["advisers"]:
+        uid=adv["id"]
+        p=perf.get(uid,{})
+        assigned  = pipeline["assigned"].get(uid,0)
+        contacted = pipeline["contacted"].get(uid,0)
+        booked    = pipeline["booked"].get(uid,0)
+        no_contact  = pipeline["no_contact"].get(uid,0)
+        conv_ac = round(contacted/assigned*100,1) if assigned else 0
+        conv_cb = round(booked/contacted*100,1)   if contacted else 0
+        conv_ab = round(booked/assigned*100,1)    if assigned else 0
+
+        _at = appt_today.get(uid,{})  if isinstance(appt_today.get(uid), dict) else {"disc":0,"fu":0,"q":0}
+        _af = appt_future.get(uid,{}) if isinstance(appt_future.get(uid), dict) else {"disc":0,"fu":0,"q":0}
+
+        checks_rows.append({**_adviser_base(adv),
             "assigned":assigned,"contacted":contacted,"not_contacted":no_contact,
             "booked":booked,
-            "quotes_count":quotes_count,"apps_count":apps_count,"apps_value":apps_value,
-            "inforce_count":inforce_count,"inforce_value":inforce_value,
+            "quotes_count":int(p.get("quotes_count",0)),"apps_count":int(p.get("apps_count",0)),
+            "apps_value":float(p.get("apps_value",0)),
+            "inforce_count":int(p.get("inforce_count",0)),"inforce_value":float(p.get("inforce_value",0)),
             "cbc": cbc_counts.get(uid, 0.0),
             "conv_ac":conv_ac,"conv_cb":conv_cb,"conv_ab":conv_ab,
             "today_disc":_at.get("disc",0),"today_fu":_at.get("fu",0),"today_q":_at.get("q",0),
             "future_disc":_af.get("disc",0),"future_fu":_af.get("fu",0),"future_q":_af.get("q",0),
         })
+    if "comparison" in res:
+        _attach_previous(checks_rows, checks_section(_previous(res), "funnel")["checks_rows"],
+                         _CHECKS_DELTAS, wb_mode)
+    return {"checks_rows": checks_rows}
+
+def chart_section(res, start, end):
+    """Chart dates and per-adviser series (needs every shell stage)."""
+    resolution = chart_resolution(start, end)
+    if resolution == "hour":
+        dates_list, daily_by_user, calls_day = res["hourly_series"]
+        assigned_d, contacted_d, no_contact_d, booked_d = res["hourly_pipeline"]
+    elif resolution == "day":
+        dates_list, daily_by_user, calls_day = res["daily_series"]
+        dates_list = _with_calendar_dates(dates_list, start, end)
+        assigned_d, contacted_d, no_contact_d, booked_d = res["daily_pipeline"]
+        # For weekly mode keep weekdays (Mon-Fri); for daily/monthly also strip weekends
+        dates_list = [d for d in dates_list if date.fromisoformat(d).weekday() < 5]
+    else:
+        # Week/month buckets already hold weekday sums, one point per period
+        dates_list, daily_by_user, calls_day = res["period_series"]
+        assigned_d, contacted_d, no_contact_d, booked_d = res["period_pipeline"]
+
+    # Determine chart axis mode
+    if resolution == "hour":
+        chart_mode = "hourly"
+    elif resolution in ("week", "month"):
+        chart_mode = "by_" + resolution
+    else:
+        span = (end - start).days
+        if span <= 4 and start.weekday() == 0:  # starts on Monday, ≤5 days
+            chart_mode = "weekly"
+        else:
+            chart_mode = "daily"
 
     chart_advisers=[]
-    for adv in advisers:
+    for adv in res["advisers"]:
         uid=adv["id"]; udata=daily_by_user.get(uid,{}); ucalls=calls_day.get(uid,{})
         ucont=contacted_d.get(uid,{})
-        _av_file=AVATAR_FILES.get(uid,"")
+        base=_adviser_base(adv)
         series={
             "uid":uid,"name":adv["name"],
-            "initials":(adv["first_name"][0]+adv["last_name"][0]).upper(),
-            "avatar_color":AVATAR_COLORS.get(uid,"#6b7280"),
-            "avatar_url":f"/static/avatars/{_av_file}" if _av_file else "",
+            "initials":base["initials"],
+            "avatar_color":base["avatar_color"],
+            "avatar_url":base["avatar_url"],
             "talk_mins":[],"quotes_cnt":[],"apps_cnt":[],"apps_val":[],"inforce_val":[],"calls_cnt":[],
         }
         for d in dates_list:
@@ -1338,7 +2342,22 @@ def index():
             series["calls_cnt"].append(ucont.get(d,0))
         chart_advisers.append(series)
 
-    # ── Quick-filter presets (D0, D1, W0, W1, M0, M1) ────────────────────
+    return {"dates_list": dates_list, "chart_advisers": chart_advisers, "chart_mode": chart_mode}
+
+def build_dashboard_data(start, end, wb_mode, group, today=None, max_workers=QUERY_CONCURRENCY, compare=None):
+    """Run the shell stages concurrently and build per-adviser rows and chart series."""
+    today = today or date.today()
+    timer = _stage_timer(start, end)
+    res = timer("stages", run_stages, _shell_stages(start, end, today, wb_mode, group, compare), timer, max_workers)
+    if compare:
+        _expand_comparison(res)
+    return {**perf_section(res, start, end, wb_mode), **checks_section(res, wb_mode),
+            **chart_section(res, start, end)}
+
+
+def preset_ranges(today):
+    """Quick-filter presets (D0, D1, W0, W1, M0, M1) as ``{name: (start, end)}``."""
+    min_date_obj = date.fromisoformat(MIN_DATE)
     # D0 = today, D1 = yesterday
     d0_start = today;           d0_end = today
     d1_start = today - timedelta(days=1); d1_end = d1_start
@@ -1355,58 +2374,849 @@ def index():
     m0_end   = today
     m1_end   = m0_start - timedelta(days=1)       # last day of previous month
     m1_start = max(m1_end.replace(day=1), min_date_obj)
+    return {"D0": (d0_start, d0_end), "D1": (d1_start, d1_end),
+            "W0": (w0_start, w0_end), "W1": (w1_start, w1_end),
+            "M0": (m0_start, m0_end), "M1": (m1_start, m1_end)}
+
+
+# ── Preset pre-warming (see prewarm.py) ──────────────────────────────────────
+# One worker per host rebuilds every preset in the background; any worker
+# serves a preset click from the snapshot while it is fresh.
+PREWARM_CONCURRENCY = int(os.environ.get("PREWARM_CONCURRENCY", 1))  # keep most of the pool for users
+
+prewarmer = prewarm.Prewarmer(
+    preset_ranges,
+    lambda start, end, mode, group, today: build_dashboard_data(start, end, mode, group, today, PREWARM_CONCURRENCY),
+    groups=GROUP_IDS,
+    version=lambda: poller.read_state()["version"],
+    # Builds run outside any request, so apply pending changes to the cache here
+    before_build=lambda: _drop_stale_live_results(),
+)
 
-    # Pre-compute team averages matching the tfoot row exactly
-    n_adv = len(perf_rows)
-    if n_adv:
-        avg_talk_s  = sum(r["talk_per_day_s"]   for r in perf_rows) / n_adv
-        avg_qpd     = sum(r["quotes_per_day"]    for r in perf_rows) / n_adv
-        avg_apd     = sum(r["apps_per_day"]      for r in perf_rows) / n_adv
-        avg_talk_hm = f"{int(avg_talk_s//3600)}:{int((avg_talk_s%3600)//60):02d}"
-    else:
-        avg_talk_s = avg_qpd = avg_apd = 0
-        avg_talk_hm = "0:00"
-    team_avgs = {"talk_mins": round(avg_talk_s/60, 2), "talk_fmt": avg_talk_hm,
-                 "qpd": round(avg_qpd, 2), "apd": round(avg_apd, 2)}
+def dashboard_data(start, end, wb_mode, group, today=None, compare=None):
+    """build_dashboard_data(), from a warm preset snapshot when one matches.
 
-    # Parse multi-select adviser param (default excludes Lucas 53)
-    selected_adviser_raw = request.args.get("adviser", "")
-    if selected_adviser_raw:
-        selected_advisers = [s.strip() for s in selected_adviser_raw.split(",") if s.strip()]
+    Today alone is answered by the live day, which is fresher than any snapshot.
+    Comparisons are not pre-warmed; their stages share the cached queries.
+    """
+    today = today or date.today()
+    if compare:
+        return build_dashboard_data(start, end, wb_mode, group, today, compare=compare)
+    if not start == end == today:
+        data = prewarmer.lookup(start, end, wb_mode, group, today)
+        if data is not None:
+            log.info("Dashboard data %s..%s (%s, group %s) served from prewarmed snapshot",
+                     start, end, wb_mode, group)
+            return data
+    return build_dashboard_data(start, end, wb_mode, group, today)
+
+@app.before_request
+def _start_prewarmer():
+    prewarmer.start()
+
+@app.route("/api/prewarm")
+@login_required
+def api_prewarm():
+    """When each preset snapshot was last built and how long it took."""
+    return jsonify(prewarmer.status())
+
+
+# ── Wall display ─────────────────────────────────────────────────────────────
+# Floor TVs show /wall (or poll /api/wall) instead of reloading "/".  Both are
+# answered from the prewarmer's snapshot of WALL_PRESET, never from MySQL: a
+# request costs a stat of the snapshot file and, per snapshot, one rendered
+# body shared by every viewer.  A stale snapshot is still served, flagged,
+# while the prewarmer catches up.
+WALL_PRESET       = os.environ.get("WALL_PRESET", "M0")
+WALL_REFRESH_SECS = int(os.environ.get("WALL_REFRESH_SECS", 60))
+_wall_bodies = {}   # (kind, preset, mode, group, advisers) -> (stamp, etag, mimetype, {encoding: body})
+_WALL_BODIES_MAX = 64
+_wall_lock = threading.Lock()
+
+def _wall_payload(snap, fresh, group, advisers):
+    data = snap["data"]
+    perf_rows = [r for r in data["perf_rows"] if str(r["user_id"]) in advisers]
+    return {
+        "preset": snap["preset"], "mode": snap["mode"], "group": group, "group_name": GROUPS[group],
+        "start": snap["start"].isoformat(), "end": snap["end"].isoformat(),
+        "built_at": datetime.fromtimestamp(snap["built_at"]).isoformat(timespec="seconds"),
+        "built_at_ts": snap["built_at"], "stale": not fresh,
+        "biz_days": data["biz_days"], "team_avgs": _team_avgs(perf_rows), "perf_rows": perf_rows,
+        "checks_rows": [r for r in data["checks_rows"] if str(r["user_id"]) in advisers],
+    }
+
+def _wall_error(kind, msg, status):
+    body = jsonify({"error": msg}) if kind == "json" else render_template("error.html", error_msg=msg)
+    resp = make_response(body, status)
+    if status == 503:
+        resp.headers["Retry-After"] = str(WALL_REFRESH_SECS)
+    return resp
+
+def _wall_response(kind):
+    """Snapshot body for /wall ("html") or /api/wall ("json"), rendered and compressed once per snapshot."""
+    preset = request.args.get("preset", WALL_PRESET).upper()
+    mode = request.args.get("mode", prewarm.PREWARM_MODES[0] if prewarm.PREWARM_MODES else "funnel")
+    if preset not in preset_ranges(date.today()) or mode not in prewarm.PREWARM_MODES:
+        return _wall_error(kind, f"No wall snapshot for preset {preset!r} in mode {mode!r}", 404)
+    group = _requested_group()
+    latest = prewarmer.latest(preset, mode, group)
+    if latest is None:
+        return _wall_error(kind, "The wall snapshot has not been built yet", 503)
+    snap, fresh = latest
+    advisers = tuple(_requested_advisers(r["user_id"] for r in snap["data"]["perf_rows"]))
+    key, stamp = (kind, preset, mode, group, advisers), (snap["built_at"], fresh)
+    with _wall_lock:
+        cached = _wall_bodies.get(key)
+    if cached is None or cached[0] != stamp:
+        payload = _wall_payload(snap, fresh, group, set(advisers))
+        if kind == "json":
+            body, mimetype = app.json.dumps(payload), "application/json"
+        else:
+            body, mimetype = render_template("wall.html", refresh_secs=WALL_REFRESH_SECS,
+                                                 old_after_secs=3 * max(prewarm.PREWARM_INTERVAL_SECS, 60),
+                                                 **payload), "text/html"
+        etag = hashlib.sha1(repr((key, stamp)).encode()).hexdigest()[:16]
+        cached = (stamp, etag, mimetype, {None: body.encode("utf-8")})
+        with _wall_lock:
+            if len(_wall_bodies) >= _WALL_BODIES_MAX:
+                _wall_bodies.clear()
+            _wall_bodies[key] = cached
+    _, etag, mimetype, bodies = cached
+    encoding = _accepted_encoding() if len(bodies[None]) >= COMPRESS_MIN_BYTES else None
+    if encoding not in bodies:
+        bodies[encoding] = _encode_body(bodies[None], encoding)
+    resp = Response(bodies[encoding], mimetype=mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.headers["X-Snapshot-Age"] = str(int(time.time() - snap["built_at"]))
+    return resp.make_conditional(request)
+
+@app.route("/wall")
+@login_required
+def wall():
+    """Read-only Performance + Daily Checks board for floor screens."""
+    return _wall_response("html")
+
+@app.route("/api/wall")
+@login_required
+def api_wall():
+    """Wall snapshot rows, team averages and staleness as JSON."""
+    return _wall_response("json")
+
+
+# ── Conditional responses (ETag / 304) and compression ──────────────────────
+# A dashboard response depends only on the data, the request parameters,
+# settings.json and the deployed code.  Those are hashed into a weak ETag that
+# is checked before any get_* query runs, so reloading unchanged data costs a
+# briefly cached watermark lookup and an empty 304.
+ETAG_WATERMARK_TTL_SECS = float(os.environ.get("ETAG_WATERMARK_TTL_SECS", 5))
+COMPRESS_MIN_BYTES      = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_LEVEL          = int(os.environ.get("COMPRESS_LEVEL", 6))   # gzip 1–9; brotli quality is 5
+_COMPRESSIBLE = {"text/html", "text/plain", "text/css", "text/csv", "text/javascript", "image/svg+xml",
+                 "application/javascript", "application/json", "application/x-ndjson"}
+_STREAM_COMPRESSIBLE = {"text/html", "text/csv", "application/x-ndjson"}   # not SSE
+
+try:
+    import brotli   # optional — gzip only without it
+except ImportError:
+    brotli = None
+
+def _code_stamp():
+    """Hash of app.py, the templates and static/, so a deploy changes every ETag."""
+    base = os.path.dirname(os.path.abspath(__file__))
+    tpl = os.path.join(base, "templates")
+    h = hashlib.sha1()
+    for path in [os.path.join(base, "app.py")] + sorted(os.path.join(tpl, f) for f in os.listdir(tpl)):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    h.update(ASSETS.stamp.encode())   # pages link assets by hash
+    return h.hexdigest()[:12]
+
+_CODE_STAMP = _code_stamp()
+
+_watermarks = (float("-inf"), None)   # (monotonic fetched_at, {source: watermark})
+_watermarks_lock = threading.Lock()
+
+def data_watermarks():
+    """_change_watermarks(), reused for ETAG_WATERMARK_TTL_SECS by every request in this worker."""
+    global _watermarks
+    with _watermarks_lock:
+        if time.monotonic() - _watermarks[0] >= ETAG_WATERMARK_TTL_SECS:
+            _watermarks = (time.monotonic(), _change_watermarks())
+        return _watermarks[1]
+
+def _settings_version():
+    try:
+        return os.stat(SETTINGS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _data_etag(track_past, current_state):
+    """Data-version token for the current request.
+
+    Ranges reaching today also carry the CACHE_TTL_LIVE period, so a tag never
+    outlives the cached live results behind it.  Past ranges only change with
+    the date (their results are cached for the day) unless ``track_past``, or
+    ``current_state``: the response shows lead status, notes or pending
+    remediations as they are now, cached like live results whatever the range.
+    """
+    today = date.today()
+    _, end = _requested_range(today)
+    parts = [_CODE_STAMP, today.isoformat(), request.full_path, _settings_version()]
+    if end >= today or track_past or current_state:
+        parts += sorted((k, str(v)) for k, v in data_watermarks().items())
+    if end >= today or current_state:
+        parts.append(int(time.time() // CACHE_TTL_LIVE))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def conditional(track_past=False, current_state=False):
+    """Decorator — answer If-None-Match with 304 while the data-version ETag matches."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            try:
+                etag = _data_etag(track_past, current_state)
+            except Exception as e:
+                log.warning("[etag] %s", e)
+                return view(*args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                resp = Response(status=304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            resp.vary.add("Accept-Encoding")
+            return resp
+        return wrapped
+    return decorator
+
+def _accepted_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    return "gzip" if accepted["gzip"] else None
+
+def _encode_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+
+def _encode_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk, flushing each so the browser can render it."""
+    if encoding == "br":
+        c = brotli.Compressor(quality=5)
+        compress, flush, finish = c.process, c.flush, c.finish
     else:
-        selected_advisers = [str(uid) for uid in sorted(SHOW_USER_IDS) if uid != 53]
+        c = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)   # 31: gzip container
+        compress, flush, finish = c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+    try:
+        for chunk in chunks:
+            data = compress(chunk.encode() if isinstance(chunk, str) else chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+@app.after_request
+def _compress(resp):
+    """brotli or gzip for text responses the client accepts.
+
+    Streamed HTML (the streamed dashboard) and exports are compressed and
+    flushed chunk by chunk; other streams (SSE) and files are left alone.
+    """
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.mimetype not in _COMPRESSIBLE
+            or "Content-Encoding" in resp.headers):
+        return resp
+    if resp.is_streamed:
+        if resp.mimetype in _STREAM_COMPRESSIBLE:
+            resp.vary.add("Accept-Encoding")
+            encoding = _accepted_encoding()
+            if encoding:
+                resp.response = _encode_stream(resp.response, encoding)
+                resp.headers["Content-Encoding"] = encoding
+        return resp
+    resp.vary.add("Accept-Encoding")
+    body = resp.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return resp
+    encoding = _accepted_encoding()
+    if encoding:
+        resp.set_data(_encode_body(body, encoding))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+# ── Static assets ────────────────────────────────────────────────────────────
+# Templates link static files through asset_url(), which gives their hashed
+# /assets/ URL (assets.py).  A hashed name is served from memory, compressed
+# once per encoding, with an immutable year-long Cache-Control; an outdated
+# hash (a page rendered before a deploy) redirects to the current version.
+app.jinja_env.globals["asset_url"] = ASSETS.url
+
+@app.route(assets.ASSET_URL_PREFIX + "<path:name>")
+def asset(name):
+    found = ASSETS.resolve(name)
+    if found is None:
+        return Response("Not found", status=404, mimetype="text/plain")
+    rel, current = found
+    if not current:
+        resp = redirect(ASSETS.url(rel))
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    mimetype = ASSETS.mimetype(rel)
+    encoding = _accepted_encoding() if mimetype in _COMPRESSIBLE else None
+    resp = Response(ASSETS.body(rel, encoding, _encode_body), mimetype=mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = f"public, max-age={assets.ASSET_MAX_AGE_SECS}, immutable"
+    return resp
+
+@app.cli.command("avatar-thumbs")
+@click.option("--force", is_flag=True, help="Rewrite thumbnails that are already up to date.")
+def avatar_thumbs(force):
+    """Write JPEG and WebP avatar thumbnails to static/avatars/thumbs (needs Pillow)."""
+    try:
+        written = assets.build_avatar_thumbs(force=force)
+    except ImportError:
+        raise click.ClickException("Pillow is not installed — pip install Pillow")
+    click.echo(f"{written} thumbnail(s) written to {assets.AVATAR_THUMB_DIR}")
+
+
+# ── Streamed render ──────────────────────────────────────────────────────────
+# With STREAM_RENDER the page head, CSS and shell are sent before any query
+# runs.  Each section follows as a <template> chunk as soon as its stages are
+# done (LipStream.fill in dashboard.html): the performance table first, then
+# Daily Checks, then the page script with the chart data.  Once the
+# performance table is out, the slide-in data in STREAM_PREFETCH is fetched
+# on one more connection and sent inline, so opening a panel needs no request.
+# Warm preset snapshots and ?stream=0 render in one piece; a stream whose
+# stages fail reloads itself with ?stream=0 to get the usual error page.
+STREAM_RENDER   = os.environ.get("STREAM_RENDER", "1") == "1"
+STREAM_PREFETCH = tuple(p.strip() for p in
+                        os.environ.get("STREAM_PREFETCH", "unassigned,leads,pipeline-tiles").split(",") if p.strip())
+
+def pipeline_tiles_payload(result):
+    """/api/pipeline-tiles body: tiles plus per-lead call totals."""
+    tiles, _, call_details = result
+    return {"tiles": tiles, "call_totals": {lid: len(calls) for lid, calls in call_details.items()}}
+
+# STREAM_PREFETCH name -> (lazy endpoint the page would fetch, stage, JSON payload from its result)
+_PREFETCH = {
+    "unassigned":     ("/api/unassigned",
+                       lambda start, end, group: Stage("unassigned_leads", get_unassigned_leads, group),
+                       lambda result, wb_mode: result),
+    "leads":          ("/api/leads",
+                       lambda start, end, group: Stage("lead_details", get_lead_details, start, end, group),
+                       leads_for_mode),
+    "pipeline-tiles": ("/api/pipeline-tiles",
+                       lambda start, end, group: Stage("pipeline_tiles", get_pipeline_tile_data, start, end, group),
+                       lambda result, wb_mode: pipeline_tiles_payload(result)),
+}
+
+def _render_block(template_name, block, context):
+    """One ``{% block %}`` of a template, with the same context processors as render_template."""
+    app.update_template_context(context)
+    tmpl = app.jinja_env.get_template(template_name)
+    return "".join(tmpl.blocks[block](tmpl.new_context(context)))
+
+def _stream_chunk(slots, context):
+    """Rendered partials for ``{slot: template}``, each followed by its LipStream.fill() call."""
+    return "".join(f'<template>{render_template(partial, **context)}</template>'
+                   f'<script>LipStream.fill({json.dumps(slot)})</script>\n'
+                   for slot, partial in slots.items())
+
+def _streams(start, end, wb_mode, group, today, compare=None):
+    if not STREAM_RENDER or request.args.get("stream") == "0":
+        return False
+    return bool(compare) or start == end == today or prewarmer.lookup(start, end, wb_mode, group, today) is None
+
+def stream_dashboard(ctx, start, end, wb_mode, group, today, req_t0, compare=None):
+    """Streamed "/" response: shell now, sections and slide-in data as their stages finish."""
+    shell = _shell_stages(start, end, today, wb_mode, group, compare)
+    shell_names = {s.name for s in shell}
+    prefetch = {}   # stage name -> _PREFETCH entry
+    for name in STREAM_PREFETCH:
+        if name not in _PREFETCH:
+            log.warning("Unknown STREAM_PREFETCH entry %r", name)
+            continue
+        path, make_stage, payload = _PREFETCH[name]
+        prefetch[make_stage(start, end, group).name] = (path, make_stage, payload)
+    timer = _stage_timer(start, end)
+    events = queue.Queue()   # (stage name, result), or (None, (group, error)) when a group ends
+
+    def run(group, stages, max_workers):
+        try:
+            run_stages(stages, timer, max_workers, on_result=lambda name, result: events.put((name, result)))
+        except Exception as e:
+            events.put((None, (group, e)))
+        else:
+            events.put((None, (group, None)))
+
+    def start_group(group, stages, max_workers):
+        threading.Thread(target=run, args=(group, stages, max_workers),
+                         name=f"stream-{group}", daemon=True).start()
+
+    sections = [
+        ("perf", perf_section_stages(wb_mode), lambda res: perf_section(res, start, end, wb_mode),
+         {"adviser-picker": "_adviser_picker.html", "perf-table": "_perf_table.html", "wb-table": "_wb_table.html"}),
+        ("checks", checks_section_stages(wb_mode), lambda res: checks_section(res, wb_mode),
+         {"checks-table": "_checks_table.html"}),
+        ("charts", tuple(shell_names), lambda res: chart_section(res, start, end), None),
+    ]
+
+    def chunks():
+        start_group("shell", shell, QUERY_CONCURRENCY)
+        yield render_template("dashboard.html", streaming=True,
+                              stream_prefetch=[path for path, _, _ in prefetch.values()], **ctx)
+        res, context, running, sent, perf_out = {}, dict(ctx), {"shell"}, set(), False
+        while running:
+            name, result = events.get()
+            if name is None:
+                group, error = result
+                running.discard(group)
+                if error is not None and group == "shell":
+                    log.error("Streamed dashboard %s..%s failed: %s", start, end, error)
+                    yield "<script>LipStream.fallback()</script>\n"
+                    return
+                continue
+            res[name] = result
+            if name == "comparison":
+                _expand_comparison(res)
+            while sections and all(n in res for n in sections[0][1]):
+                section, _, build, slots = sections.pop(0)
+                context.update(build(res))
+                if slots:
+                    yield _stream_chunk(slots, context)
+                else:
+                    context["months"] = round(context["months"], 2)
+                    yield _render_block("dashboard.html", "page_script", context)
+                if section == "perf":
+                    perf_out = True
+                    later = [make_stage(start, end, group) for n, (_, make_stage, _) in prefetch.items() if n not in res]
+                    if later:
+                        running.add("prefetch")
+                        start_group("prefetch", later, 1)
+            if perf_out:
+                for n, (path, _, payload) in prefetch.items():
+                    if n in res and n not in sent:
+                        sent.add(n)
+                        try:
+                            data = htmlsafe_json_dumps(payload(res[n], wb_mode), dumps=app.json.dumps)
+                        except Exception as e:   # the page fetches it itself after LipStream.end()
+                            log.warning("[stream] %s: %s", path, e)
+                            continue
+                        yield f"<script>LipStream.put({json.dumps(path)},{data})</script>\n"
+        yield "<script>LipStream.end()</script>\n</body>\n</html>\n"
+        total = time.monotonic() - req_t0
+        log.info("Dashboard total (streamed): %.0f ms", total * 1000)
+        metrics.REGISTRY.observe("lip_request_duration_seconds", total, endpoint="index", status="200")
+
+    return Response(stream_with_context(chunks()), mimetype="text/html")
+
+
+@app.route("/")
+@login_required
+@conditional(track_past=True, current_state=True)
+def index():
+    req_t0 = time.monotonic()
+    today     = date.today()
+    start, end = _requested_range(today)
+    wb_mode    = _requested_mode()
+    group      = _requested_group()
+    compare    = _requested_compare(start, end)
+
+    log.info("Dashboard request: %s to %s (group %s)%s", start, end, group,
+             f" vs {compare[0]} to {compare[1]}" if compare else "")
+    ctx = _page_context(start, end, wb_mode, group, today, compare)
+    if _streams(start, end, wb_mode, group, today, compare):
+        return stream_dashboard(ctx, start, end, wb_mode, group, today, req_t0, compare)
+
+    data = dashboard_data(start, end, wb_mode, group, today, compare)
 
     total_ms = (time.monotonic() - req_t0) * 1000
     log.info("Dashboard total: %.0f ms", total_ms)
 
-    return render_template("dashboard.html",
-        start=start.isoformat(), end=end.isoformat(), min_date=MIN_DATE, max_date=db_max_date.isoformat(),
-        biz_days=biz_days, months=round(months, 2),
-        perf_rows=perf_rows, checks_rows=checks_rows,
-        dates_list=dates_list,
-        chart_advisers=chart_advisers,
-        selected_advisers=selected_advisers, active_tab=active_tab,
-        last_refresh=data_updated_str,
-        lbd=lbd.isoformat(), today_iso=today.isoformat(),
-        d0_start=d0_start.isoformat(), d0_end=d0_end.isoformat(),
-        d1_start=d1_start.isoformat(), d1_end=d1_end.isoformat(),
-        w0_start=w0_start.isoformat(), w0_end=w0_end.isoformat(),
-        w1_start=w1_start.isoformat(), w1_end=w1_end.isoformat(),
-        m0_start=m0_start.isoformat(), m0_end=m0_end.isoformat(),
-        m1_start=m1_start.isoformat(), m1_end=m1_end.isoformat(),
-        team_avgs=team_avgs,
-        chart_mode=chart_mode,
-        remed_details=remed_details,
-        assigned_details=effective_details,
-        pipeline_tiles=pipeline_tiles,
-        pipeline_call_details=pipeline_call_details,
+    return render_template("dashboard.html", streaming=False,
+                           **{**ctx, **data, "months": round(data["months"], 2)})
+
+def _refresh_label():
+    """'Data Updated To' text from the newest call (the cached change watermark)."""
+    try:
+        raw_utc = data_watermarks()["calls"]
+        if raw_utc and hasattr(raw_utc, 'strftime'):
+            raw_dt = tzbucket.to_local(raw_utc)
+            return raw_dt.strftime("%d/%m/%y · %I:%M %p ").lstrip('0') + tzbucket.tz_abbr(raw_utc)
+    except Exception as _e:
+        log.warning("[refresh_dt] %s", _e)
+    return datetime.now().strftime("%d/%m/%y")
+
+def _requested_advisers(uids):
+    """Adviser ids (as strings) from ?adviser=1,2; by default all of ``uids`` but NON_CONSULTANT_IDS."""
+    selected_adviser_raw = request.args.get("adviser", "")
+    if selected_adviser_raw:
+        return [s.strip() for s in selected_adviser_raw.split(",") if s.strip()]
+    return [str(uid) for uid in sorted(uids) if uid not in NON_CONSULTANT_IDS]
+
+def _requested_group():
+    """?group= when it is one of LIP_GROUP_IDS, else LIP_GROUP_ID."""
+    group = request.args.get("group", type=int)
+    return group if group in GROUPS else GROUP_ID
+
+def _page_context(start, end, wb_mode, group, today, compare=None):
+    """Template variables for "/" that don't depend on the dashboard queries (bar the cached member list)."""
+    presets = preset_ranges(today)
+    active_tab = request.args.get("tab","perf")
+
+    selected_advisers = _requested_advisers(a["id"] for a in _run_one("advisers", get_advisers, group))
+
+    return dict(
+        start=start.isoformat(), end=end.isoformat(), min_date=MIN_DATE,
+        biz_days=biz_days_in_range(start, end),
+        selected_advisers=selected_advisers, selected_adviser_set=set(selected_advisers),
+        group=group, groups=GROUPS, active_tab=active_tab,
+        shown_tab=active_tab if active_tab in ("perf", "checks", "workbench") else "perf",
+        last_refresh=_refresh_label(),
+        today_iso=today.isoformat(),
+        **{f"{name.lower()}_{part}": d.isoformat()
+           for name, rng in presets.items() for part, d in zip(("start", "end"), rng)},
         lead_status=LEAD_STATUS,
         crm_base_url=CRM_BASE_URL,
         wb_mode=wb_mode,
-        unassigned_leads=unassigned_leads,
+        compare=bool(compare),
+        compare_label=" – ".join(d.strftime("%d/%m/%y") for d in compare) if compare else "",
+        poll_version=poller.read_state()["version"],
     )
 
 
+# ── Lazily loaded widget data ────────────────────────────────────────────────
+# The page shell renders the tables and charts; everything below is fetched by
+# the browser only when its tab becomes visible or its slide-in panel opens.
+# All endpoints take the same ?start=&end=&mode=&group= parameters as "/".
+
+# With ?partials=1 the table endpoints also return the rendered table
+# partials (by stream slot), which the page swaps in on a live update.
+_TABLE_PARTIALS = {"performance": {"perf-table": "_perf_table.html", "wb-table": "_wb_table.html"},
+                   "funnel":      {"checks-table": "_checks_table.html"}}
+
+def _with_partials(payload, widget, data):
+    if request.args.get("partials") == "1":
+        payload["html"] = {slot: render_template(partial, **data)
+                           for slot, partial in _TABLE_PARTIALS[widget].items()}
+    return jsonify(payload)
+
+@app.route("/api/performance")
+@login_required
+@conditional()
+def api_performance():
+    start, end = _requested_range()
+    data = dashboard_data(start, end, _requested_mode(), _requested_group(), compare=_requested_compare(start, end))
+    return _with_partials({k: data[k] for k in ("perf_rows", "team_avgs", "biz_days", "months")},
+                          "performance", data)
+
+@app.route("/api/funnel")
+@login_required
+@conditional(current_state=True)
+def api_funnel():
+    start, end = _requested_range()
+    data = dashboard_data(start, end, _requested_mode(), _requested_group(), compare=_requested_compare(start, end))
+    return _with_partials({"checks_rows": data["checks_rows"]}, "funnel", data)
+
+@app.route("/api/charts")
+@login_required
+@conditional(current_state=True)
+def api_charts():
+    """Chart dates and per-adviser series, as rendered into the page script."""
+    start, end = _requested_range()
+    data = dashboard_data(start, end, _requested_mode(), _requested_group(), compare=_requested_compare(start, end))
+    return jsonify({k: data[k] for k in ("dates_list", "chart_advisers", "chart_mode")})
+
+@app.route("/api/leads")
+@app.route("/api/leads/<int:uid>")
+@login_required
+@conditional(current_state=True)
+def api_leads(uid=None):
+    """Lead details per adviser — assigned cohort (funnel) or all touched leads (activity)."""
+    start, end = _requested_range()
+    details = leads_for_mode(_run_one("lead_details", get_lead_details, start, end, _requested_group()),
+                             _requested_mode())
+    return jsonify(details if uid is None else details.get(uid, []))
+
+@app.route("/api/pipeline-tiles")
+@login_required
+@conditional(current_state=True)
+def api_pipeline_tiles():
+    """Pipeline tiles plus per-lead call totals (details come from /api/calls/<lead_id>)."""
+    start, end = _requested_range()
+    return jsonify(pipeline_tiles_payload(_run_one("pipeline_tiles", get_pipeline_tile_data,
+                                                   start, end, _requested_group())))
+
+@app.route("/api/calls/<int:lead_id>")
+@login_required
+@conditional()
+def api_calls(lead_id):
+    start, end = _requested_range()
+    _, _, call_details = _run_one("pipeline_tiles", get_pipeline_tile_data, start, end, _requested_group())
+    return jsonify(call_details.get(lead_id, []))
+
+@app.route("/api/remediations")
+@app.route("/api/remediations/<int:uid>")
+@login_required
+@conditional(current_state=True)
+def api_remediations(uid=None):
+    start, end = _requested_range()
+    details = _run_one("remediation_details", get_remediation_details, start, end, _requested_group())
+    return jsonify(details if uid is None else details.get(uid, []))
+
+@app.route("/api/unassigned")
+@login_required
+@conditional()
+def api_unassigned():
+    return jsonify(_run_one("unassigned_leads", get_unassigned_leads, _requested_group()))
+
+
+# ── Exports ──────────────────────────────────────────────────────────────────
+# /api/export/<kind>.csv|.ndjson streams the rows behind the lead, call and
+# remediation panels for any range, without building them in memory.
+# Remediations come off one unbuffered statement in SCAN_BATCH_ROWS batches.
+# Leads and their calls need a second lookup per lead, so they are read in
+# keyset pages of EXPORT_PAGE_ROWS leads, each page written out before the next
+# is fetched.  Lead actions are resolved unmemoized so an export does not
+# evict the panels' memo.
+EXPORT_PAGE_ROWS = int(os.environ.get("EXPORT_PAGE_ROWS", 1000))
+
+EXPORT_COLUMNS = {
+    "leads": ("lead_id", "adviser_id", "client_name", "status", "source", "referrer",
+              "created_date", "created_at", "assigned_date", "assigned_at", "working_stage",
+              "is_closed", "assigned_in_period", "active_in_period", "user_note", "system_note"),
+    "calls": ("call_id", "lead_id", "adviser_id", "call_time", "duration_secs", "contact"),
+    "remediations": ("req_id", "adviser_id", "lead_id", "client_name", "object_type", "object_id",
+                     "app_id", "task_name", "status", "created_date", "description", "last_note"),
+}
+
+_EXPORT_LEAD_SQL = """
+    SELECT l.id          AS lead_id,
+           l.user_id     AS adviser_id,
+           CONCAT(l.first_name,' ',l.last_name) AS client_name,
+           l.status,
+           l.phone,
+           COALESCE(NULLIF(l.source_code,''), ls.name, NULLIF(l.groups_cache,''), '') AS source_name,
+           COALESCE(NULLIF(l.source_refer,''),
+                    l.datafields->>'$.affiliate_user', '') AS referrer_name,
+           DATE(l.created)                        AS created_date,
+           l.created                               AS created_at,
+           DATE(l.assigned)                        AS assigned_date,
+           l.assigned                              AS assigned_at,
+           (l.assigned >= %s AND l.assigned < %s)  AS assigned_in_period,
+           EXISTS (SELECT 1 FROM leads_leadaction la
+                   WHERE la.object_type = 'lead' AND la.object_id = l.id
+                     AND la.created >= %s AND la.created < %s) AS active_in_period
+    FROM leads_lead l
+    LEFT JOIN leads_leadsource ls ON ls.id = l.source_id
+    WHERE {members}
+      AND l.id > %s
+      {assigned}
+      {excl}
+    {having}
+    ORDER BY l.id
+    LIMIT %s
+"""
+
+def _export_lead_pages(cursor, start, end, group, activity, excl_test=True):
+    """Pages of lead rows (get_lead_details columns plus phone), keyset on lead id.
+
+    Funnel mode is the leads assigned in the range; activity mode adds every
+    lead with a lead action in the range.
+    """
+    range_params = (start.isoformat(), (end + timedelta(days=1)).isoformat())
+    sql = _EXPORT_LEAD_SQL.format(
+        members=_in_groups("l.user_id", group), excl=EXCL_TEST if excl_test else "",
+        assigned="" if activity else "AND l.assigned >= %s AND l.assigned < %s",
+        having="HAVING assigned_in_period OR active_in_period" if activity else "")
+    after = 0
+    while True:
+        params = (*range_params, *range_params, after, *(() if activity else range_params), EXPORT_PAGE_ROWS)
+        cursor.execute(sql, params)
+        page = cursor.fetchall()
+        if not page:
+            return
+        yield page
+        if len(page) < EXPORT_PAGE_ROWS:
+            return
+        after = page[-1]["lead_id"]
+
+def export_leads(cursor, start, end, wb_mode, group):
+    """get_lead_details() rows for the mode, page by page."""
+    for page in _export_lead_pages(cursor, start, end, group, wb_mode == "activity"):
+        ids = [int(r["lead_id"]) for r in page]
+        actions = {}
+        for i in range(0, len(ids), _LEAD_ACTION_CHUNK):
+            actions.update(_fetch_lead_actions(cursor, ids[i:i + _LEAD_ACTION_CHUNK]))
+        for r in page:
+            yield {**_lead_record(r, actions[int(r["lead_id"])]), "adviser_id": r["adviser_id"]}
+
+def export_calls(cursor, start, end, wb_mode, group):
+    """Pipeline-tile call details: calls from each lead's adviser, for leads assigned in the range."""
+    for page in _export_lead_pages(cursor, start, end, group, activity=False, excl_test=False):
+        phone_to_leads, lead_advisers = defaultdict(list), {}
+        for r in page:
+            phone = (r["phone"] or "").strip()
+            if phone:
+                phone_to_leads[phone_index.normalize_phone(phone)].append(r["lead_id"])
+                lead_advisers[r["lead_id"]] = r["adviser_id"]
+        for lid, call, contact in _lead_calls(cursor, phone_to_leads, lead_advisers):
+            yield {**call, "adviser_id": lead_advisers[lid], "contact": contact}
+
+def export_remediations(cursor, start, end, wb_mode, group):
+    """get_remediation_details() rows, streamed off one unbuffered statement."""
+    _execute_remediation_details(cursor, start, end, group)
+    for r in tzbucket.stream(cursor):
+        yield {**_remediation_record(r), "adviser_id": r["adviser_id"]}
+
+_EXPORTS = {"leads": export_leads, "calls": export_calls, "remediations": export_remediations}
+
+@app.route("/api/export/<kind>.<fmt>")
+@login_required
+def api_export(kind, fmt):
+    """Stream lead, call or remediation rows for ?start=&end=&mode= as CSV or NDJSON."""
+    if kind not in _EXPORTS or fmt not in export.FORMATS:
+        return jsonify({"error": f"unknown export {kind}.{fmt}"}), 404
+    start, end = _requested_range()
+    wb_mode = _requested_mode()
+    group = _requested_group()
+    try:
+        conn = get_connection()
+    except Exception as e:
+        raise ConnectionUnavailable(str(e)) from e
+    cursor = conn.cursor(dictionary=True)
+    log.info("Export %s.%s %s..%s (%s, group %s)", kind, fmt, start, end, wb_mode, group)
+
+    def body():
+        done = False
+        try:
+            yield from export.encode(_EXPORTS[kind](cursor, start, end, wb_mode, group), EXPORT_COLUMNS[kind], fmt)
+            done = True
+        finally:
+            if done:
+                cursor.close(); conn.close()
+            else:
+                # Stopped mid-result (client gone or query error): unread rows may be pending
+                conn.discard()
+
+    resp = Response(body(), mimetype=export.FORMATS[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="lip-{kind}-{start}-{end}.{fmt}"'
+    return resp
+
+
+@app.errorhandler(ConnectionUnavailable)
+def connection_unavailable(e):
+    if request.path.startswith("/api/"):
+        return jsonify({"error": str(e)}), 503
+    return render_template("error.html", error_msg=str(e)), 503
+
+
+# ── Live updates: change poller + SSE push ───────────────────────────────────
+# One poller per host (see poller.py) watches these watermarks while a
+# dashboard is connected to /api/stream.  Each source lists the widgets the
+# browser should re-fetch and the cached queries whose live entries go stale.
+CHANGE_SOURCES = {
+    "calls": {
+        "widgets": ("performance", "funnel", "charts", "pipeline-tiles"),
+        "queries": ("get_call_aggregates", "get_performance_stats", "get_pipeline_stats",
+                    "get_hourly_series", "get_hourly_pipeline_series", "get_daily_series",
+                    "get_daily_pipeline_series", "get_period_series", "get_period_pipeline_series",
+                    "get_pipeline_tile_data", "get_contact_before_close", "get_period_comparison"),
+    },
+    "leads": {
+        "widgets": ("funnel", "charts", "leads", "pipeline-tiles", "unassigned"),
+        "queries": ("get_pipeline_stats", "get_hourly_pipeline_series", "get_daily_pipeline_series",
+                    "get_period_pipeline_series", "get_lead_details", "get_pipeline_tile_data",
+                    "get_contact_before_close", "get_unassigned_leads", "get_period_comparison"),
+    },
+    "actions": {
+        "widgets": ("funnel", "charts", "leads", "unassigned"),
+        "queries": ("get_pipeline_stats", "get_hourly_pipeline_series", "get_daily_pipeline_series",
+                    "get_period_pipeline_series", "get_lead_details", "get_unassigned_leads",
+                    "get_period_comparison"),
+    },
+}
+# Each open stream holds a gthread thread; see api_stream() and the README's
+# note on sizing --threads against SSE_MAX_STREAMS.
+SSE_TICK_SECS    = 5
+SSE_MAX_SECS     = int(os.environ.get("SSE_MAX_SECS", 30))
+SSE_RETRY_SECS   = int(os.environ.get("SSE_RETRY_SECS", 5))
+SSE_MAX_STREAMS  = int(os.environ.get("SSE_MAX_STREAMS", 4))   # per worker
+_sse_slots = threading.BoundedSemaphore(max(SSE_MAX_STREAMS, 1))
+
+def _change_watermarks():
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT (SELECT MAX(created)  FROM noojee_callrecord) AS calls,
+                   (SELECT MAX(assigned) FROM leads_lead)        AS leads,
+                   (SELECT MAX(created)  FROM leads_leadaction)  AS actions
+        """)
+        return cursor.fetchone()
+    finally:
+        cursor.close(); conn.close()
+
+change_poller = poller.Poller(_change_watermarks)
+
+@app.before_request
+def _drop_stale_live_results():
+    """Once the poller reports a change, drop this worker's cached live results."""
+    sources = poller.take_new_changes()
+    if sources:
+        query_cache.invalidate_live(q for src in sources for q in CHANGE_SOURCES[src]["queries"])
+
+@app.route("/api/stream")
+@login_required
+def api_stream():
+    """Server-sent events: ``changed`` with the widgets to re-fetch since ``?since=<version>``.
+
+    A stream holds a request thread, so it ends after SSE_MAX_SECS and the
+    browser reconnects after SSE_RETRY_SECS, resuming from the version in
+    ``Last-Event-ID``.  Each worker keeps at most SSE_MAX_STREAMS streams
+    open; past that a connection gets the pending changes and ends at once.
+    """
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", type=int)
+    change_poller.start()
+
+    def events():
+        version = since if since is not None else poller.read_state()["version"]
+        held = _sse_slots.acquire(blocking=False)
+        try:
+            yield f"retry: {SSE_RETRY_SECS * 1000}\nid: {version}\n\n"
+            started = time.monotonic()
+            while True:
+                poller.heartbeat()
+                version, sources = poller.changes_since(version)
+                if sources:
+                    widgets = sorted({w for src in sources for w in CHANGE_SOURCES[src]["widgets"]})
+                    yield (f"event: changed\nid: {version}\n"
+                           f"data: {json.dumps({'version': version, 'widgets': widgets})}\n\n")
+                elif held:
+                    yield ": keepalive\n\n"
+                if not held or time.monotonic() - started >= SSE_MAX_SECS:
+                    return
+                time.sleep(SSE_TICK_SECS)
+        finally:
+            if held:
+                _sse_slots.release()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.errorhandler(500)
 def internal_error(e):
     return render_template("error.html", error_msg="An unexpected server error occurred. Please try again."), 500
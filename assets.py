@@ -0,0 +1,166 @@
+import os
+import hashlib
+import logging
+import mimetypes
+import threading
+
+log = logging.getLogger("lip_analytics.assets")
+
+# Everything under static/ is also served at a content-hashed URL
+# (/assets/dashboard.1a2b3c4d5e.js) with a year-long immutable Cache-Control,
+# so a browser downloads each version of the dashboard CSS/JS and the avatar
+# thumbnails once and repeat page loads transfer only the HTML and data.  A
+# deploy that changes a file changes its URL.  Files are hashed once per
+# process; text bodies are compressed on first request and kept in memory.
+STATIC_DIR         = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSET_URL_PREFIX   = "/assets/"
+ASSET_MAX_AGE_SECS = int(os.environ.get("ASSET_MAX_AGE_SECS", 365 * 86400))
+_HASH_LEN = 10
+
+# Adviser photos are cut into square thumbnails at the sizes the pages draw
+# them (32 CSS px, and 64 for 2x screens), as JPEG and WebP, under
+# static/avatars/thumbs/ by `flask avatar-thumbs`.
+AVATAR_DIR        = os.path.join(STATIC_DIR, "avatars")
+AVATAR_THUMB_DIR  = os.path.join(AVATAR_DIR, "thumbs")
+AVATAR_SIZES      = (32, 64)
+_AVATAR_EXTS      = (".jpeg", ".jpg", ".png", ".webp")
+_JPEG_QUALITY, _WEBP_QUALITY = 85, 80
+
+
+def _hashed_name(rel, digest):
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}.{digest}{ext}"
+
+
+def split_hashed(name):
+    """``(logical path, hash)`` of a hashed asset name, or ``(name, None)``."""
+    stem, ext = os.path.splitext(name)
+    logical, _, digest = stem.rpartition(".")
+    if not logical or len(digest) != _HASH_LEN:
+        return name, None
+    return logical + ext, digest
+
+
+class Manifest:
+    """Content hashes of the files under ``root``, keyed by path relative to it."""
+
+    def __init__(self, root=STATIC_DIR):
+        self.root = root
+        self._hashes = {}
+        self._bodies = {}      # (logical, encoding) -> bytes
+        self._lock = threading.Lock()
+        for dirpath, _, names in os.walk(root):
+            for name in sorted(names):
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    self._hashes[rel] = hashlib.sha256(f.read()).hexdigest()[:_HASH_LEN]
+        self.stamp = hashlib.sha1(repr(sorted(self._hashes.items())).encode()).hexdigest()[:12]
+
+    def __contains__(self, rel):
+        return rel in self._hashes
+
+    def url(self, rel):
+        """Hashed URL of ``static/<rel>``; the plain /static/ URL for files not in the manifest."""
+        digest = self._hashes.get(rel)
+        if digest is None:
+            log.warning("[assets] %s is not in the manifest", rel)
+            return f"/static/{rel}"
+        return ASSET_URL_PREFIX + _hashed_name(rel, digest)
+
+    def resolve(self, name):
+        """``(logical path, current)`` for a requested hashed name; None if no such file.
+
+        ``current`` is False when the hash is an older version's (an HTML page
+        or snapshot rendered before a deploy).
+        """
+        logical, digest = split_hashed(name)
+        if logical not in self._hashes:
+            return None
+        return logical, digest == self._hashes[logical]
+
+    def body(self, rel, encoding=None, encode=None):
+        """File bytes, ``encode(body, encoding)``-ed and memoized when ``encoding`` is given."""
+        key = (rel, encoding)
+        with self._lock:
+            cached = self._bodies.get(key)
+        if cached is not None:
+            return cached
+        with open(os.path.join(self.root, rel), "rb") as f:
+            data = f.read()
+        if encoding:
+            data = encode(data, encoding)
+        with self._lock:
+            self._bodies[key] = data
+        return data
+
+    @staticmethod
+    def mimetype(rel):
+        if rel.endswith(".js"):
+            return "text/javascript"
+        return mimetypes.guess_type(rel)[0] or "application/octet-stream"
+
+
+# ── Avatars ──────────────────────────────────────────────────────────────────
+def _thumb_rel(filename, size, ext):
+    return f"avatars/thumbs/{os.path.splitext(filename)[0]}-{size}{ext}"
+
+
+def avatar(manifest, filename):
+    """Hashed URLs for the photo ``static/avatars/<filename>``.
+
+    ``url`` is the 1x JPEG thumbnail, ``srcset``/``webp_srcset`` cover every
+    size; without thumbnails (`flask avatar-thumbs` not run) the original is
+    used as is.
+    """
+    if not all(_thumb_rel(filename, s, ext) in manifest for s in AVATAR_SIZES for ext in (".jpeg", ".webp")):
+        return {"url": manifest.url(f"avatars/{filename}"), "srcset": "", "webp_srcset": ""}
+
+    def srcset(ext):
+        return ", ".join(f"{manifest.url(_thumb_rel(filename, s, ext))} {s // AVATAR_SIZES[0]}x"
+                         for s in AVATAR_SIZES)
+
+    return {"url": manifest.url(_thumb_rel(filename, AVATAR_SIZES[0], ".jpeg")),
+            "srcset": srcset(".jpeg"), "webp_srcset": srcset(".webp")}
+
+
+def avatar_sources(folder=AVATAR_DIR):
+    """Photo file names in ``folder`` (thumbnails excluded)."""
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in names if os.path.splitext(n)[1].lower() in _AVATAR_EXTS
+                  and os.path.isfile(os.path.join(folder, n)))
+
+
+def build_avatar_thumbs(folder=AVATAR_DIR, out=AVATAR_THUMB_DIR, sizes=AVATAR_SIZES, force=False):
+    """Centre-crop each photo to a square and write JPEG and WebP thumbnails at ``sizes``.
+
+    Thumbnails newer than their photo are left alone unless ``force``.
+    Returns the number of files written.  Needs Pillow.
+    """
+    from PIL import Image, ImageOps
+
+    os.makedirs(out, exist_ok=True)
+    written = 0
+    for name in avatar_sources(folder):
+        src = os.path.join(folder, name)
+        src_mtime = os.path.getmtime(src)
+        targets = [(s, ext, os.path.join(out, os.path.basename(_thumb_rel(name, s, ext))))
+                   for s in sizes for ext in (".jpeg", ".webp")]
+        if not force and all(os.path.exists(p) and os.path.getmtime(p) >= src_mtime for _, _, p in targets):
+            continue
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im).convert("RGB")
+            for size, ext, path in targets:
+                thumb = ImageOps.fit(im, (size, size), Image.LANCZOS)
+                tmp = path + ".tmp"
+                if ext == ".webp":
+                    thumb.save(tmp, "WEBP", quality=_WEBP_QUALITY, method=6)
+                else:
+                    thumb.save(tmp, "JPEG", quality=_JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp, path)
+                written += 1
+        log.info("[assets] thumbnails for %s", name)
+    return written
@@ -0,0 +1,504 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import date, datetime, timedelta
+
+import click
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log = logging.getLogger("lip_analytics.bench")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s %(message)s")
+
+# Offline micro-benchmarks for the get_* query functions.  ``load`` fills a
+# local MySQL database with a synthetic dataset in the CRM's table layout;
+# ``run`` times every get_* function over day/week/month/quarter/year ranges
+# ending on the dataset's last day and writes JSON; ``compare`` flags
+# regressions against a baseline run.  Never point BENCH_DB_* at the CRM.
+BENCH_DB_HOST     = os.environ.get("BENCH_DB_HOST", "127.0.0.1")
+BENCH_DB_PORT     = int(os.environ.get("BENCH_DB_PORT", 3306))
+BENCH_DB_NAME     = os.environ.get("BENCH_DB_NAME", "lip_bench")
+BENCH_DB_USER     = os.environ.get("BENCH_DB_USER", "root")
+BENCH_DB_PASSWORD = os.environ.get("BENCH_DB_PASSWORD", "")
+BENCH_RESULTS_DIR = os.environ.get("BENCH_RESULTS_DIR",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results"))
+
+RANGES = {"day": 1, "week": 7, "month": 30, "quarter": 91, "year": 365}
+_INSERT_BATCH = 5000
+
+
+# ── Schema ──────────────────────────────────────────────────────────────────
+# The CRM tables the dashboard reads, reduced to the columns it uses.  Keys
+# mirror the production indexes — add one here whenever one is added there,
+# or the benchmark stops predicting production plans.
+SCHEMA = {
+    "bench_meta": """
+        CREATE TABLE bench_meta (k VARCHAR(64) PRIMARY KEY, v TEXT)""",
+    "auth_user": """
+        CREATE TABLE auth_user (
+            id INT PRIMARY KEY, first_name VARCHAR(150) NOT NULL, last_name VARCHAR(150) NOT NULL)""",
+    "account_usergroup_users": """
+        CREATE TABLE account_usergroup_users (
+            id INT AUTO_INCREMENT PRIMARY KEY, usergroup_id INT NOT NULL, user_id INT NOT NULL,
+            UNIQUE KEY ugu_group_user (usergroup_id, user_id), KEY ugu_user (user_id))""",
+    "account_userprofile": """
+        CREATE TABLE account_userprofile (
+            id INT AUTO_INCREMENT PRIMARY KEY, user_id INT NOT NULL, extension VARCHAR(20),
+            UNIQUE KEY up_user (user_id), KEY up_extension (extension))""",
+    "noojee_callrecord": """
+        CREATE TABLE noojee_callrecord (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY, phone VARCHAR(32) NOT NULL, extension VARCHAR(20),
+            duration BIGINT, status VARCHAR(20) NOT NULL, created DATETIME(6) NOT NULL,
+            KEY ncr_created (created), KEY ncr_phone (phone), KEY ncr_extension (extension))""",
+    "reports_userstats": """
+        CREATE TABLE reports_userstats (
+            id INT AUTO_INCREMENT PRIMARY KEY, user_id INT NOT NULL, date DATE NOT NULL,
+            contact INT NOT NULL DEFAULT 0, qut_add INT NOT NULL DEFAULT 0,
+            app_add INT NOT NULL DEFAULT 0, app_add_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+            app_com INT NOT NULL DEFAULT 0, app_com_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+            KEY rs_user_date (user_id, date), KEY rs_date (date))""",
+    "leads_leadsource": """
+        CREATE TABLE leads_leadsource (id INT PRIMARY KEY, name VARCHAR(100) NOT NULL)""",
+    "leads_lead": """
+        CREATE TABLE leads_lead (
+            id INT AUTO_INCREMENT PRIMARY KEY, user_id INT NULL,
+            first_name VARCHAR(100) NOT NULL, last_name VARCHAR(100) NOT NULL,
+            status SMALLINT NOT NULL, phone VARCHAR(32), source_id INT NULL,
+            source_code VARCHAR(50) NOT NULL DEFAULT '', source_refer VARCHAR(100) NOT NULL DEFAULT '',
+            groups_cache VARCHAR(255) NOT NULL DEFAULT '', datafields JSON NULL,
+            created DATETIME(6) NOT NULL, assigned DATETIME(6) NULL,
+            KEY lead_user (user_id), KEY lead_assigned (assigned), KEY lead_source (source_id))""",
+    "leads_leadquote": """
+        CREATE TABLE leads_leadquote (
+            id INT AUTO_INCREMENT PRIMARY KEY, user_id INT NOT NULL, lead_id INT NOT NULL,
+            value DECIMAL(10,2), sent TINYINT(1) NOT NULL DEFAULT 0, deleted TINYINT(1) NOT NULL DEFAULT 0,
+            created DATETIME(6) NOT NULL,
+            KEY lq_user (user_id), KEY lq_lead (lead_id), KEY lq_created (created))""",
+    "leads_leadaction": """
+        CREATE TABLE leads_leadaction (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY, object_type VARCHAR(30) NOT NULL, object_id INT NOT NULL,
+            action_type VARCHAR(30) NOT NULL, note LONGTEXT, user_id INT NULL, created DATETIME(6) NOT NULL,
+            KEY la_object (object_type, object_id), KEY la_created (created))""",
+    "leads_leadschedule": """
+        CREATE TABLE leads_leadschedule (
+            id INT AUTO_INCREMENT PRIMARY KEY, user_id INT NULL, date DATETIME(6) NOT NULL, text VARCHAR(255),
+            KEY ls_user (user_id), KEY ls_date (date))""",
+    "leads_leadrequirement": """
+        CREATE TABLE leads_leadrequirement (
+            id INT AUTO_INCREMENT PRIMARY KEY, lead_id INT NOT NULL, type_id INT NOT NULL,
+            object_type VARCHAR(30), object_id INT NULL, name VARCHAR(200), description LONGTEXT,
+            last_note LONGTEXT, status SMALLINT NOT NULL, created DATETIME(6) NOT NULL,
+            KEY lr_lead (lead_id), KEY lr_type (type_id), KEY lr_created (created))""",
+}
+
+
+def _connect():
+    return mysql.connector.connect(host=BENCH_DB_HOST, port=BENCH_DB_PORT, database=BENCH_DB_NAME,
+                                   user=BENCH_DB_USER, password=BENCH_DB_PASSWORD, autocommit=True)
+
+
+def _check_target(cursor):
+    """Refuse to touch a database that has tables but was not created by this script."""
+    if (os.environ.get("DB_HOST"), os.environ.get("DB_NAME")) == (BENCH_DB_HOST, BENCH_DB_NAME):
+        raise click.ClickException("BENCH_DB_* points at the dashboard's own database (DB_HOST/DB_NAME)")
+    cursor.execute("SHOW TABLES")
+    tables = {r[0] for r in cursor.fetchall()}
+    if tables and "bench_meta" not in tables:
+        raise click.ClickException(f"{BENCH_DB_NAME} has tables but no bench_meta — not a benchmark database")
+
+
+# ── Synthetic dataset ───────────────────────────────────────────────────────
+_FIRST = ("Olivia", "Jack", "Charlotte", "Noah", "Amelia", "William", "Isla", "Oliver", "Mia", "Leo",
+          "Grace", "Henry", "Chloe", "Thomas", "Ruby", "James", "Zoe", "Lucas", "Ella", "Max")
+_LAST = ("Smith", "Jones", "Williams", "Brown", "Wilson", "Taylor", "Nguyen", "Johnson", "Martin",
+         "White", "Anderson", "Walker", "Thompson", "Harris", "Lee", "Ryan", "Robinson", "Kelly")
+_SOURCES = ("WEB", "FB", "GOOG", "REFER", "PARTNER")
+_STATUS_NOTES = ("Status changed to Contacted", "Status changed to Quote Sent",
+                 "Status changed to Application Submitted", "Status changed to Documents Requested",
+                 "Status changed to Client", "Status changed to On Hold", "Status changed to Not Interested")
+_APPT_TEXT = ("Discussion call", "Follow up", "Questions review", "Other")
+
+
+def _phone(rng, spaced):
+    digits = f"04{rng.randrange(10**8):08d}"
+    return f"{digits[:4]} {digits[4:7]} {digits[7:]}" if spaced else digits
+
+
+class Dataset:
+    """Deterministic synthetic CRM rows for ``days`` local days ending ``end``.
+
+    ``scale`` multiplies the per-day volumes (calls, leads and everything
+    hanging off them); advisers, extensions and the group come from app.py.
+    """
+
+    def __init__(self, end, days, scale, seed, advisers, group_id, remed_type_ids, to_utc):
+        self.end, self.days, self.scale = end, days, scale
+        self.rng = random.Random(seed)
+        self.advisers = sorted(advisers)
+        self.group_id = group_id
+        self.remed_type_ids = remed_type_ids
+        self.to_utc = to_utc
+        self.extensions = {uid: str(200 + i) for i, uid in enumerate(self.advisers)}
+        self.lead_phones = []
+
+    def _day_times(self, day, n, first_hour=8, last_hour=18):
+        """``n`` local datetimes within business hours of ``day``."""
+        base = datetime(day.year, day.month, day.day, first_hour)
+        span = (last_hour - first_hour) * 3600
+        return sorted(base + timedelta(seconds=self.rng.randrange(span)) for _ in range(n))
+
+    def _n(self, per_day):
+        return max(0, int(self.rng.gauss(per_day * self.scale, per_day * self.scale * 0.2)))
+
+    def days_range(self):
+        return [self.end - timedelta(days=i) for i in range(self.days - 1, -1, -1)]
+
+    def static_rows(self):
+        users = [(uid, _FIRST[i % len(_FIRST)], _LAST[i % len(_LAST)]) for i, uid in enumerate(self.advisers)]
+        users.append((999, "Office", "Admin"))
+        yield "auth_user", ("id", "first_name", "last_name"), users
+        yield "account_usergroup_users", ("usergroup_id", "user_id"), [(self.group_id, u) for u in self.advisers]
+        yield "account_userprofile", ("user_id", "extension"), list(self.extensions.items()) + [(999, None)]
+        yield "leads_leadsource", ("id", "name"), [(i + 1, s.title()) for i, s in enumerate(_SOURCES)]
+
+    def leads(self):
+        """leads_lead rows, plus the quote / action / requirement / schedule rows hanging off them."""
+        rng, lead_id = self.rng, 0
+        lead_cols = ("id", "user_id", "first_name", "last_name", "status", "phone", "source_id",
+                     "source_code", "source_refer", "groups_cache", "datafields", "created", "assigned")
+        leads, quotes, actions, reqs, sched = [], [], [], [], []
+        for day in self.days_range():
+            weekend = day.weekday() >= 5
+            for assigned in self._day_times(day, self._n(3 if weekend else 40)):
+                lead_id += 1
+                uid = rng.choice(self.advisers) if rng.random() < 0.85 else rng.choice((None, 999))
+                status = rng.choices(range(7), weights=(20, 25, 10, 15, 8, 10, 12))[0]
+                phone = _phone(rng, spaced=rng.random() < 0.5)
+                self.lead_phones.append((phone.replace(" ", ""), uid))
+                first = "Test" if rng.random() < 0.01 else rng.choice(_FIRST)
+                src = rng.randrange(len(_SOURCES))
+                refer = rng.choice(_LAST) if _SOURCES[src] == "REFER" else ""
+                fields = json.dumps({"affiliate_user": rng.choice(_FIRST)}) if rng.random() < 0.1 else None
+                local_created = assigned - timedelta(minutes=rng.randrange(1, 600))
+                leads.append((lead_id, uid, first, rng.choice(_LAST), status, phone, src + 1, _SOURCES[src],
+                               refer, "LIP (Ltd)", fields, local_created, assigned))
+                utc_assigned = self.to_utc(assigned)
+                owner = uid if uid in self.extensions else self.advisers[0]
+                # Actions: notes, status changes, open/close, and LIQ documents (booked)
+                t = utc_assigned
+                for _ in range(rng.randrange(1, 9)):
+                    t += timedelta(hours=rng.randrange(1, 72))
+                    kind = rng.choices(("note", "status", "open_close", "doc"), weights=(5, 3, 1, 1))[0]
+                    if kind == "note":
+                        actions.append(("lead", lead_id, "note", "Called client, left a message",
+                                        owner if rng.random() < 0.6 else None, t))
+                    elif kind == "status":
+                        actions.append(("lead", lead_id, "status", rng.choice(_STATUS_NOTES), None, t))
+                    elif kind == "open_close":
+                        actions.append(("lead", lead_id, rng.choice(("open", "close")), "", owner, t))
+                    else:
+                        actions.append(("lead", lead_id, "doccreate", "Life Insurance Questions sent", owner, t))
+                if status >= 3 or rng.random() < 0.15:
+                    for _ in range(rng.randrange(1, 4)):
+                        t = utc_assigned + timedelta(hours=rng.randrange(1, 120))
+                        quotes.append((owner, lead_id, round(rng.uniform(40, 400), 2),
+                                       int(rng.random() < 0.9), int(rng.random() < 0.05), t))
+                if rng.random() < 0.06:
+                    reqs.append((lead_id, rng.choice(self.remed_type_ids), rng.choice(("application", "lead")),
+                                 rng.randrange(1, 10**6), "Outstanding requirement", "Signed form missing",
+                                 "Chased client", rng.randrange(4), utc_assigned + timedelta(days=rng.randrange(1, 10))))
+                if rng.random() < 0.2:
+                    when = utc_assigned + timedelta(days=rng.randrange(0, 14), hours=rng.randrange(8))
+                    sched.append((owner, when, rng.choice(_APPT_TEXT)))
+            if len(actions) >= _INSERT_BATCH:
+                yield "leads_lead", lead_cols, leads
+                yield from self._lead_children(quotes, actions, reqs, sched)
+                leads, quotes, actions, reqs, sched = [], [], [], [], []
+        yield "leads_lead", lead_cols, leads
+        yield from self._lead_children(quotes, actions, reqs, sched)
+
+    def _lead_children(self, quotes, actions, reqs, sched):
+        yield "leads_leadquote", ("user_id", "lead_id", "value", "sent", "deleted", "created"), quotes
+        yield "leads_leadaction", ("object_type", "object_id", "action_type", "note", "user_id", "created"), actions
+        yield "leads_leadrequirement", ("lead_id", "type_id", "object_type", "object_id", "name",
+                                        "description", "last_note", "status", "created"), reqs
+        yield "leads_leadschedule", ("user_id", "date", "text"), sched
+
+    def calls(self):
+        """noojee_callrecord rows (UTC) — about half of them to lead phones."""
+        rng, cols, batch = self.rng, ("phone", "extension", "duration", "status", "created"), []
+        for day in self.days_range():
+            if day.weekday() >= 5:
+                continue
+            for local in self._day_times(day, self._n(600), 7, 20):
+                if self.lead_phones and rng.random() < 0.5:
+                    phone, uid = rng.choice(self.lead_phones)
+                    ext = self.extensions.get(uid) or rng.choice(list(self.extensions.values()))
+                else:
+                    phone, ext = _phone(rng, spaced=False), rng.choice(list(self.extensions.values()) + [None])
+                bucket = rng.random()
+                secs = rng.uniform(0, 10) if bucket < 0.4 else rng.uniform(10, 45) if bucket < 0.7 \
+                    else rng.uniform(45, 1200)
+                status = "Hungup" if rng.random() < 0.9 else rng.choice(("Busy", "NoAnswer"))
+                batch.append((phone, ext, int(secs * 1_000_000), status, self.to_utc(local)))
+                if len(batch) >= _INSERT_BATCH:
+                    yield "noojee_callrecord", cols, batch
+                    batch = []
+        yield "noojee_callrecord", cols, batch
+
+    def userstats(self):
+        rng, rows = self.rng, []
+        for day in self.days_range():
+            if day.weekday() >= 5:
+                continue
+            for uid in self.advisers:
+                if rng.random() < 0.08:   # leave / sick day
+                    continue
+                apps = rng.choices(range(4), weights=(50, 30, 15, 5))[0]
+                inforce = rng.choices(range(3), weights=(70, 25, 5))[0]
+                rows.append((uid, day, rng.randrange(5, 40), rng.randrange(0, 10), apps,
+                             round(apps * rng.uniform(800, 3000), 2), inforce,
+                             round(inforce * rng.uniform(800, 3000), 2)))
+        yield "reports_userstats", ("user_id", "date", "contact", "qut_add", "app_add", "app_add_value",
+                                    "app_com", "app_com_value"), rows
+
+
+def _insert(cursor, table, cols, rows):
+    if not rows:
+        return 0
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+    for i in range(0, len(rows), _INSERT_BATCH):
+        cursor.executemany(sql, rows[i:i + _INSERT_BATCH])
+    return len(rows)
+
+
+# ── Timing ──────────────────────────────────────────────────────────────────
+def _import_app(workdir):
+    """Import app.py with its local stores and state files redirected to ``workdir``."""
+    for var, name in (("ROLLUP_DB", "rollup.sqlite3"), ("PHONE_INDEX_DB", "phone_index.sqlite3"),
+                      ("PREWARM_DIR", "snapshots"), ("POLL_STATE_DIR", "")):
+        os.environ[var] = os.path.join(workdir, name)
+    import app
+    logging.getLogger("lip_analytics.cache").setLevel(logging.WARNING)
+    return app
+
+
+def _benchmarks(app):
+    """``(name, fn, args(start, end), ranges)`` for every get_* function; ranges None = range-free."""
+    daily_dates = lambda s, e: app._with_calendar_dates([], s, e)
+    g = app.GROUP_ID
+    multi = [r for r in RANGES if r != "day"]
+    return [
+        ("get_advisers",                app.get_advisers,                lambda s, e: (g,), None),
+        ("get_adviser_extensions",      app.get_adviser_extensions,      lambda s, e: (), None),
+        ("get_unassigned_leads",        app.get_unassigned_leads,        lambda s, e: (g,), None),
+        ("get_schedule_appointments",   app.get_schedule_appointments,   lambda s, e: (e, g), None),
+        ("get_call_aggregates",         app.get_call_aggregates,         lambda s, e: (s, e, "day", g), RANGES),
+        ("get_call_aggregates[hour]",   app.get_call_aggregates,         lambda s, e: (s, e, "hour", g), ["day"]),
+        ("get_performance_stats",       app.get_performance_stats,       lambda s, e: (s, e, g), RANGES),
+        ("get_pipeline_stats",          app.get_pipeline_stats,          lambda s, e: (s, e, g), RANGES),
+        ("get_hourly_series",           app.get_hourly_series,           lambda s, e: (e, g), ["day"]),
+        ("get_hourly_pipeline_series",  app.get_hourly_pipeline_series,  lambda s, e: (e, g), ["day"]),
+        ("get_daily_series",            app.get_daily_series,            lambda s, e: (s, e, g), multi),
+        ("get_daily_pipeline_series",   app.get_daily_pipeline_series,
+                                        lambda s, e: (s, e, daily_dates(s, e), g), multi),
+        ("get_period_series[week]",     app.get_period_series,           lambda s, e: (s, e, "week", g), ["quarter", "year"]),
+        ("get_period_series[month]",    app.get_period_series,           lambda s, e: (s, e, "month", g), ["year"]),
+        ("get_period_pipeline_series[week]", app.get_period_pipeline_series,
+                                        lambda s, e: (s, e, "week", g), ["quarter", "year"]),
+        ("get_remediation_counts",      app.get_remediation_counts,      lambda s, e: (s, e, g), RANGES),
+        ("get_remediation_details",     app.get_remediation_details,     lambda s, e: (s, e, g), RANGES),
+        ("get_lead_details",            app.get_lead_details,            lambda s, e: (s, e, g), RANGES),
+        ("get_pipeline_tile_data",      app.get_pipeline_tile_data,      lambda s, e: (s, e, g), RANGES),
+        ("get_contact_before_close",    app.get_contact_before_close,    lambda s, e: (s, e, g), RANGES),
+    ]
+
+# Functions with a rollup / phone-index path, timed again with --stores
+_STORE_BACKED = {"get_performance_stats", "get_pipeline_stats", "get_daily_series",
+                 "get_daily_pipeline_series", "get_period_series[week]", "get_period_series[month]",
+                 "get_period_pipeline_series[week]", "get_pipeline_tile_data", "get_contact_before_close"}
+
+
+def _time_one(app, conn, fn, args, repeat):
+    """Per-run wall times (ms) with every cache cleared, after one discarded warm-up."""
+    import metrics
+    runs, rows = [], 0
+    for i in range(repeat + 1):
+        app.query_cache.invalidate()
+        with app._lead_actions.lock:
+            app._lead_actions.clear()
+        cursor = metrics.CountingCursor(conn.cursor(dictionary=True))
+        try:
+            t0 = time.perf_counter()
+            fn(cursor, *args)
+            elapsed = (time.perf_counter() - t0) * 1000
+        finally:
+            cursor.close()
+        if i:
+            runs.append(round(elapsed, 2))
+            rows = cursor.rows
+    runs_sorted = sorted(runs)
+    return {"runs_ms": runs, "min_ms": runs_sorted[0], "median_ms": round(statistics.median(runs), 2),
+            "p95_ms": runs_sorted[min(len(runs) - 1, int(0.95 * len(runs)))], "rows": rows}
+
+
+def _run_suite(app, conn, end, repeat, only, suffix=""):
+    results = {}
+    for name, fn, args, ranges in _benchmarks(app):
+        if only and name not in only:
+            continue
+        if suffix and name not in _STORE_BACKED:
+            continue
+        out = results[name + suffix] = {}
+        for label in (ranges or ["none"]):
+            start = end - timedelta(days=RANGES.get(label, 1) - 1)
+            out[label] = _time_one(app, conn, fn, args(start, end), repeat)
+            log.info("%-36s %-8s median %8.1f ms  (%d rows)", name + suffix, label,
+                     out[label]["median_ms"], out[label]["rows"])
+    return results
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+@click.group()
+def cli():
+    """Offline benchmarks for the dashboard's get_* query functions."""
+
+
+@cli.command()
+@click.option("--days", default=400, show_default=True, help="Local days of history to generate.")
+@click.option("--end", default=None, help="Last local day (YYYY-MM-DD). Defaults to today.")
+@click.option("--scale", default=1.0, show_default=True, help="Multiplier on per-day volumes (~600 calls, ~40 leads).")
+@click.option("--seed", default=7, show_default=True)
+@click.option("--advisers", default=5, show_default=True, help="Members of LIP_GROUP_ID to generate.")
+def load(days, end, scale, seed, advisers):
+    """(Re)create the benchmark tables and fill them with a synthetic dataset."""
+    with tempfile.TemporaryDirectory(prefix="lip-bench-") as workdir:
+        app = _import_app(workdir)
+    end_day = date.fromisoformat(end) if end else date.today()
+    conn = _connect()
+    cursor = conn.cursor()
+    _check_target(cursor)
+    for table, ddl in SCHEMA.items():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(ddl)
+    # The first ids match the production advisers (and their avatars); the rest are made up
+    ids = [181, 182, 183, 152, 53] + list(range(1000, 1000 + max(0, advisers - 5)))
+    ds = Dataset(end_day, days, scale, seed, ids[:advisers], app.GROUP_ID,
+                 [int(t) for t in app.REMED_TYPE_IDS_SQL.split(",")], app.tzbucket.utc_of)
+    counts = {}
+    t0 = time.monotonic()
+    # Leads first: calls are drawn partly from their phone numbers
+    for source in (ds.static_rows(), ds.leads(), ds.calls(), ds.userstats()):
+        for table, cols, rows in source:
+            counts[table] = counts.get(table, 0) + _insert(cursor, table, cols, rows)
+    meta = {"end": end_day.isoformat(), "days": days, "scale": scale, "seed": seed, "advisers": advisers,
+            "loaded_at": datetime.now().isoformat(timespec="seconds"), "rows": counts}
+    cursor.executemany("INSERT INTO bench_meta (k, v) VALUES (%s, %s)",
+                       [(k, json.dumps(v)) for k, v in meta.items()])
+    cursor.execute(f"ANALYZE TABLE {', '.join(t for t in SCHEMA if t != 'bench_meta')}")
+    cursor.fetchall()
+    cursor.close(); conn.close()
+    click.echo(f"Loaded {sum(counts.values())} rows in {time.monotonic() - t0:.0f}s: "
+               + ", ".join(f"{t}={n}" for t, n in counts.items()))
+
+
+@cli.command()
+@click.option("--repeat", default=5, show_default=True, help="Timed runs per function and range.")
+@click.option("--only", multiple=True, help="Only these functions (repeatable).")
+@click.option("--stores", is_flag=True, help="Also time the rollup / phone-index paths.")
+@click.option("--out", default=None, help="Result file (default bench_results/<timestamp>-<rev>.json).")
+def run(repeat, only, stores, out):
+    """Time every get_* function over each range; write JSON results."""
+    conn = _connect()
+    cursor = conn.cursor()
+    _check_target(cursor)
+    cursor.execute("SELECT k, v FROM bench_meta")
+    meta = {k: json.loads(v) for k, v in cursor.fetchall()}
+    if not meta:
+        raise click.ClickException("No dataset — run `python bench.py load` first")
+    cursor.execute("SELECT VERSION()")
+    mysql_version = cursor.fetchone()[0]
+    cursor.close()
+    end = date.fromisoformat(meta["end"])
+
+    with tempfile.TemporaryDirectory(prefix="lip-bench-") as workdir:
+        app = _import_app(workdir)
+        results = _run_suite(app, conn, end, repeat, set(only))
+        if stores:
+            first = end - timedelta(days=meta["days"] - 1)
+            cur = conn.cursor(dictionary=True)
+            try:
+                store = app.rollup.get_store()
+                app.refresh_rollup(cur, store, backfill_from=first)
+                store.set_meta(backfilled_from=first.isoformat())
+                app.build_phone_index(cur, app.phone_index.get_index())
+            finally:
+                cur.close()
+            # Time the store reads, not their incremental refreshes
+            app.ROLLUP_REFRESH_SECS = app.PHONE_INDEX_REFRESH_SECS = float("inf")
+            results.update(_run_suite(app, conn, end, repeat, set(only), suffix="[stores]"))
+    conn.close()
+
+    doc = {"meta": {"dataset": meta, "git_rev": _git_rev(), "mysql": mysql_version,
+                    "python": platform.python_version(), "repeat": repeat,
+                    "run_at": datetime.now().isoformat(timespec="seconds")},
+           "results": results}
+    if out is None:
+        os.makedirs(BENCH_RESULTS_DIR, exist_ok=True)
+        out = os.path.join(BENCH_RESULTS_DIR,
+                           f"{datetime.now():%Y%m%d-%H%M%S}-{doc['meta']['git_rev'] or 'norev'}.json")
+    with open(out, "w") as f:
+        json.dump(doc, f, indent=2)
+    click.echo(f"Results written to {out}")
+
+
+@cli.command()
+@click.argument("current", type=click.Path(exists=True, dir_okay=False))
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.option("--threshold", default=1.25, show_default=True, help="Median slowdown ratio counted as a regression.")
+@click.option("--floor-ms", default=5.0, show_default=True, help="Ignore differences smaller than this.")
+def compare(current, baseline, threshold, floor_ms):
+    """Compare two result files; exit 1 if any median regressed past the threshold."""
+    with open(current) as f:
+        cur = json.load(f)
+    with open(baseline) as f:
+        base = json.load(f)
+    if cur["meta"]["dataset"] != base["meta"]["dataset"]:
+        click.echo("warning: the two runs used different datasets", err=True)
+    regressions = 0
+    click.echo(f"{'function':36} {'range':8} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, ranges in sorted(cur["results"].items()):
+        for label, r in ranges.items():
+            b = base["results"].get(name, {}).get(label)
+            if b is None:
+                click.echo(f"{name:36} {label:8} {'—':>10} {r['median_ms']:>10.1f}       new")
+                continue
+            ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+            bad = ratio > threshold and r["median_ms"] - b["median_ms"] > floor_ms
+            regressions += bad
+            click.echo(f"{name:36} {label:8} {b['median_ms']:>10.1f} {r['median_ms']:>10.1f} "
+                       f"{ratio:>6.2f}x{'  REGRESSION' if bad else ''}")
+    if regressions:
+        click.echo(f"{regressions} regression(s) over {threshold}x", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
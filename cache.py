@@ -0,0 +1,225 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from contextlib import contextmanager
+
+log = logging.getLogger("lip_analytics.cache")
+
+# Ranges that ended before today can no longer change — keep them for a day.
+# Anything touching today (or with no date at all) is only reused briefly, as
+# is anything from a ``current_state`` query: its range selects the rows, but
+# what it reports about them (lead status, notes, pending remediations, …)
+# is how they stand now.
+CACHE_TTL_PAST  = int(os.environ.get("CACHE_TTL_PAST", 24 * 3600))
+CACHE_TTL_LIVE  = int(os.environ.get("CACHE_TTL_LIVE", 60))
+CACHE_MAX_ITEMS = int(os.environ.get("CACHE_MAX_ITEMS", 256))
+
+
+def _freeze(v):
+    """Turn list/dict arguments into something hashable for the cache key."""
+    if isinstance(v, (list, tuple)):
+        return tuple(_freeze(x) for x in v)
+    if isinstance(v, dict):
+        return tuple(sorted((k, _freeze(x)) for k, x in v.items()))
+    return v
+
+
+class ResultCache:
+    """Thread-safe, size-bounded LRU cache with per-entry expiry."""
+
+    def __init__(self, max_items=CACHE_MAX_ITEMS):
+        self.max_items = max_items
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._inflight = {}          # key -> (lock, waiters)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count_hit=True, count_miss=True):
+        """Return (hit, value)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                if count_miss:
+                    self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            if count_hit:
+                self.hits += 1
+            return True, item[1]
+
+    @contextmanager
+    def key_lock(self, key):
+        """Serialize computation of one key so concurrent misses run the query once."""
+        with self._lock:
+            lock, waiters = self._inflight.get(key, (threading.Lock(), 0))
+            self._inflight[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, waiters = self._inflight[key]
+                if waiters == 1:
+                    del self._inflight[key]
+                else:
+                    self._inflight[key] = (lock, waiters - 1)
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, fn_name=None):
+        """Drop every entry, or only those for one function.  Returns count removed."""
+        with self._lock:
+            if fn_name is None:
+                n = len(self._data)
+                self._data.clear()
+            else:
+                keys = [k for k in self._data if k[0] == fn_name]
+                for k in keys:
+                    del self._data[k]
+                n = len(keys)
+        log.info("Cache invalidated (%s): %d entries", fn_name or "all", n)
+        return n
+
+    def invalidate_live(self, fn_names):
+        """Drop entries of ``fn_names`` that can still change; past ranges of period-bounded queries are kept."""
+        fn_names = set(fn_names)
+        with self._lock:
+            keys = [k for k in self._data
+                    if k[0] in fn_names and (k[0] in _CURRENT_STATE or not _is_past(k[1], dict(k[2])))]
+            for k in keys:
+                del self._data[k]
+        if keys:
+            log.info("Cache invalidated (live %s): %d entries", ",".join(sorted(fn_names)), len(keys))
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "max_items": self.max_items,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+query_cache = ResultCache()
+_CURRENT_STATE = set()   # names of current_state query functions
+
+
+def _is_past(args, kwargs):
+    """True if every date argument lies before today (the result can no longer change)."""
+    dates = [a for a in (*args, *kwargs.values()) if isinstance(a, date)]
+    return bool(dates) and max(dates) < date.today()
+
+
+def _ttl_for(fn_name, args, kwargs):
+    """Long TTL if every date argument lies before today, short otherwise or for current-state queries."""
+    if fn_name in _CURRENT_STATE:
+        return CACHE_TTL_LIVE
+    return CACHE_TTL_PAST if _is_past(args, kwargs) else CACHE_TTL_LIVE
+
+
+def cached_query(fn=None, *, current_state=False):
+    """Memoize a ``get_*(cursor, *args)`` query function, ignoring the cursor.
+
+    Keyed by function name plus the remaining arguments (start, end, mode, …).
+    Concurrent misses for the same key wait for a single computation.
+    Cached results are shared between requests — callers must not mutate them.
+    The wrapper exposes ``cache_lookup(*args)`` so callers can check for a hit
+    before checking out a connection.  ``@cached_query(current_state=True)``
+    marks a query whose results can change whatever its range: they always
+    get the live TTL and are dropped by ``invalidate_live``.
+    """
+    if fn is None:
+        return lambda f: cached_query(f, current_state=current_state)
+    if current_state:
+        _CURRENT_STATE.add(fn.__name__)
+
+    def _key(args, kwargs):
+        return (fn.__name__, _freeze(args), _freeze(kwargs))
+
+    @wraps(fn)
+    def wrapper(cursor, *args, **kwargs):
+        key = _key(args, kwargs)
+        hit, value = query_cache.get(key)
+        if hit:
+            return value
+        with query_cache.key_lock(key):
+            # Another stage may have computed it while we waited
+            hit, value = query_cache.get(key, count_hit=False, count_miss=False)
+            if hit:
+                return value
+            value = fn(cursor, *args, **kwargs)
+            query_cache.put(key, value, _ttl_for(fn.__name__, args, kwargs))
+        return value
+
+    def cache_lookup(*args, **kwargs):
+        return query_cache.get(_key(args, kwargs), count_miss=False)
+
+    wrapper.cache_lookup = cache_lookup
+    return wrapper
+
+
+class KeyedMemo:
+    """Per-key memo for row-level derived data (e.g. one record per lead id).
+
+    Unlike ``ResultCache`` entries never expire on their own — the owner tails
+    the source table and calls ``discard`` for keys whose rows changed.
+    ``watermark`` holds the owner's position in that table; ``lock`` serializes
+    tail → fetch → put so a record read before a change can't be stored after it.
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self.watermark = None
+        self.lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """Return ({key: value} for memoized keys, [missing keys])."""
+        found, missing = {}, []
+        for k in keys:
+            if k in self._data:
+                self._data.move_to_end(k)
+                found[k] = self._data[k]
+            else:
+                missing.append(k)
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, values):
+        self._data.update(values)
+        for k in values:
+            self._data.move_to_end(k)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def discard(self, keys):
+        for k in keys:
+            self._data.pop(k, None)
+
+    def clear(self):
+        self._data.clear()
+        self.watermark = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._data), "max_items": self.max_items,
+                "watermark": self.watermark, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
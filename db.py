@@ -2,16 +2,25 @@ import os
 import json
 import time
 import logging
+import threading
+from collections import deque
 import mysql.connector
-from mysql.connector import pooling
 from dotenv import load_dotenv
 
+import metrics
+import querylog
+
 load_dotenv()
 
 log = logging.getLogger("lip_analytics.db")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s %(message)s")
 
 _pool = None
+POOL_SIZE     = int(os.environ.get("DB_POOL_SIZE", 3))
+POOL_OVERFLOW = int(os.environ.get("DB_POOL_OVERFLOW", 0))          # extra connections under load
+POOL_TIMEOUT  = float(os.environ.get("DB_POOL_TIMEOUT", 10))        # max seconds queued for a connection
+POOL_RECYCLE  = int(os.environ.get("DB_POOL_RECYCLE", 1800))        # replace connections older than this
+POOL_PREWARM  = int(os.environ.get("DB_POOL_PREWARM", POOL_SIZE))   # connections opened at worker boot
 
 
 def _load_db_config():
@@ -88,37 +97,246 @@ def _load_db_config():
     }
 
 
+class PoolTimeout(RuntimeError):
+    """No connection became available within DB_POOL_TIMEOUT."""
+
+
+class _PooledConnection:
+    """Checked-out connection; ``close()`` hands it back to the pool.
+
+    Cursors are wrapped in ``querylog.ObservedCursor`` so every statement is
+    timed and slow ones get an EXPLAIN.
+    """
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn, self._created_at)
+
+    def discard(self):
+        """Close the connection instead of handing it back, e.g. with unread rows pending."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+
+    def cursor(self, *args, **kwargs):
+        if self._conn is None:
+            raise RuntimeError("connection already returned to the pool")
+        return querylog.ObservedCursor(self._conn.cursor(*args, **kwargs), self._conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise RuntimeError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None   # (conn, created_at) handed over, or _OPEN_SLOT
+
+
+_OPEN_SLOT = object()   # handed to a waiter when a slot frees up: open a new connection
+
+
+class ConnectionPool:
+    """Fixed-size MySQL pool with overflow, a FIFO wait queue and health checks.
+
+    ``size`` connections are kept open; up to ``max_overflow`` more are opened
+    under load and closed when returned.  When every slot is in use callers
+    queue and are served in arrival order, giving up after ``timeout``
+    seconds.  A connection is pinged on checkout and replaced once it is older
+    than ``recycle`` seconds.
+    """
+
+    def __init__(self, connect, size, max_overflow=0, timeout=10.0, recycle=1800):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._lock = threading.Lock()
+        self._idle = deque()      # (conn, created_at), most recently returned last
+        self._waiters = deque()   # _Waiter, FIFO
+        self._open = 0            # connections open or being opened
+        self.checkouts = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.invalidated = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # ── Checkout / checkin ────────────────────────────────────────────────
+    def get(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.monotonic()
+        with self._lock:
+            if self._idle and not self._waiters:
+                item = self._idle.pop()
+            elif self._open < self.size + self.max_overflow:
+                self._open += 1
+                item = _OPEN_SLOT
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+                item = None
+        if item is None:
+            waiter.event.wait(timeout)
+            with self._lock:
+                if waiter.conn is None:
+                    self._waiters.remove(waiter)
+                    self.timeouts += 1
+                    raise PoolTimeout(f"no database connection free after {timeout:.1f}s "
+                                      f"({self._open} open, {len(self._waiters)} waiting)")
+                item = waiter.conn
+        try:
+            conn, created_at = self._checked(item)
+        except Exception:
+            self._free_slot()
+            raise
+        waited = time.monotonic() - t0
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return _PooledConnection(self, conn, created_at), waited
+
+    def _checked(self, item):
+        """A healthy (conn, created_at) for a checked-out item, replacing stale or dead ones."""
+        if item is not _OPEN_SLOT:
+            conn, created_at = item
+            if time.monotonic() - created_at >= self.recycle:
+                self.recycled += 1
+                self._close_quietly(conn)
+            elif conn.is_connected():
+                return conn, created_at
+            else:
+                self.invalidated += 1
+                log.warning("Discarding dead pooled connection")
+                self._close_quietly(conn)
+        return self._connect(), time.monotonic()
+
+    def _release(self, conn, created_at):
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = (conn, created_at)
+                waiter.event.set()
+                return
+            if self._open > self.size:
+                self._open -= 1
+                overflow = True
+            else:
+                self._idle.append((conn, created_at))
+                overflow = False
+        if overflow:
+            self._close_quietly(conn)
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        self._free_slot()
+
+    def _free_slot(self):
+        """A slot's connection could not be opened — pass the slot on or give it back."""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = _OPEN_SLOT
+                waiter.event.set()
+            else:
+                self._open -= 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ── Warm-up / stats ───────────────────────────────────────────────────
+    def prewarm(self, n=None):
+        """Open up to ``n`` (default ``size``) idle connections ahead of the first request."""
+        n = self.size if n is None else min(n, self.size)
+        opened = 0
+        while True:
+            with self._lock:
+                if self._open >= n:
+                    break
+                self._open += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                self._free_slot()
+                raise
+            self._release(conn, time.monotonic())
+            opened += 1
+        return opened
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            return {"size": self.size, "max_overflow": self.max_overflow,
+                    "open": self._open, "idle": idle, "active": self._open - idle,
+                    "waiting": len(self._waiters), "checkouts": self.checkouts,
+                    "timeouts": self.timeouts, "recycled": self.recycled, "invalidated": self.invalidated,
+                    "wait_total_s": round(self.wait_total, 3), "wait_max_s": round(self.wait_max, 3)}
+
+
+_pool_lock = threading.Lock()
+
+
 def get_pool():
     global _pool
-    if _pool is None:
-        cfg = _load_db_config()
-        log.info("Creating connection pool (host=%s, db=%s, pool_size=3)", cfg["host"], cfg["database"])
-        _pool = pooling.MySQLConnectionPool(
-            pool_name="lip_pool",
-            pool_size=3,
-            host=cfg["host"],
-            port=cfg["port"],
-            database=cfg["database"],
-            user=cfg["user"],
-            password=cfg["password"],
-            connect_timeout=10,
-            autocommit=True,
-        )
-        log.info("Connection pool created successfully")
+    with _pool_lock:
+        if _pool is None:
+            cfg = _load_db_config()
+            log.info("Creating connection pool (host=%s, db=%s, size=%d, overflow=%d)",
+                     cfg["host"], cfg["database"], POOL_SIZE, POOL_OVERFLOW)
+            _pool = ConnectionPool(
+                lambda: mysql.connector.connect(
+                    host=cfg["host"],
+                    port=cfg["port"],
+                    database=cfg["database"],
+                    user=cfg["user"],
+                    password=cfg["password"],
+                    connect_timeout=10,
+                    autocommit=True,
+                ),
+                POOL_SIZE, POOL_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE,
+            )
     return _pool
 
 
-def get_connection(retries=4, delay=0.4):
-    """Get a pooled connection with automatic retry on pool exhaustion."""
-    pool = get_pool()
-    last_err = None
-    for attempt in range(retries):
-        try:
-            return pool.get_connection()
-        except Exception as e:
-            last_err = e
-            log.warning("get_connection attempt %d/%d failed: %s", attempt + 1, retries, e)
-            if attempt < retries - 1:
-                time.sleep(delay)
-    log.error("get_connection failed after %d retries: %s", retries, last_err)
-    raise last_err
+def get_connection(timeout=None):
+    """Check out a pooled connection, queueing up to DB_POOL_TIMEOUT seconds if none is free."""
+    try:
+        conn, waited = get_pool().get(timeout)
+    except Exception as e:
+        metrics.REGISTRY.inc("lip_db_pool_failures_total")
+        log.error("get_connection failed: %s", e)
+        raise
+    metrics.REGISTRY.observe("lip_db_pool_wait_seconds", waited)
+    return conn
+
+
+def prewarm_pool():
+    """Open the pool's idle connections now (called as each gunicorn worker boots)."""
+    if POOL_PREWARM <= 0:
+        return
+    t0 = time.monotonic()
+    try:
+        opened = get_pool().prewarm(POOL_PREWARM)
+    except Exception as e:
+        log.warning("Pool pre-warm failed: %s", e)
+        return
+    log.info("Pool pre-warmed: %d connection(s) in %.0f ms", opened, (time.monotonic() - t0) * 1000)
+
+
+def pool_stats():
+    """Stats of this process's pool, or None before the first checkout."""
+    return _pool.stats() if _pool is not None else None
@@ -0,0 +1,104 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from db import get_connection, POOL_SIZE
+from metrics import CountingCursor
+
+log = logging.getLogger("lip_analytics.executor")
+
+
+class ConnectionUnavailable(RuntimeError):
+    """A stage could not obtain a pooled connection."""
+
+
+class Stage:
+    """One independent unit of dashboard work.
+
+    ``fn`` is called as ``fn(cursor, *args, *dep_results)`` where ``dep_results``
+    are the return values of the stages named in ``needs``, in that order.
+    """
+
+    def __init__(self, name, fn, *args, needs=()):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.needs = tuple(needs)
+
+
+def _run_stage(stage, dep_results, timer):
+    """Run a single stage on its own pooled connection.
+
+    Stages backed by a cached query skip the connection checkout on a hit.
+    The cursor counts fetched rows for the timer (see metrics.StageTimer).
+    """
+    lookup = getattr(stage.fn, "cache_lookup", None)
+    if lookup is not None:
+        hit, value = lookup(*stage.args, *dep_results)
+        if hit:
+            return timer(stage.name + ":cached", lambda: value)
+    t0 = time.monotonic()
+    try:
+        conn = get_connection()
+    except Exception as e:
+        raise ConnectionUnavailable(str(e)) from e
+    cursor = CountingCursor(conn.cursor(dictionary=True), pool_wait=time.monotonic() - t0)
+    clean = False
+    try:
+        result = timer(stage.name, stage.fn, cursor, *stage.args, *dep_results)
+        clean = True
+        return result
+    finally:
+        try:
+            cursor.close()
+        except Exception as e:
+            # Raised mid-stream: the server may still be sending rows
+            log.warning("[executor] closing cursor for %s failed: %s", stage.name, e)
+            clean = False
+        if clean:
+            conn.close()
+        else:
+            conn.discard()
+
+
+def run_stages(stages, timer, max_workers=None, on_result=None):
+    """Run stages concurrently, respecting their ``needs`` dependency graph.
+
+    At most ``max_workers`` stages (capped at the pool size) hold a connection
+    at once, so a single request can never exhaust the pool on its own.  Stages
+    are started in list order as soon as their dependencies are done — put the
+    slowest ones first.  Returns ``{stage.name: result}``; the first stage error
+    cancels everything still queued and is re-raised.  ``on_result(name,
+    result)``, if given, is called as each stage finishes (streamed rendering).
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [n for n in s.needs if n not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' needs unknown stage(s): {', '.join(missing)}")
+
+    workers = max(1, min(max_workers or POOL_SIZE, POOL_SIZE, len(stages)))
+    results, pending, running = {}, list(stages), {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as pool:
+        while pending or running:
+            for s in [s for s in pending if all(n in results for n in s.needs)]:
+                pending.remove(s)
+                deps = [results[n] for n in s.needs]
+                running[pool.submit(_run_stage, s, deps, timer)] = s.name
+            if not running:
+                raise RuntimeError("Stage dependency cycle among: "
+                                   + ", ".join(s.name for s in pending))
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    results[name] = fut.result()
+                except Exception:
+                    for f in running:
+                        f.cancel()
+                    log.error("[%s] stage failed", name)
+                    raise
+                if on_result is not None:
+                    on_result(name, results[name])
+    return results
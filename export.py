@@ -0,0 +1,44 @@
+import io
+import os
+import csv
+import json
+import logging
+
+log = logging.getLogger("lip_analytics.export")
+
+# Export rows are encoded one at a time into a small buffer that is handed to
+# the response whenever it passes EXPORT_CHUNK_BYTES, so an export of any size
+# holds one chunk of text plus whatever batch of rows the caller is iterating.
+EXPORT_CHUNK_BYTES = int(os.environ.get("EXPORT_CHUNK_BYTES", 64 * 1024))
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _cell(value):
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def encode(rows, columns, fmt):
+    """``rows`` (dicts) as CSV with a header line or as NDJSON, yielded as byte chunks.
+
+    Only ``columns`` are written, in that order; missing keys are empty/null.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow([_cell(row.get(c)) for c in columns])
+    else:
+        write = lambda row: buf.write(json.dumps({c: row.get(c) for c in columns},
+                                                 default=str, ensure_ascii=False) + "\n")
+    for row in rows:
+        write(row)
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
@@ -0,0 +1,6 @@
+# Picked up automatically by gunicorn when started from the app directory.
+
+def post_worker_init(worker):
+    """Open each worker's DB connections at boot instead of on its first request."""
+    import db
+    db.prewarm_pool()
@@ -0,0 +1,117 @@
+import time
+import logging
+import threading
+from collections import defaultdict
+
+log = logging.getLogger("lip_analytics.liveday")
+
+HOURS = list(range(6, 23))   # hourly chart axis, 6am–10pm local
+TALK_MIN_US = 10_000_000     # talk time counts calls longer than 10s
+
+
+class LiveDay:
+    """In-memory per-adviser, per-hour aggregates for the current local day.
+
+    Source rows are kept by id so re-ingesting a row (the feeder re-reads a
+    short lookback window to catch late updates) replaces its contribution
+    instead of double-counting it.  Call ``reset(day)`` at local midnight.
+    The MySQL queries that feed it live in app.py; ``lock`` must be held
+    while ingesting or reading.
+    """
+
+    def __init__(self, contact_threshold_us):
+        self.contact_threshold_us = contact_threshold_us
+        self.lock = threading.Lock()
+        self.day = None
+        self.reset(None)
+
+    def reset(self, day):
+        self.day = day
+        self.refreshed_at = 0.0          # time.monotonic() of the last refresh
+        self.watermarks = {}             # source -> feeder-defined position
+        self.open_calls = {}             # call_id -> created, seen before it hung up (the feeder re-reads it)
+        self._calls = {}                 # call_id -> (user_ids, hour, duration_us)
+        self._quotes = {}                # quote_id -> (user_id, lead_id, created, value)
+        self._leads = {}                 # lead_id -> (user_id, hour)
+        self._booked = set()             # lead ids with an LIQ document
+        self.userstats = {}              # user_id -> day totals from reports_userstats
+        if day is not None:
+            log.info("Live day reset to %s", day)
+
+    def is_fresh(self, day, max_age):
+        return self.day == day and time.monotonic() - self.refreshed_at < max_age
+
+    # ── Ingest ────────────────────────────────────────────────────────────
+    def ingest_calls(self, rows):
+        """``(call_id, user_ids, local_hour, duration_us)`` rows."""
+        for call_id, uids, hour, duration in rows:
+            self._calls[call_id] = (tuple(uids), hour, duration)
+
+    def ingest_quotes(self, rows):
+        """``(quote_id, user_id, lead_id, created, value, live)`` rows — ``live`` False drops it."""
+        for quote_id, uid, lead_id, created, value, live in rows:
+            if live:
+                self._quotes[quote_id] = (uid, lead_id, created, value)
+            else:
+                self._quotes.pop(quote_id, None)
+
+    def replace_quotes(self, rows):
+        """Like ``ingest_quotes`` for a full re-read of the day: rows not in it are dropped."""
+        self._quotes = {}
+        self.ingest_quotes(rows)
+
+    def ingest_leads(self, rows):
+        """``(lead_id, user_id, local_hour)`` rows for leads assigned today."""
+        for lead_id, uid, hour in rows:
+            self._leads[lead_id] = (uid, hour)
+
+    def mark_booked(self, lead_ids):
+        self._booked.update(lead_ids)
+
+    @property
+    def lead_ids(self):
+        return list(self._leads)
+
+    # ── Aggregates ────────────────────────────────────────────────────────
+    def call_hours(self):
+        """{user_id: {hour: {"talk_secs","contacted","no_contact"}}}"""
+        out = defaultdict(lambda: defaultdict(lambda: {"talk_secs": 0.0, "contacted": 0, "no_contact": 0}))
+        for uids, hour, duration in self._calls.values():
+            if duration is None:
+                continue
+            for uid in uids:
+                b = out[uid][hour]
+                if duration > TALK_MIN_US:
+                    b["talk_secs"] += duration / 1_000_000
+                if duration >= self.contact_threshold_us:
+                    b["contacted"] += 1
+                else:
+                    b["no_contact"] += 1
+        return out
+
+    def latest_quotes(self):
+        """Latest sent quote per (adviser, lead) as {user_id: [(hour, value)]}.
+
+        Quotes sharing the latest ``created`` are all kept, as app._latest_quotes does.
+        """
+        latest = {}
+        for uid, lead_id, created, value in self._quotes.values():
+            cur = latest.get((uid, lead_id))
+            if cur is None or created > cur[0]:
+                latest[(uid, lead_id)] = (created, [value])
+            elif created == cur[0]:
+                cur[1].append(value)
+        out = defaultdict(list)
+        for (uid, _), (created, values) in latest.items():
+            out[uid].extend((created.hour, v) for v in values)
+        return out
+
+    def leads_by_hour(self):
+        """({user_id: {hour: assigned}}, {user_id: booked})"""
+        assigned = defaultdict(lambda: defaultdict(int))
+        booked = defaultdict(int)
+        for lead_id, (uid, hour) in self._leads.items():
+            assigned[uid][hour] += 1
+            if lead_id in self._booked:
+                booked[uid] += 1
+        return assigned, booked
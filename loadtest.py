@@ -0,0 +1,276 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import signal
+import logging
+import tempfile
+import itertools
+import subprocess
+import threading
+import statistics
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+
+import click
+
+import bench
+
+log = logging.getLogger("lip_analytics.loadtest")
+
+# End-to-end load test of "/" under gunicorn against the benchmark database
+# (see bench.py — run `python bench.py load` first).  Each configuration of
+# workers × threads × pool size gets a fresh gunicorn; virtual users replay a
+# mix of preset and custom-range page views.  Pool checkout timeouts and worker
+# timeouts are counted from the server log, so every worker is covered.
+LOADTEST_RESULTS_DIR = os.environ.get("LOADTEST_RESULTS_DIR", bench.BENCH_RESULTS_DIR)
+
+# Share of page views per kind; presets are spread evenly over D0…M1
+DEFAULT_MIX = {"preset": 0.7, "custom": 0.2, "activity": 0.1}
+_PERCENTILES = (50, 90, 95, 99)
+
+_LOG_PATTERNS = {
+    "pool_timeouts":  re.compile(r"get_connection failed: no database connection free"),
+    "worker_timeouts": re.compile(r"WORKER TIMEOUT"),
+    "server_errors":  re.compile(r"Exception on /"),
+}
+
+
+def _parse_list(value):
+    return [int(v) for v in str(value).split(",") if v.strip()]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ── Request mix ─────────────────────────────────────────────────────────────
+class RequestMix:
+    """Random page-view URLs: quick-filter presets, custom ranges and activity-mode views."""
+
+    def __init__(self, presets, first_day, last_day, mix, seed):
+        self.presets = list(presets.values())
+        self.first_day, self.last_day = first_day, last_day
+        self.kinds, self.weights = zip(*mix.items())
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _custom_range(self):
+        span = (self.last_day - self.first_day).days
+        length = self.rng.choice((3, 10, 14, 45, 90, 180))
+        end = self.last_day - timedelta(days=self.rng.randrange(max(1, span - length)))
+        return max(self.first_day, end - timedelta(days=length - 1)), end
+
+    def next_url(self):
+        with self._lock:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            start, end = self.rng.choice(self.presets) if kind != "custom" else self._custom_range()
+        mode = "&mode=activity" if kind == "activity" else ""
+        return kind, f"/?start={start.isoformat()}&end={end.isoformat()}{mode}"
+
+
+# ── Server ──────────────────────────────────────────────────────────────────
+class GunicornServer:
+    """The app under gunicorn with DB_* pointed at the benchmark database.
+
+    ``threads`` of 1 runs sync workers (the original deployment); more runs
+    gthread workers like the Procfile.  Local stores and state files go to a
+    scratch directory so a run never touches the app's own.
+    """
+
+    def __init__(self, workers, threads, pool_size, timeout, workdir, extra_env=None):
+        self.port = _free_port()
+        self.workdir = workdir
+        self.log_path = os.path.join(workdir, f"gunicorn-w{workers}-t{threads}-p{pool_size}.log")
+        env = {k: v for k, v in os.environ.items() if k != "AWS_SECRET_NAME"}
+        env.update({
+            "DB_HOST": bench.BENCH_DB_HOST, "DB_PORT": str(bench.BENCH_DB_PORT),
+            "DB_NAME": bench.BENCH_DB_NAME, "DB_USER": bench.BENCH_DB_USER,
+            "DB_PASSWORD": bench.BENCH_DB_PASSWORD, "DB_POOL_SIZE": str(pool_size),
+            "DASHBOARD_PASSWORD": "",
+            "ROLLUP_DB": os.path.join(workdir, "rollup.sqlite3"),
+            "PHONE_INDEX_DB": os.path.join(workdir, "phone_index.sqlite3"),
+            "PREWARM_DIR": os.path.join(workdir, "snapshots"),
+            "POLL_STATE_DIR": workdir,
+            **(extra_env or {}),
+        })
+        self.env = env
+        self.cmd = [sys.executable, "-m", "gunicorn", "app:app",
+                    "--workers", str(workers),
+                    "--worker-class", "gthread" if threads > 1 else "sync",
+                    "--threads", str(threads),
+                    "--bind", f"127.0.0.1:{self.port}",
+                    "--timeout", str(timeout)]
+        self.proc = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, ready_timeout=30):
+        self._log = open(self.log_path, "w")
+        self.proc = subprocess.Popen(self.cmd, env=self.env, stdout=self._log, stderr=subprocess.STDOUT,
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+        deadline = time.monotonic() + ready_timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise click.ClickException(f"gunicorn exited with {self.proc.returncode}; see {self.log_path}")
+            try:
+                urllib.request.urlopen(self.base_url + "/login", timeout=2).read()
+                return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.3)
+        self.stop()
+        raise click.ClickException(f"gunicorn did not come up within {ready_timeout}s; see {self.log_path}")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if getattr(self, "_log", None):
+            self._log.close()
+
+    def log_counts(self):
+        with open(self.log_path, errors="replace") as f:
+            text = f.read()
+        return {name: len(p.findall(text)) for name, p in _LOG_PATTERNS.items()}
+
+
+# ── Load generator ──────────────────────────────────────────────────────────
+def _percentiles(samples):
+    if not samples:
+        return {f"p{p}": None for p in _PERCENTILES}
+    data = sorted(samples)
+    return {f"p{p}": round(data[min(len(data) - 1, int(p / 100 * len(data)))], 1) for p in _PERCENTILES}
+
+
+def run_load(base_url, mix, users, duration, request_timeout, think_secs):
+    """``users`` threads request page views for ``duration`` seconds; returns the summary."""
+    results, lock = [], threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def user(i):
+        rng = random.Random(i)
+        while time.monotonic() < stop_at:
+            kind, url = mix.next_url()
+            t0 = time.monotonic()
+            try:
+                with urllib.request.urlopen(base_url + url, timeout=request_timeout) as resp:
+                    resp.read()
+                    status = resp.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (socket.timeout, TimeoutError):
+                status = "timeout"
+            except (urllib.error.URLError, OSError) as e:
+                status = "timeout" if "timed out" in str(e) else "error"
+            with lock:
+                results.append((kind, status, (time.monotonic() - t0) * 1000))
+            if think_secs:
+                time.sleep(rng.uniform(0, 2 * think_secs))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    ok = [ms for _, status, ms in results if status == 200]
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_kind = {}
+    for kind in sorted({k for k, _, _ in results}):
+        kind_ok = [ms for k, status, ms in results if k == kind and status == 200]
+        by_kind[kind] = {"requests": sum(1 for k, _, _ in results if k == kind), **_percentiles(kind_ok)}
+    return {
+        "requests": len(results), "ok": len(ok), "elapsed_s": round(elapsed, 1),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {**_percentiles(ok), "mean": round(statistics.mean(ok), 1) if ok else None,
+                       "max": round(max(ok), 1) if ok else None},
+        "statuses": statuses, "client_timeouts": statuses.get("timeout", 0), "by_kind": by_kind,
+    }
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+@click.command()
+@click.option("--workers", default="2", show_default=True, help="Gunicorn worker counts to sweep, e.g. 2,4.")
+@click.option("--threads", default="1", show_default=True, help="Threads per worker to sweep; 1 = sync workers.")
+@click.option("--pool", default="3", show_default=True, help="DB pool sizes (DB_POOL_SIZE) to sweep.")
+@click.option("--users", default=5, show_default=True, help="Concurrent virtual users (managers).")
+@click.option("--duration", default=60, show_default=True, help="Seconds of load per configuration.")
+@click.option("--warmup", default=10, show_default=True, help="Seconds of unrecorded load before measuring.")
+@click.option("--think", default=0.0, show_default=True, help="Mean think time between a user's page views (s).")
+@click.option("--mix", default=json.dumps(DEFAULT_MIX), show_default=True, help="JSON weights of preset/custom/activity.")
+@click.option("--request-timeout", default=130, show_default=True, help="Client timeout per request (s).")
+@click.option("--gunicorn-timeout", default=120, show_default=True, help="Gunicorn --timeout (s).")
+@click.option("--seed", default=7, show_default=True)
+@click.option("--out", default=None, help="Result file (default bench_results/loadtest-<timestamp>.json).")
+def main(workers, threads, pool, users, duration, warmup, think, mix, request_timeout, gunicorn_timeout, seed, out):
+    """Load-test "/" under gunicorn for every workers × threads × pool combination."""
+    conn = bench._connect()
+    cursor = conn.cursor()
+    bench._check_target(cursor)
+    cursor.execute("SELECT k, v FROM bench_meta")
+    meta = {k: json.loads(v) for k, v in cursor.fetchall()}
+    cursor.close(); conn.close()
+    if not meta:
+        raise click.ClickException("No dataset — run `python bench.py load` first")
+    last_day = date.fromisoformat(meta["end"])
+    first_day = last_day - timedelta(days=meta["days"] - 1)
+    today = date.today()
+    if last_day != today:
+        click.echo(f"warning: dataset ends {last_day}, presets are relative to today ({today})", err=True)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lip-loadtest-") as workdir:
+        app = bench._import_app(workdir)
+        presets = app.preset_ranges(today)
+        weights = json.loads(mix)
+        for w, t, p in itertools.product(_parse_list(workers), _parse_list(threads), _parse_list(pool)):
+            config = {"workers": w, "threads": t, "pool_size": p, "users": users}
+            click.echo(f"── workers={w} threads={t} pool={p} users={users}")
+            server = GunicornServer(w, t, p, gunicorn_timeout, workdir)
+            server.start()
+            try:
+                if warmup:
+                    run_load(server.base_url, RequestMix(presets, first_day, last_day, weights, seed),
+                             users, warmup, request_timeout, think)
+                before = server.log_counts()
+                summary = run_load(server.base_url, RequestMix(presets, first_day, last_day, weights, seed + 1),
+                                   users, duration, request_timeout, think)
+                after = server.log_counts()
+            finally:
+                server.stop()
+            summary["server"] = {k: after[k] - before[k] for k in after}
+            results.append({"config": config, **summary})
+            lat = summary["latency_ms"]
+            click.echo(f"   {summary['throughput_rps']:.2f} req/s  p50 {lat['p50']} ms  p95 {lat['p95']} ms  "
+                       f"p99 {lat['p99']} ms  timeouts {summary['client_timeouts']}  "
+                       f"pool timeouts {summary['server']['pool_timeouts']}  "
+                       f"worker timeouts {summary['server']['worker_timeouts']}")
+
+    doc = {"meta": {"dataset": meta, "git_rev": bench._git_rev(), "duration_s": duration, "warmup_s": warmup,
+                    "think_s": think, "mix": weights, "run_at": datetime.now().isoformat(timespec="seconds")},
+           "results": results}
+    if out is None:
+        os.makedirs(LOADTEST_RESULTS_DIR, exist_ok=True)
+        out = os.path.join(LOADTEST_RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, "w") as f:
+        json.dump(doc, f, indent=2)
+    click.echo(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+
+log = logging.getLogger("lip_analytics.metrics")
+
+# In-process metrics for /metrics (Prometheus text format).  Every gunicorn
+# worker keeps its own registry; series carry a ``pid`` label so scrapes that
+# land on different workers never mix their counters.
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", 500))   # recent samples per series for quantiles
+
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def range_bucket(start, end):
+    """Range length label: day, week, month, quarter or year (anything longer than a quarter)."""
+    if start is None or end is None:
+        return "none"
+    days = (end - start).days + 1
+    for label, limit in (("day", 1), ("week", 7), ("month", 31), ("quarter", 92)):
+        if days <= limit:
+            return label
+    return "year"
+
+
+class _Histogram:
+    """Cumulative bucket counts plus the last METRICS_WINDOW samples for quantiles."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=METRICS_WINDOW)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        data = sorted(self.recent)
+        if not data:
+            return {}
+        return {q: data[min(len(data) - 1, int(q * len(data)))] for q in _QUANTILES}
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}         # name -> (type, help)
+        self._counters = {}     # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> _Histogram
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=_DURATION_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = _Histogram(buckets)
+            h.observe(value)
+
+    def render(self, gauges=()):
+        """Prometheus text exposition.  ``gauges`` adds ``(name, kind, help, value, labels)`` samples."""
+        lines, seen = [], set()
+
+        def header(name, kind, text):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def fmt(name, labels, value, **extra):
+            items = dict(labels, pid=os.getpid(), **extra)
+            body = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(items.items()))
+            lines.append(f"{name}{{{body}}} {value}")
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            snap = [(key, list(h.counts), h.sum, h.count, h.quantiles(), h.buckets) for key, h in histograms]
+
+        for (name, labels), value in counters:
+            header(name, *self._help.get(name, ("counter", name)))
+            fmt(name, labels, value)
+        for (name, labels), counts, total, count, quantiles, buckets in snap:
+            header(name, *self._help.get(name, ("histogram", name)))
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                fmt(f"{name}_bucket", labels, cumulative, le=f"{bound:g}")
+            fmt(f"{name}_bucket", labels, count, le="+Inf")
+            fmt(f"{name}_sum", labels, round(total, 6))
+            fmt(f"{name}_count", labels, count)
+            recent = f"{name}_recent"
+            header(recent, "summary", f"Quantiles of the last {METRICS_WINDOW} samples of {name}")
+            for q, v in quantiles.items():
+                fmt(recent, labels, round(v, 6), quantile=f"{q:g}")
+        for name, kind, text, value, labels in gauges:
+            header(name, kind, text)
+            fmt(name, tuple(sorted(labels.items())), value)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+REGISTRY.describe("lip_stage_duration_seconds", "histogram", "Dashboard stage duration by stage, range length and cache hit")
+REGISTRY.describe("lip_stage_rows_total", "counter", "Rows fetched by dashboard stages")
+REGISTRY.describe("lip_stage_bytes_total", "counter", "Estimated bytes fetched by dashboard stages")
+REGISTRY.describe("lip_db_pool_wait_seconds", "histogram", "Time spent queued (FIFO) for a pooled connection before checkout")
+REGISTRY.describe("lip_db_pool_failures_total", "counter", "Connection checkouts that failed: PoolTimeout or a failed connect")
+REGISTRY.describe("lip_request_duration_seconds", "histogram", "Request duration by endpoint")
+REGISTRY.describe("lip_response_bytes_total", "counter", "Response body bytes sent, after compression")
+
+
+# ── Stage instrumentation ───────────────────────────────────────────────────
+class CountingCursor:
+    """Cursor wrapper that counts fetched rows and estimates their size.
+
+    The size is the first row of each fetch (string and bytes lengths, 8 per
+    other value) times the row count — cheap enough for the call scans.
+    """
+
+    def __init__(self, cursor, pool_wait=0.0):
+        self._cursor = cursor
+        self.pool_wait = pool_wait
+        self.rows = 0
+        self.bytes = 0
+
+    def _count(self, rows):
+        if rows:
+            first = rows[0].values() if isinstance(rows[0], dict) else rows[0]
+            self.rows += len(rows)
+            self.bytes += len(rows) * sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in first)
+        return rows
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        return self._count(self._cursor.fetchmany(size))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count([row])
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class StageTimer:
+    """Timer for ``executor.run_stages`` that records every stage.
+
+    Called as ``timer(label, fn, *args)`` like ``app._timed``: logs the
+    duration, feeds the stage histograms under ``range_label`` and, when
+    ``sink`` is a list (the current request's), appends an entry for the
+    Server-Timing header.
+    """
+
+    def __init__(self, range_label="none", sink=None):
+        self.range_label = range_label
+        self.sink = sink
+
+    def __call__(self, label, fn, *args, **kwargs):
+        t0 = time.monotonic()
+        result = fn(*args, **kwargs)
+        secs = time.monotonic() - t0
+        stage, _, flag = label.partition(":")
+        cursor = next((a for a in args if isinstance(a, CountingCursor)), None)
+        rows, nbytes, wait = (cursor.rows, cursor.bytes, cursor.pool_wait) if cursor else (0, 0, 0.0)
+        log.info("[%s] %.0f ms", label, secs * 1000)
+        REGISTRY.observe("lip_stage_duration_seconds", secs, stage=stage, range=self.range_label,
+                         cached="1" if flag == "cached" else "0")
+        if rows:
+            REGISTRY.inc("lip_stage_rows_total", rows, stage=stage)
+            REGISTRY.inc("lip_stage_bytes_total", nbytes, stage=stage)
+        if self.sink is not None:
+            self.sink.append({"stage": stage, "ms": secs * 1000, "cached": flag == "cached",
+                              "rows": rows, "bytes": nbytes, "pool_wait_ms": wait * 1000})
+        return result
+
+
+def server_timing(entries, total_ms=None):
+    """``Server-Timing`` header value for the stage entries of one request."""
+    parts = []
+    for e in entries:
+        if e["cached"]:
+            desc = "cached"
+        else:
+            desc = f"{e['rows']} rows, {e['bytes'] / 1024:.1f} KB, pool wait {e['pool_wait_ms']:.0f} ms"
+        parts.append(f'{_TOKEN_RE.sub("_", e["stage"])};dur={e["ms"]:.1f};desc="{desc}"')
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+log = logging.getLogger("lip_analytics.phone_index")
+
+PHONE_INDEX_DB = os.environ.get("PHONE_INDEX_DB",
+                                os.path.join(os.path.dirname(__file__), "phone_index.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id   INTEGER PRIMARY KEY,
+    phone     TEXT    NOT NULL,
+    extension TEXT,
+    duration  INTEGER NOT NULL DEFAULT 0,
+    created   TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_phone ON calls (phone, created);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite caps bound parameters per statement; look phones up in chunks
+_LOOKUP_CHUNK = 500
+
+
+def normalize_phone(phone):
+    """Same normalization the CRM queries apply in SQL: strip spaces and dashes."""
+    return (phone or "").replace(" ", "").replace("-", "")
+
+
+class PhoneIndex:
+    """Local SQLite index of hung-up calls by normalized phone number.
+
+    Maps each normalized phone to its calls (id, extension, duration in µs,
+    UTC created).  Fed from noojee_callrecord by app.py; readers use it to
+    match calls to leads without scanning the call table.
+    """
+
+    def __init__(self, path=PHONE_INDEX_DB):
+        self.path = path
+        self.refresh_lock = threading.Lock()
+        with self._session() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    @contextmanager
+    def _session(self):
+        """Connection that commits on success and is always closed."""
+        db = self._connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ── Watermarks / metadata ─────────────────────────────────────────────
+    def get_meta(self, key, default=None):
+        with self._session() as db:
+            row = db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, **values):
+        with self._session() as db:
+            db.executemany("INSERT INTO meta (key, value) VALUES (?, ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                           [(k, None if v is None else str(v)) for k, v in values.items()])
+
+    def is_built(self):
+        """True once the initial full build has completed."""
+        return bool(self.get_meta("built_at"))
+
+    # ── Writes ────────────────────────────────────────────────────────────
+    def upsert_calls(self, rows):
+        """Upsert ``(call_id, raw_phone, extension, duration_us, created_iso)`` rows.
+
+        Re-reading a call (e.g. its duration was updated) replaces it.
+        Returns the number of rows written.
+        """
+        data = [(cid, normalize_phone(phone), ext, int(dur or 0), created)
+                for cid, phone, ext, dur, created in rows if normalize_phone(phone)]
+        with self._session() as db:
+            db.executemany("INSERT INTO calls (call_id, phone, extension, duration, created) "
+                           "VALUES (?, ?, ?, ?, ?) ON CONFLICT(call_id) DO UPDATE SET "
+                           "phone=excluded.phone, extension=excluded.extension, "
+                           "duration=excluded.duration, created=excluded.created", data)
+        return len(data)
+
+    # ── Reads ─────────────────────────────────────────────────────────────
+    def lookup(self, phones, extensions=None):
+        """Calls per normalized phone, newest first, as ``{phone: [call dict]}``.
+
+        ``extensions`` optionally restricts to calls made from those extensions.
+        """
+        phones = list({normalize_phone(p) for p in phones} - {""})
+        ext_sql, ext_params = "", ()
+        if extensions is not None:
+            extensions = [str(e) for e in extensions]
+            if not extensions:
+                return {}
+            ext_sql = f" AND extension IN ({','.join('?' for _ in extensions)})"
+            ext_params = tuple(extensions)
+        out = defaultdict(list)
+        with self._session() as db:
+            for i in range(0, len(phones), _LOOKUP_CHUNK):
+                chunk = phones[i:i + _LOOKUP_CHUNK]
+                marks = ",".join("?" for _ in chunk)
+                for r in db.execute(f"SELECT * FROM calls WHERE phone IN ({marks}){ext_sql} "
+                                    f"ORDER BY created DESC, call_id DESC",
+                                    (*chunk, *ext_params)):
+                    out[r["phone"]].append(dict(r))
+        return dict(out)
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        log.info("Opening phone index (%s)", PHONE_INDEX_DB)
+        _index = PhoneIndex()
+    return _index
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+
+log = logging.getLogger("lip_analytics.poller")
+
+# One poller per host: every gunicorn worker may start a poller thread, but only
+# the one holding an flock on the lock file queries the DB.  It publishes the
+# change watermarks to a small JSON state file that every worker reads.
+POLL_INTERVAL_SECS = int(os.environ.get("POLL_INTERVAL_SECS", 60))
+POLL_IDLE_SECS     = int(os.environ.get("POLL_IDLE_SECS", 120))
+POLL_STATE_DIR     = os.environ.get("POLL_STATE_DIR", os.path.dirname(os.path.abspath(__file__)))
+
+_STATE_FILE     = os.path.join(POLL_STATE_DIR, "poll_state.json")
+_LOCK_FILE      = os.path.join(POLL_STATE_DIR, "poll.lock")
+_HEARTBEAT_FILE = os.path.join(POLL_STATE_DIR, "poll.heartbeat")
+_HISTORY = 50   # change entries kept so reconnecting clients can catch up
+
+_EMPTY_STATE = {"version": 0, "checked_at": None, "watermarks": {}, "history": []}
+
+
+# ── Shared state file ───────────────────────────────────────────────────────
+_state_cache = (None, _EMPTY_STATE)   # (mtime_ns, state)
+_state_lock = threading.Lock()
+
+def read_state():
+    """Current shared state; re-parsed only when the file changed."""
+    global _state_cache
+    try:
+        mtime = os.stat(_STATE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return _EMPTY_STATE
+    with _state_lock:
+        if _state_cache[0] != mtime:
+            try:
+                with open(_STATE_FILE) as f:
+                    _state_cache = (mtime, json.load(f))
+            except (OSError, ValueError) as e:
+                log.warning("[poller] unreadable state file: %s", e)
+        return _state_cache[1]
+
+def _write_state(state):
+    tmp = f"{_STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, _STATE_FILE)
+
+def changes_since(version):
+    """(current_version, sources changed after ``version``).
+
+    If ``version`` is older than the kept history every known source is
+    reported as changed.
+    """
+    state = read_state()
+    current = state["version"]
+    if version is None or version >= current:
+        return current, set()
+    history = state["history"]
+    if not history or history[0]["version"] > version + 1:
+        return current, set(state["watermarks"])
+    return current, {s for h in history if h["version"] > version for s in h["sources"]}
+
+_applied_version = None
+_applied_lock = threading.Lock()
+
+def take_new_changes():
+    """Sources changed since this process last asked (nothing on the first call)."""
+    global _applied_version
+    with _applied_lock:
+        if _applied_version is None:
+            _applied_version = read_state()["version"]
+            return set()
+        _applied_version, sources = changes_since(_applied_version)
+        return sources
+
+
+# ── Client heartbeat (idle dashboards stop the DB polling) ─────────────────
+def heartbeat():
+    """Record that a live client is connected on this host."""
+    try:
+        with open(_HEARTBEAT_FILE, "a"):
+            os.utime(_HEARTBEAT_FILE)
+    except OSError as e:
+        log.warning("[poller] heartbeat failed: %s", e)
+
+def _clients_active():
+    try:
+        return time.time() - os.stat(_HEARTBEAT_FILE).st_mtime < POLL_IDLE_SECS
+    except FileNotFoundError:
+        return False
+
+
+# ── Poller ──────────────────────────────────────────────────────────────────
+class HostLock:
+    """Non-blocking flock kept for the life of the process — elects one worker per host."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self._fd = None
+
+    def acquire(self):
+        """True if this process holds (or just took) the lock."""
+        if self._fd is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            log.info("pid %d is the %s for this host", os.getpid(), self.name)
+        return True
+
+
+class Poller:
+    """Background thread that publishes DB change watermarks for the host.
+
+    ``fetch_watermarks()`` returns ``{source: watermark_str}``; a source whose
+    watermark differs from the last published one is recorded as changed.
+    """
+
+    def __init__(self, fetch_watermarks):
+        self.fetch_watermarks = fetch_watermarks
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._host_lock = HostLock(_LOCK_FILE, "change poller")
+
+    def start(self):
+        """Start the thread in this process (idempotent)."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-poller", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self._host_lock.acquire() and _clients_active():
+                    self.poll_once()
+            except Exception as e:
+                log.warning("[poller] %s", e)
+            time.sleep(POLL_INTERVAL_SECS)
+
+    def poll_once(self):
+        """Fetch watermarks and publish any change.  Returns the changed sources."""
+        marks = {k: None if v is None else str(v) for k, v in self.fetch_watermarks().items()}
+        state = dict(read_state())
+        prev = state["watermarks"]
+        changed = sorted(s for s in marks if prev and prev.get(s) != marks[s])
+        state["watermarks"] = marks
+        state["checked_at"] = time.time()
+        if changed:
+            state["version"] += 1
+            state["history"] = (state["history"] + [{"version": state["version"], "sources": changed}])[-_HISTORY:]
+            log.info("[poller] v%d changed: %s", state["version"], ", ".join(changed))
+        _write_state(state)
+        return changed
@@ -0,0 +1,170 @@
+import os
+import time
+import pickle
+import logging
+import threading
+from datetime import date, datetime
+
+from poller import HostLock
+
+log = logging.getLogger("lip_analytics.prewarm")
+
+# Every preset is rebuilt every PREWARM_INTERVAL_SECS and on each data change,
+# past ones (D1/W1/M1) included: their call and quote totals are settled, but
+# lead status, notes, bookings and remediations are shown as they are now.
+PREWARM_INTERVAL_SECS = int(os.environ.get("PREWARM_INTERVAL_SECS", 300))   # 0 disables
+PREWARM_MODES = tuple(m.strip() for m in os.environ.get("PREWARM_MODES", "funnel").split(",") if m.strip())
+PREWARM_DIR = os.environ.get("PREWARM_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+_TICK_SECS = 30
+
+
+class SnapshotStore:
+    """Prebuilt dashboard data per (preset, mode, group), shared by the workers on a host.
+
+    One pickle file per snapshot, replaced atomically; readers keep the last
+    loaded copy until the file's mtime changes.
+    """
+
+    def __init__(self, path=PREWARM_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._loaded = {}   # key -> (mtime_ns, snapshot)
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def save(self, key, snapshot):
+        tmp = f"{self._file(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+
+    def load(self, key):
+        """Snapshot dict (``start``, ``end``, ``mode``, ``group``, ``version``, ``built_at``, ``duration_ms``, ``data``) or None."""
+        try:
+            mtime = os.stat(self._file(key)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._loaded.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(self._file(key), "rb") as f:
+                snap = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            log.warning("[prewarm] unreadable snapshot %s: %s", key, e)
+            return None
+        with self._lock:
+            self._loaded[key] = (mtime, snap)
+        return snap
+
+
+def snapshot_key(preset, mode, group):
+    return f"{preset}-{mode}-g{group}"
+
+
+class Prewarmer:
+    """Background thread that keeps a snapshot of every preset warm.
+
+    ``presets(today)`` returns ``{name: (start, end)}``; ``build(start, end,
+    mode, group, today)`` returns the dashboard data to store for each of
+    ``groups``.  ``version()`` is the data-change version (see poller.py): a
+    snapshot built at an older version is neither served nor kept.
+    ``before_build()`` runs ahead of each build, after the version is read, to
+    drop cached results older than that version.  Only the worker holding the
+    host lock builds; every worker can read the snapshots.
+    """
+
+    def __init__(self, presets, build, groups, version=lambda: 0, before_build=lambda: None, store=None):
+        self.presets = presets
+        self.build = build
+        self.groups = tuple(groups)
+        self.version = version
+        self.before_build = before_build
+        self.store = store or SnapshotStore()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._host_lock = HostLock(os.path.join(self.store.path, "prewarm.lock"), "preset prewarmer")
+
+    def start(self):
+        """Start the thread in this process (idempotent; no-op when disabled)."""
+        if PREWARM_INTERVAL_SECS <= 0:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self._host_lock.acquire():
+                    self.run_due()
+            except Exception as e:
+                log.warning("[prewarm] %s", e)
+            time.sleep(_TICK_SECS)
+
+    def _fresh(self, snap, start, end, today):
+        if snap is None or (snap["start"], snap["end"]) != (start, end):
+            return False
+        return (time.time() - snap["built_at"] < PREWARM_INTERVAL_SECS
+                and snap["version"] == self.version())
+
+    def run_due(self, today=None):
+        """Build every snapshot that is missing, rolled over or stale."""
+        today = today or date.today()
+        for name, (start, end) in self.presets(today).items():
+            for mode in PREWARM_MODES:
+                for group in self.groups:
+                    key = snapshot_key(name, mode, group)
+                    if self._fresh(self.store.load(key), start, end, today):
+                        continue
+                    version = self.version()
+                    self.before_build()
+                    t0 = time.monotonic()
+                    data = self.build(start, end, mode, group, today)
+                    duration_ms = round((time.monotonic() - t0) * 1000)
+                    self.store.save(key, {"preset": name, "mode": mode, "group": group,
+                                          "start": start, "end": end,
+                                          "version": version, "built_at": time.time(),
+                                          "duration_ms": duration_ms, "data": data})
+                    log.info("[prewarm] %s %s..%s built in %d ms", key, start, end, duration_ms)
+
+    def lookup(self, start, end, mode, group, today=None):
+        """Warm data for exactly this range, mode and group, or None."""
+        today = today or date.today()
+        for name, rng in self.presets(today).items():
+            if rng != (start, end):
+                continue
+            snap = self.store.load(snapshot_key(name, mode, group))
+            if self._fresh(snap, start, end, today):
+                return snap["data"]
+        return None
+
+    def latest(self, preset, mode, group, today=None):
+        """``(snapshot, fresh)`` for a preset even when stale, or None before its first build."""
+        today = today or date.today()
+        snap = self.store.load(snapshot_key(preset, mode, group))
+        if snap is None:
+            return None
+        start, end = self.presets(today)[preset]
+        return snap, self._fresh(snap, start, end, today)
+
+    def status(self, today=None):
+        """Build time and duration of every snapshot, for /api/prewarm."""
+        today = today or date.today()
+        out = []
+        for name, (start, end) in self.presets(today).items():
+            for mode in PREWARM_MODES:
+                for group in self.groups:
+                    snap = self.store.load(snapshot_key(name, mode, group))
+                    out.append({
+                        "preset": name, "mode": mode, "group": group,
+                        "start": start.isoformat(), "end": end.isoformat(),
+                        "built_at": datetime.fromtimestamp(snap["built_at"]).isoformat(timespec="seconds") if snap else None,
+                        "duration_ms": snap["duration_ms"] if snap else None,
+                        "fresh": self._fresh(snap, start, end, today),
+                    })
+        return out
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+log = logging.getLogger("lip_analytics.querylog")
+
+# Every statement run on a pooled connection is timed from execute() to its
+# last fetched row and aggregated under its normalized SQL.  Statements slower
+# than SLOW_QUERY_MS are logged with their parameters and, at most once per
+# SLOW_QUERY_EXPLAIN_SECS per statement, re-run under EXPLAIN FORMAT=JSON on
+# the same connection so full scans and filesorts show up before users notice.
+SLOW_QUERY_MS           = float(os.environ.get("SLOW_QUERY_MS", 500))            # 0 disables logging and EXPLAIN
+SLOW_QUERY_EXPLAIN_SECS = int(os.environ.get("SLOW_QUERY_EXPLAIN_SECS", 3600))   # re-EXPLAIN interval; 0 never
+SLOW_QUERY_MAX_STATEMENTS = int(os.environ.get("SLOW_QUERY_MAX_STATEMENTS", 500))
+_PARAMS_REPR_MAX = 300
+
+_STRING_RE  = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE  = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE   = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "WITH")
+
+
+def normalize_sql(sql):
+    """Statement shape: literals and placeholders become ``?``, IN lists ``(?+)``, whitespace collapsed."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(?+)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def plan_flags(plan):
+    """Problems in an EXPLAIN FORMAT=JSON plan: full-scanned tables, filesort, temporary table."""
+    full_scans, flags = [], set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("access_type") == "ALL":
+                full_scans.append({"table": node.get("table_name"),
+                                   "rows": node.get("rows_examined_per_scan")})
+            if node.get("using_filesort"):
+                flags.add("filesort")
+            if node.get("using_temporary_table"):
+                flags.add("temporary")
+            for v in node.values():
+                walk(v)
+        elif isinstance(node, list):
+            for v in node:
+                walk(v)
+
+    walk(plan)
+    if full_scans:
+        flags.add("full_scan")
+    return {"flags": sorted(flags), "full_scans": full_scans}
+
+
+class _Statement:
+    __slots__ = ("sql", "count", "total_ms", "max_ms", "rows", "slow", "last_slow",
+                 "plan", "plan_flags", "explained_at")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.last_slow = None     # {"at", "ms", "rows", "params"} of the latest slow run
+        self.plan = None
+        self.plan_flags = None
+        self.explained_at = 0.0
+
+
+class QueryLog:
+    """Per-process statement stats keyed by normalized SQL.
+
+    When more than ``max_statements`` shapes are seen, the one with the least
+    total time is dropped.
+    """
+
+    def __init__(self, max_statements=SLOW_QUERY_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._stmts = {}
+        self.since = time.time()
+
+    def record(self, sql, ms, rows):
+        """Add one run; returns the statement's stats for the slow path."""
+        key = normalize_sql(sql)
+        with self._lock:
+            st = self._stmts.get(key)
+            if st is None:
+                if len(self._stmts) >= self.max_statements:
+                    del self._stmts[min(self._stmts, key=lambda k: self._stmts[k].total_ms)]
+                st = self._stmts[key] = _Statement(key)
+            st.count += 1
+            st.total_ms += ms
+            st.max_ms = max(st.max_ms, ms)
+            st.rows += rows
+        return st
+
+    def note_slow(self, st, ms, rows, params):
+        with self._lock:
+            st.slow += 1
+            st.last_slow = {"at": time.time(), "ms": round(ms, 1), "rows": rows,
+                            "params": _params_repr(params)}
+
+    def wants_plan(self, st):
+        """True once per SLOW_QUERY_EXPLAIN_SECS per statement; claims the slot."""
+        if SLOW_QUERY_EXPLAIN_SECS <= 0:
+            return False
+        with self._lock:
+            now = time.time()
+            if now - st.explained_at < SLOW_QUERY_EXPLAIN_SECS:
+                return False
+            st.explained_at = now
+            return True
+
+    def set_plan(self, st, plan):
+        flags = plan_flags(plan)
+        with self._lock:
+            st.plan, st.plan_flags = plan, flags
+        return flags
+
+    def top(self, limit=50):
+        """Statements by total time, worst first."""
+        with self._lock:
+            stmts = sorted(self._stmts.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+            return [{
+                "sql": s.sql, "count": s.count, "total_ms": round(s.total_ms, 1),
+                "avg_ms": round(s.total_ms / s.count, 1) if s.count else 0.0,
+                "max_ms": round(s.max_ms, 1), "rows": s.rows, "slow": s.slow,
+                "last_slow": s.last_slow, "plan": s.plan,
+                "flags": s.plan_flags["flags"] if s.plan_flags else [],
+                "full_scans": s.plan_flags["full_scans"] if s.plan_flags else [],
+            } for s in stmts]
+
+    def reset(self):
+        with self._lock:
+            self._stmts.clear()
+            self.since = time.time()
+
+
+def _params_repr(params):
+    text = repr(params)
+    return text if len(text) <= _PARAMS_REPR_MAX else text[:_PARAMS_REPR_MAX] + "…"
+
+
+QUERY_LOG = QueryLog()
+
+
+class ObservedCursor:
+    """Cursor wrapper that times each statement until its results are drained.
+
+    A statement ends at ``fetchall()``, a ``fetchone()``/``fetchmany()`` that
+    comes back empty, a ``fetchone()`` after which the connection has no
+    unread result, the next ``execute()`` or ``close()``.  EXPLAIN only runs
+    when the results were fully read, so the connection is free for it.
+    """
+
+    def __init__(self, cursor, conn, querylog=QUERY_LOG):
+        self._cursor = cursor
+        self._conn = conn
+        self._log = querylog
+        self._pending = None   # [sql, params, t0, rows]
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._finish(drained=False)
+        self._pending = [operation, params, time.monotonic(), 0]
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        except Exception:
+            self._pending = None
+            raise
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._add(len(rows))
+        self._finish(drained=True)
+        return rows
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        self._add(len(rows))
+        if len(rows) < size:
+            self._finish(drained=True)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._add(1)
+        # The connector reads one row ahead, so a single-row result (MAX(),
+        # COUNT()) is already drained here and needs no extra fetch
+        if row is None or not getattr(self._conn, "unread_result", True):
+            self._finish(drained=True)
+        return row
+
+    def close(self):
+        self._finish(drained=False)
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _add(self, n):
+        if self._pending is not None:
+            self._pending[3] += n
+
+    def _finish(self, drained):
+        if self._pending is None:
+            return
+        sql, params, t0, rows = self._pending
+        self._pending = None
+        ms = (time.monotonic() - t0) * 1000
+        try:
+            st = self._log.record(sql, ms, rows)
+            if SLOW_QUERY_MS <= 0 or ms < SLOW_QUERY_MS:
+                return
+            self._log.note_slow(st, ms, rows, params)
+            flags = None
+            if drained and self._explainable(sql) and self._log.wants_plan(st):
+                flags = self._log.set_plan(st, self._explain(sql, params))
+            log.warning("[slow-query] %.0f ms, %d rows%s: %s | params=%s", ms, rows,
+                        f" [{', '.join(flags['flags'])}]" if flags and flags["flags"] else "",
+                        st.sql, _params_repr(params))
+        except Exception as e:
+            log.warning("[slow-query] could not record statement: %s", e)
+
+    @staticmethod
+    def _explainable(sql):
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8", "replace")
+        return sql.lstrip().lstrip("(").upper().startswith(_EXPLAINABLE)
+
+    def _explain(self, sql, params):
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("EXPLAIN FORMAT=JSON " + sql, params)
+            row = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return json.loads(row[0]) if row else None
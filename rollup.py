@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import date, timedelta
+from contextlib import contextmanager
+from collections import defaultdict
+
+log = logging.getLogger("lip_analytics.rollup")
+
+ROLLUP_DB = os.environ.get("ROLLUP_DB", os.path.join(os.path.dirname(__file__), "rollup.sqlite3"))
+
+# One row per (adviser, local day).  Grouped by the source table that feeds them;
+# each group is recomputed independently when its source is tailed.
+CALL_COLS      = ("talk_secs", "contacted", "no_contact")
+QUOTE_COLS     = ("quotes", "quotes_value")
+USERSTATS_COLS = ("apps_count", "apps_value", "inforce_count", "inforce_value",
+                  "rs_contact", "rs_quotes", "worked")
+LEAD_COLS      = ("assigned", "booked")
+ALL_COLS = CALL_COLS + QUOTE_COLS + USERSTATS_COLS + LEAD_COLS
+
+# Coarser buckets kept precomputed next to the daily rows: weekday (Mon-Fri)
+# sums per adviser per week (keyed by its Monday) and month (keyed by the 1st),
+# the same days the charts plot.  Rebuilt for every period a write touches.
+PERIOD_UNITS = ("week", "month")
+_PERIODS_VERSION = "1"
+_WEEKDAY_SQL = "strftime('%w', day) NOT IN ('0', '6')"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS daily (
+    user_id INTEGER NOT NULL,
+    day     TEXT    NOT NULL,
+    {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in ALL_COLS)},
+    PRIMARY KEY (user_id, day)
+);
+CREATE INDEX IF NOT EXISTS daily_day ON daily (day);
+CREATE TABLE IF NOT EXISTS periods (
+    unit    TEXT    NOT NULL,
+    period  TEXT    NOT NULL,
+    user_id INTEGER NOT NULL,
+    {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in ALL_COLS)},
+    PRIMARY KEY (unit, period, user_id)
+);
+CREATE TABLE IF NOT EXISTS leads (
+    lead_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    day     TEXT,
+    booked  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS leads_user_day ON leads (user_id, day);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def period_start(day, unit):
+    """First day of the week (Monday) or month containing ``day``."""
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    raise ValueError(f"unknown period unit {unit!r}")
+
+
+def period_end(start, unit):
+    """Last day of the period beginning ``start``."""
+    if unit == "week":
+        return start + timedelta(days=6)
+    return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def period_starts(start, end, unit):
+    """Start days of every week/month overlapping start..end, in order."""
+    out, p = [], period_start(start, unit)
+    while p <= end:
+        out.append(p)
+        p = period_end(p, unit) + timedelta(days=1)
+    return out
+
+
+class RollupStore:
+    """Local SQLite store of per-adviser daily aggregates and their week/month sums.
+
+    The store only knows how to persist and read rollup rows; the MySQL
+    queries that feed it live in app.py next to the live get_* queries.
+    Safe to share between threads and gunicorn workers on one host.
+    """
+
+    def __init__(self, path=ROLLUP_DB):
+        self.path = path
+        self.refresh_lock = threading.Lock()
+        with self._session() as db:
+            db.executescript(_SCHEMA)
+            built = db.execute("SELECT value FROM meta WHERE key='periods_version'").fetchone()
+            if not built or built["value"] != _PERIODS_VERSION:
+                # Stores created before the period table: build it from the daily rows once
+                first, last = db.execute("SELECT MIN(day), MAX(day) FROM daily").fetchone()
+                db.execute("DELETE FROM periods")
+                if first:
+                    self._rebuild_periods(db, _days(date.fromisoformat(first), date.fromisoformat(last)))
+                db.execute("INSERT INTO meta (key, value) VALUES ('periods_version', ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (_PERIODS_VERSION,))
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    @contextmanager
+    def _session(self):
+        """Connection that commits on success and is always closed."""
+        db = self._connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ── Watermarks / metadata ─────────────────────────────────────────────
+    def get_meta(self, key, default=None):
+        with self._session() as db:
+            row = db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, **values):
+        with self._session() as db:
+            db.executemany("INSERT INTO meta (key, value) VALUES (?, ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                           [(k, None if v is None else str(v)) for k, v in values.items()])
+
+    def covers(self, start):
+        """True once a backfill has loaded history from ``start`` or earlier."""
+        since = self.get_meta("backfilled_from")
+        return bool(since) and since <= start.isoformat()
+
+    # ── Writes ────────────────────────────────────────────────────────────
+    def replace_days(self, cols, first_day, last_day, rows):
+        """Replace ``cols`` for every adviser on days first_day..last_day.
+
+        ``rows`` is an iterable of ``(user_id, day_iso, {col: value})``.  Days
+        in the window with no row are zeroed, so recomputing a window is
+        idempotent.
+        """
+        set_zero = ", ".join(f"{c}=0" for c in cols)
+        insert = (f"INSERT INTO daily (user_id, day, {', '.join(cols)}) "
+                  f"VALUES (?, ?, {', '.join('?' for _ in cols)}) "
+                  f"ON CONFLICT(user_id, day) DO UPDATE SET "
+                  + ", ".join(f"{c}=excluded.{c}" for c in cols))
+        with self._session() as db:
+            db.execute(f"UPDATE daily SET {set_zero} WHERE day BETWEEN ? AND ?",
+                       (first_day.isoformat(), last_day.isoformat()))
+            db.executemany(insert, [(uid, day, *(vals.get(c, 0) for c in cols))
+                                    for uid, day, vals in rows])
+            self._rebuild_periods(db, _days(first_day, last_day))
+
+    def upsert_leads(self, rows):
+        """Upsert ``(lead_id, user_id, day_iso, booked)`` rows.
+
+        Returns the set of (user_id, day) buckets touched — both the new and,
+        for reassigned leads, the previous one.
+        """
+        rows = list(rows)
+        touched = set()
+        with self._session() as db:
+            for lead_id, uid, day, booked in rows:
+                old = db.execute("SELECT user_id, day FROM leads WHERE lead_id=?", (lead_id,)).fetchone()
+                if old:
+                    touched.add((old["user_id"], old["day"]))
+                touched.add((uid, day))
+                db.execute("INSERT INTO leads (lead_id, user_id, day, booked) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT(lead_id) DO UPDATE SET user_id=excluded.user_id, "
+                           "day=excluded.day, booked=MAX(leads.booked, excluded.booked)",
+                           (lead_id, uid, day, int(bool(booked))))
+        return touched
+
+    def mark_booked(self, lead_ids):
+        """Flag mirrored leads as booked.  Returns the (user_id, day) buckets touched."""
+        touched = set()
+        with self._session() as db:
+            for lead_id in set(lead_ids):
+                row = db.execute("SELECT user_id, day, booked FROM leads WHERE lead_id=?",
+                                 (lead_id,)).fetchone()
+                if row and not row["booked"]:
+                    db.execute("UPDATE leads SET booked=1 WHERE lead_id=?", (lead_id,))
+                    touched.add((row["user_id"], row["day"]))
+        return touched
+
+    def rebuild_lead_buckets(self, buckets):
+        """Recount assigned/booked for the given (user_id, day) buckets from the lead mirror."""
+        buckets = [(u, d) for u, d in buckets if u is not None and d]
+        with self._session() as db:
+            for uid, day in buckets:
+                r = db.execute("SELECT COUNT(*) AS assigned, COALESCE(SUM(booked),0) AS booked "
+                               "FROM leads WHERE user_id=? AND day=?", (uid, day)).fetchone()
+                db.execute("INSERT INTO daily (user_id, day, assigned, booked) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT(user_id, day) DO UPDATE SET "
+                           "assigned=excluded.assigned, booked=excluded.booked",
+                           (uid, day, r["assigned"], r["booked"]))
+            self._rebuild_periods(db, {date.fromisoformat(day) for _, day in buckets})
+
+    def _rebuild_periods(self, db, days):
+        """Recompute the week and month sums of every period containing one of ``days``."""
+        cols = ", ".join(ALL_COLS)
+        sums = ", ".join(f"SUM({c})" for c in ALL_COLS)
+        for unit in PERIOD_UNITS:
+            for p in sorted({period_start(d, unit) for d in days}):
+                lo, hi = p.isoformat(), period_end(p, unit).isoformat()
+                db.execute("DELETE FROM periods WHERE unit=? AND period=?", (unit, lo))
+                db.execute(f"INSERT INTO periods (unit, period, user_id, {cols}) "
+                           f"SELECT ?, ?, user_id, {sums} FROM daily "
+                           f"WHERE day BETWEEN ? AND ? AND {_WEEKDAY_SQL} GROUP BY user_id",
+                           (unit, lo, lo, hi))
+
+    # ── Reads ─────────────────────────────────────────────────────────────
+    def daily(self, start, end, user_ids):
+        """Rollup rows in the range as ``{user_id: {day_iso: {col: value}}}``."""
+        marks = ",".join("?" for _ in user_ids)
+        with self._session() as db:
+            rows = db.execute(f"SELECT * FROM daily WHERE day BETWEEN ? AND ? "
+                              f"AND user_id IN ({marks}) ORDER BY day, user_id",
+                              (start.isoformat(), end.isoformat(), *user_ids)).fetchall()
+        out = defaultdict(dict)
+        for r in rows:
+            out[r["user_id"]][r["day"]] = {c: r[c] for c in ALL_COLS}
+        return dict(out)
+
+    def totals(self, start, end, user_ids):
+        """Range totals per adviser as ``{user_id: {col: sum}}``."""
+        marks = ",".join("?" for _ in user_ids)
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in ALL_COLS)
+        with self._session() as db:
+            rows = db.execute(f"SELECT user_id, {sums} FROM daily WHERE day BETWEEN ? AND ? "
+                              f"AND user_id IN ({marks}) GROUP BY user_id",
+                              (start.isoformat(), end.isoformat(), *user_ids)).fetchall()
+        return {r["user_id"]: {c: r[c] or 0 for c in ALL_COLS} for r in rows}
+
+    def periods(self, start, end, user_ids, unit):
+        """Weekday sums per adviser per week/month as ``{user_id: {period_iso: {col: value}}}``.
+
+        Periods wholly inside start..end are read precomputed; a partial one at
+        either edge is summed from the daily rows inside the range.
+        """
+        marks = ",".join("?" for _ in user_ids)
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in ALL_COLS)
+        starts = period_starts(start, end, unit)
+        full = [p for p in starts if p >= start and period_end(p, unit) <= end]
+        out = defaultdict(dict)
+        with self._session() as db:
+            if full:
+                rows = db.execute(f"SELECT * FROM periods WHERE unit=? AND period BETWEEN ? AND ? "
+                                  f"AND user_id IN ({marks})",
+                                  (unit, full[0].isoformat(), full[-1].isoformat(), *user_ids)).fetchall()
+                for r in rows:
+                    out[r["user_id"]][r["period"]] = {c: r[c] for c in ALL_COLS}
+            for p in starts:
+                if p in full:
+                    continue
+                lo, hi = max(p, start), min(period_end(p, unit), end)
+                rows = db.execute(f"SELECT user_id, {sums} FROM daily WHERE day BETWEEN ? AND ? "
+                                  f"AND {_WEEKDAY_SQL} AND user_id IN ({marks}) GROUP BY user_id",
+                                  (lo.isoformat(), hi.isoformat(), *user_ids)).fetchall()
+                for r in rows:
+                    out[r["user_id"]][p.isoformat()] = {c: r[c] or 0 for c in ALL_COLS}
+        return dict(out)
+
+
+def _days(first_day, last_day):
+    return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        log.info("Opening rollup store (%s)", ROLLUP_DB)
+        _store = RollupStore()
+    return _store
@@ -0,0 +1,2109 @@
+// Dashboard page script.  The page-specific values it reads (dates,
+// allAdvisers, DATA_QS, QF, ...) are set by the inline script before it in
+// dashboard.html's page_script block.
+const advisersById    = new Map(allAdvisers.map(a=>[a.uid,a]));
+// Lead/remediation/pipeline details are fetched on demand (see "Lazy data")
+let remedDetails      = {};
+let assignedDetails   = {};
+let unassignedLeads   = [];
+let pipelineTiles     = {};
+let pipelineCallCounts = {};
+// Build per-adviser inforce target inputs inside modal
+(function(){
+  const wrap = document.getElementById('inf-tgt-adviser-inputs');
+  if(!wrap) return;
+  // One innerHTML write — appending per adviser re-parses the lot each time
+  wrap.innerHTML = allAdvisers.map(a=>`<div style="display:flex;flex-direction:column;gap:3px;align-items:center">
+      <span style="font-size:11px;color:#667085;font-weight:500">${a.name.split(' ')[0]}</span>
+      <input type="number" id="t-inf-tgt-${a.uid}" min="0" step="1000" placeholder="20000"
+        style="width:80px;padding:4px 6px;border:1px solid #D0D5DD;border-radius:6px;font-size:12px;text-align:center">
+    </div>`).join('');
+})();
+
+// ── Multi-select: parse initial selection from hidden input ──
+const selectedAdvisers = new Set();
+(function(){
+  const val = document.getElementById('adviser-input').value;
+  if(val) val.split(',').forEach(id=>{ const n=parseInt(id); if(!isNaN(n)) selectedAdvisers.add(n); });
+})();
+
+// ── Targets ──
+const DEFAULTS={
+  talkTgt:150,qTgt:6,aTgt:2,
+  infTgts:{181:20000,182:20000,183:20000,152:20000,53:20000},showInfTgt:false,
+  aLineColor:'#7f56d9',infLineColor:'#7f56d9',infTgtColor:'#12B76A',
+  talkOn:150,talkNear:120,talkBelow:0,qOn:6,qNear:4,qBelow:0,aOn:2,aNear:1,aBelow:0,infOn:20000,infNear:15000,infBelow:0,
+  onColor:'#12B76A',onEnabled:true,nearColor:'#EAB308',nearEnabled:true,belowColor:'#B42318',belowEnabled:true,
+};
+// ── Settings: load from server on page load, fall back to DEFAULTS ──
+let T = {...DEFAULTS};
+(function(){
+  const xhr = new XMLHttpRequest();
+  xhr.open('GET', '/api/settings', false);
+  try {
+    xhr.send();
+    if(xhr.status === 200){
+      const saved = JSON.parse(xhr.responseText);
+      if(saved && Object.keys(saved).length) T = {...DEFAULTS, ...saved};
+    }
+  } catch(e) {}
+})();
+
+function hex2rgb(hex){const r=parseInt(hex.slice(1,3),16),g=parseInt(hex.slice(3,5),16),b=parseInt(hex.slice(5,7),16);return`${r},${g},${b}`;}
+function hex2rgba(hex,a){const[r,g,b]=hex2rgb(hex).split(',');return`rgba(${r},${g},${b},${a})`;}
+
+function applyCSS(){
+  const s=document.documentElement.style;
+  s.setProperty('--on-color',    T.onEnabled   ?T.onColor   :'#98A2B3');
+  s.setProperty('--on-bg',       T.onEnabled   ?hex2rgba(T.onColor,.1):'rgba(152,162,179,.08)');
+  s.setProperty('--on-glow',     T.onEnabled   ?hex2rgb(T.onColor):'152,162,179');
+  s.setProperty('--near-color',  T.nearEnabled ?T.nearColor :'#98A2B3');
+  s.setProperty('--near-bg',     T.nearEnabled ?hex2rgba(T.nearColor,.1):'rgba(152,162,179,.08)');
+  s.setProperty('--near-glow',   T.nearEnabled ?hex2rgb(T.nearColor):'152,162,179');
+  s.setProperty('--below-color', T.belowEnabled?T.belowColor:'#98A2B3');
+  s.setProperty('--below-bg',    T.belowEnabled?hex2rgba(T.belowColor,.08):'rgba(152,162,179,.06)');
+  s.setProperty('--below-glow',  T.belowEnabled?hex2rgb(T.belowColor):'152,162,179');
+}
+applyCSS();
+
+// ── Tab ──
+function showTab(id,el){
+  document.querySelectorAll('.panel').forEach(p=>p.classList.remove('active'));
+  document.querySelectorAll('.tab').forEach(t=>t.classList.remove('active'));
+  document.getElementById(id).classList.add('active');
+  el.classList.add('active');
+  document.getElementById('tab-input').value=id;
+  if(id==='workbench') ensureWorkbenchData();
+}
+
+// ── Lazy data ──
+// Each endpoint is fetched at most once per page load; callers share the promise.
+// A streamed page may deliver some of them inline (see LipStream).
+const _lazyCache={};
+function fetchJSON(path){
+  const sep=path.includes('?')?'&':'?';
+  return fetch(path+sep+DATA_QS,{credentials:'same-origin'})
+    .then(r=>{ if(!r.ok) throw new Error(path+' → HTTP '+r.status); return r.json(); });
+}
+function lazyJSON(path){
+  if(!_lazyCache[path]){
+    const streamed=window.LipStream?LipStream.take(path):null;
+    _lazyCache[path]=(streamed?streamed.catch(()=>fetchJSON(path)):fetchJSON(path))
+      .catch(e=>{ delete _lazyCache[path]; console.error(e); throw e; });
+  }
+  return _lazyCache[path];
+}
+function ensureLeadDetails(){ return lazyJSON('/api/leads').then(d=>{ assignedDetails=d; }); }
+function ensureRemediations(){ return lazyJSON('/api/remediations').then(d=>{ remedDetails=d; }); }
+function ensureUnassigned(){ return lazyJSON('/api/unassigned').then(d=>{ unassignedLeads=d; }); }
+function ensurePipelineTiles(){
+  return lazyJSON('/api/pipeline-tiles').then(d=>{ pipelineTiles=d.tiles; pipelineCallCounts=d.call_totals; });
+}
+let _wbDataPromise=null;
+function ensureWorkbenchData(){
+  if(!_wbDataPromise){
+    _wbDataPromise=Promise.all([ensureLeadDetails(),ensurePipelineTiles()]).then(()=>{
+      initTiles();
+      try{computeWbMetrics();}catch(e){}
+      try{computeWbMetricsP2();}catch(e){}
+      try{wbLtRender();}catch(e){}
+    }).catch(()=>{ _wbDataPromise=null; });
+  }
+  return _wbDataPromise;
+}
+(function(){
+  const raw=ACTIVE_TAB;
+  const id=(raw==='perf'||raw==='checks'||raw==='workbench')?raw:'perf';
+  const te=document.getElementById('tab-'+id),pe=document.getElementById(id);
+  if(te&&pe){te.classList.add('active');pe.classList.add('active');}
+  else{document.getElementById('tab-perf').classList.add('active');document.getElementById('perf').classList.add('active');}
+})();
+
+// ── Loading ──
+function showLoading(){document.getElementById('loading-overlay').classList.add('active');}
+
+// ── Auto-submit ──
+function submitForm(){showLoading();document.getElementById('filter-form').submit();}
+
+// ── Date popover ──
+function toggleDatePicker(){
+  const p=document.getElementById('date-popover');
+  const btn=document.getElementById('period-btn');
+  if(p.classList.contains('open')){closeDatePicker();}
+  else{syncPopoverToHidden();p.classList.add('open');btn.classList.add('popover-open');}
+}
+function closeDatePicker(){
+  document.getElementById('date-popover').classList.remove('open');
+  document.getElementById('period-btn').classList.remove('popover-open');
+}
+function syncPopoverToHidden(){
+  document.getElementById('pop-start').value=document.getElementById('start-input').value;
+  document.getElementById('pop-end').value=document.getElementById('end-input').value;
+  document.getElementById('date-popover-warn').style.display='none';
+}
+
+function validatePopDates(){
+  const s=document.getElementById('pop-start').value,e=document.getElementById('pop-end').value;
+  const warn=document.getElementById('date-popover-warn');
+  if(!s||!e){warn.style.display='none';return false;}
+  const outside=(s<MIN_STR||s>TODAY_STR||e<MIN_STR||e>TODAY_STR);
+  if(outside){warn.style.display='flex';return false;}
+  if(s>e){warn.textContent='Start date must be before end date';warn.style.display='flex';return false;}
+  warn.style.display='none';return true;
+}
+['pop-start','pop-end'].forEach(id=>{
+  document.getElementById(id).addEventListener('change',()=>{ validatePopDates(); });
+});
+
+function fmtDateLabel(iso){const p=iso.split('-');return p[2]+'/'+p[1]+'/'+p[0].slice(2);}
+function updatePeriodLabel(){
+  const s=document.getElementById('start-input').value,e=document.getElementById('end-input').value;
+  document.getElementById('period-label').textContent=fmtDateLabel(s)+' – '+fmtDateLabel(e);
+}
+function applyDatePicker(){
+  if(!validatePopDates()){showToast('No data available for the selected period');return;}
+  document.getElementById('start-input').value=document.getElementById('pop-start').value;
+  document.getElementById('end-input').value=document.getElementById('pop-end').value;
+  closeDatePicker();
+  ['d0','d1','w0','w1','m0','m1'].forEach(k=>document.getElementById('qf-'+k).classList.remove('active-filter'));
+  submitForm();
+}
+// Close date popover on outside click
+document.addEventListener('click',e=>{
+  const pop=document.getElementById('date-popover');
+  const btn=document.getElementById('period-btn');
+  if(pop.classList.contains('open')&&!pop.contains(e.target)&&!btn.contains(e.target))closeDatePicker();
+});
+
+// ── Toast ──
+let toastTimer=null;
+function showToast(msg){
+  const t=document.getElementById('toast');
+  document.getElementById('toast-msg').textContent=msg||'No data available for the selected period';
+  t.classList.add('show');
+  clearTimeout(toastTimer);
+  toastTimer=setTimeout(()=>t.classList.remove('show'),4000);
+}
+
+// ── Multi-select dropdown ──
+function toggleAdviserDD(){
+  const panel=document.getElementById('ms-panel');
+  panel.classList.toggle('open');
+}
+function msApply(){
+  const checked=[...document.querySelectorAll('.ms-adv:checked')].map(cb=>cb.value);
+  if(!checked.length){alert('Select at least one adviser');return;}
+  document.getElementById('adviser-input').value=checked.join(',');
+  document.getElementById('ms-panel').classList.remove('open');
+  submitForm();
+}
+// Close adviser dropdown on outside click
+document.addEventListener('click',e=>{
+  const dd=document.getElementById('adviser-dropdown');
+  if(dd && !dd.contains(e.target)){
+    document.getElementById('ms-panel').classList.remove('open');
+  }
+});
+
+// ── Quick filter ──
+function setQF(key){
+  const f=QF[key];
+  document.getElementById('start-input').value=f.start;
+  document.getElementById('end-input').value=f.end;
+  updatePeriodLabel();
+  ['d0','d1','w0','w1','m0','m1'].forEach(k=>document.getElementById('qf-'+k).classList.remove('active-filter'));
+  document.getElementById('qf-'+key).classList.add('active-filter');
+  submitForm();
+}
+(function(){
+  const s=document.getElementById('start-input').value,e=document.getElementById('end-input').value;
+  ['d0','d1','w0','w1','m0','m1'].forEach(k=>{if(QF[k].start===s&&QF[k].end===e)document.getElementById('qf-'+k).classList.add('active-filter');});
+})();
+
+// ── Row filter (multi-select) + dynamic footer recalculation ──
+function filterRows(){
+  document.querySelectorAll('.adviser-row').forEach(r=>{
+    r.style.display=selectedAdvisers.has(parseInt(r.dataset.uid))?'':'none';
+  });
+  recalcPerfFooter();
+  recalcChecksFooter();
+  recalcWbFooter();
+}
+
+function recalcPerfFooter(){
+  const tfoot=document.getElementById('team-total-row');
+  if(!tfoot) return;
+  const vis=[...document.querySelectorAll('#perf-tbody .adviser-row')].filter(r=>r.style.display!=='none');
+  const n=vis.length;
+  if(!n){tfoot.style.display='none';return;}
+  tfoot.style.display='';
+  const sum=k=>vis.reduce((s,r)=>s+(parseFloat(r.dataset[k])||0),0);
+  const days=sum('days'),asgn=sum('assigned'),talkS=sum('talkS'),talkPdS=sum('talkPdS');
+  const quotes=sum('quotes'),quoteVal=sum('quoteVal'),apps=sum('apps'),appsVal=sum('appsVal');
+  const infCount=sum('infCount'),infVal=sum('inf'),remT=sum('remedTotal');
+  const avgTalkPd=talkPdS/n, avgQpd=sum('qpd')/n, avgApd=sum('apd')/n;
+  const quoteAvg=quotes?quoteVal/quotes:0, appsAvg=apps?appsVal/apps:0, q2a=quotes?apps/quotes*100:0;
+  const fHMS=s=>{const h=Math.floor(s/3600),m=Math.floor((s%3600)/60),sc=Math.floor(s%60);return h+':'+String(m).padStart(2,'0')+':'+String(sc).padStart(2,'0');};
+  const fHM=s=>{const h=Math.floor(s/3600),m=Math.floor((s%3600)/60);return h+':'+String(m).padStart(2,'0');};
+  const fD=v=>'$'+v.toLocaleString('en-AU',{maximumFractionDigits:0});
+  const c=tfoot.querySelectorAll('tr td');
+  c[0].textContent='Team Total';c[1].textContent=days;c[2].textContent=remT;c[3].textContent=asgn;
+  c[4].textContent=talkS?fHMS(talkS):'—';c[5].textContent=fHM(avgTalkPd);
+  c[6].textContent=quotes;c[7].textContent=fD(quoteVal);c[8].textContent=fD(quoteAvg);c[9].textContent=avgQpd.toFixed(1);
+  c[10].textContent=apps;c[11].textContent=fD(appsVal);c[12].textContent=fD(appsAvg);c[13].textContent=avgApd.toFixed(1);
+  c[14].textContent=q2a.toFixed(1)+'%';c[15].textContent=infCount;c[16].textContent=fD(infVal);
+  tfoot.dataset.talkMins=Math.floor(avgTalkPd/60);
+  tfoot.dataset.qpd=avgQpd.toFixed(1);tfoot.dataset.apd=avgApd.toFixed(1);tfoot.dataset.inf=infVal;
+  if(COMPARE) footDeltas(tfoot,[[3,asgn,prevSum(vis,'assigned')],[4,talkS,prevSum(vis,'talk_time_s')],
+    [6,quotes,prevSum(vis,'quotes_count')],[7,quoteVal,prevSum(vis,'quote_total')],
+    [10,apps,prevSum(vis,'apps_count')],[11,appsVal,prevSum(vis,'apps_value')],
+    [15,infCount,prevSum(vis,'inforce_count')],[16,infVal,prevSum(vis,'inforce_value')]]);
+}
+
+function recalcChecksFooter(){
+  const tfoot=document.getElementById('checks-total-row');
+  if(!tfoot) return;
+  const vis=[...document.querySelectorAll('#checks-tbody .adviser-row')].filter(r=>r.style.display!=='none');
+  const n=vis.length;
+  if(!n){tfoot.style.display='none';return;}
+  tfoot.style.display='';
+  const sum=k=>vis.reduce((s,r)=>s+(parseFloat(r.dataset[k])||0),0);
+  const asgn=sum('assigned'),cont=sum('contacted'),nc=sum('nc'),bkd=sum('booked');
+  const q=sum('quotes'),ac=sum('apps'),av=sum('appsVal'),ic=sum('infCount'),iv=sum('infVal');
+  const cbcAvg=n?(sum('cbc')/n).toFixed(1):'0.0';
+  const td=sum('td'),tf=sum('tf'),tq=sum('tq'),fd=sum('fd'),ff=sum('ff'),fq=sum('fq');
+  const fD=v=>'$'+v.toLocaleString('en-AU',{maximumFractionDigits:0});
+  const c=tfoot.querySelectorAll('tr td');
+  c[0].textContent='Team Total';c[1].textContent=asgn;c[2].textContent=cont;c[3].textContent=nc;c[4].textContent=bkd;
+  c[5].textContent=q;c[6].textContent=ac;c[7].textContent=fD(av);c[8].textContent=ic;c[9].textContent=fD(iv);
+  c[10].textContent=cbcAvg;
+  c[11].textContent=(asgn?(cont/asgn*100).toFixed(1):'0.0')+'%';
+  c[12].textContent=(cont?(bkd/cont*100).toFixed(1):'0.0')+'%';
+  c[13].textContent=(asgn?(bkd/asgn*100).toFixed(1):'0.0')+'%';
+  c[14].textContent=td;c[15].textContent=tf;c[16].textContent=tq;
+  c[17].textContent=fd;c[18].textContent=ff;c[19].textContent=fq;
+  if(COMPARE){
+    const pA=prevSum(vis,'assigned'),pC=prevSum(vis,'contacted'),pB=prevSum(vis,'booked');
+    const rate=(n,d)=>n==null||d==null?null:d?n/d*100:0;
+    footDeltas(tfoot,[[1,asgn,pA],[2,cont,pC],[3,nc,prevSum(vis,'not_contacted'),false,true],[4,bkd,pB],
+      [11,rate(cont,asgn),rate(pC,pA),true],[12,rate(bkd,cont),rate(pB,pC),true],[13,rate(bkd,asgn),rate(pB,pA),true]]);
+  }
+}
+
+// ── Period comparison (?compare=1): footer deltas from the rows' data-prev ──
+function prevSum(vis,key){
+  let s=0;
+  for(const r of vis){
+    const p=r.dataset.prev?JSON.parse(r.dataset.prev):null;
+    if(!p||p[key]==null) return null;
+    s+=p[key];
+  }
+  return s;
+}
+function deltaSpan(cur,prev,pp,lowerIsBetter){
+  if(cur==null||prev==null) return '';
+  let d,text;
+  if(pp){d=cur-prev;text=(d>=0?'+':'')+d.toFixed(1)+'pp';}
+  else if(prev){d=(cur-prev)/prev*100;text=(d>0?'▲':d<0?'▼':'')+Math.abs(d).toFixed(0)+'%';}
+  else if(cur){d=1;text='new';}
+  else return '';
+  if(lowerIsBetter) d=-d;
+  return ' <span class="delta delta-'+(d>0?'good':d<0?'bad':'flat')+'">'+text+'</span>';
+}
+function footDeltas(tfoot,cols){
+  const c=tfoot.querySelectorAll('tr td');
+  cols.forEach(([i,cur,prev,pp,lowerIsBetter])=>c[i].insertAdjacentHTML('beforeend',deltaSpan(cur,prev,pp,lowerIsBetter)));
+}
+
+function recalcWbFooter(){
+  const tfoot=document.getElementById('wb-team-total-row');
+  if(!tfoot) return;
+  const vis=[...document.querySelectorAll('#wb-perf-tbody .adviser-row')].filter(r=>r.style.display!=='none');
+  const n=vis.length;
+  if(!n){tfoot.style.display='none';return;}
+  tfoot.style.display='';
+  const sum=k=>vis.reduce((s,r)=>s+(parseFloat(r.dataset[k])||0),0);
+  const days=sum('days'),asgn=sum('assigned'),talkS=sum('talkS'),talkPdS=sum('talkPdS');
+  const quotes=sum('quotes'),quoteVal=sum('quoteVal'),apps=sum('apps'),appsVal=sum('appsVal');
+  const infCount=sum('infCount'),infVal=sum('inf'),remT=sum('remedTotal');
+  const avgTalkPd=talkPdS/n, avgQpd=sum('qpd')/n, avgApd=sum('apd')/n;
+  const quoteAvg=quotes?quoteVal/quotes:0, appsAvg=apps?appsVal/apps:0, q2a=quotes?apps/quotes*100:0;
+  const fHMS=s=>{const h=Math.floor(s/3600),m=Math.floor((s%3600)/60),sc=Math.floor(s%60);return h+':'+String(m).padStart(2,'0')+':'+String(sc).padStart(2,'0');};
+  const fHM=s=>{const h=Math.floor(s/3600),m=Math.floor((s%3600)/60);return h+':'+String(m).padStart(2,'0');};
+  const fD=v=>'$'+v.toLocaleString('en-AU',{maximumFractionDigits:0});
+  const c=tfoot.querySelectorAll('tr td');
+  c[0].textContent='Team Total';c[1].textContent=days;c[2].textContent=remT;c[3].textContent=asgn;
+  c[4].textContent=talkS?fHMS(talkS):'—';c[5].textContent=fHM(avgTalkPd);
+  c[6].textContent=quotes;c[7].textContent=fD(quoteVal);c[8].textContent=fD(quoteAvg);c[9].textContent=avgQpd.toFixed(1);
+  c[10].textContent=apps;c[11].textContent=fD(appsVal);c[12].textContent=fD(appsAvg);c[13].textContent=avgApd.toFixed(1);
+  c[14].textContent=q2a.toFixed(1)+'%';c[15].textContent=infCount;c[16].textContent=fD(infVal);
+  tfoot.dataset.talkMins=Math.floor(avgTalkPd/60);
+  tfoot.dataset.qpd=avgQpd.toFixed(1);tfoot.dataset.apd=avgApd.toFixed(1);tfoot.dataset.inf=infVal;
+  if(COMPARE) footDeltas(tfoot,[[3,asgn,prevSum(vis,'assigned')],[4,talkS,prevSum(vis,'talk_time_s')],
+    [6,quotes,prevSum(vis,'quotes_count')],[7,quoteVal,prevSum(vis,'quote_total')],
+    [10,apps,prevSum(vis,'apps_count')],[11,appsVal,prevSum(vis,'apps_value')],
+    [15,infCount,prevSum(vis,'inforce_count')],[16,infVal,prevSum(vis,'inforce_value')]]);
+}
+filterRows();
+
+// ── Tooltip ──
+function posTip(icon){
+  const tip=icon.parentElement.querySelector('.tip');
+  const r=icon.getBoundingClientRect();
+  const below=tip.classList.contains('tip-below')||r.top<120;
+  tip.style.left=Math.max(4,r.left+r.width/2-125)+'px';
+  if(below){tip.style.top=(r.bottom+8)+'px';tip.style.transform='none';}
+  else{tip.style.top=(r.top-8)+'px';tip.style.transform='translateY(-100%)';}
+  tip.style.display='block';
+  icon.addEventListener('mouseleave',()=>tip.style.display='none',{once:true});
+}
+
+// ── Badge refresh ──
+function badgeClass(metric,value){
+  const onV   ={talk:T.talkOn,qpd:T.qOn,apd:T.aOn,inf:T.infOn*MONTHS}[metric];
+  const nearV ={talk:T.talkNear,qpd:T.qNear,apd:T.aNear,inf:T.infNear*MONTHS}[metric];
+  const belowV={talk:T.talkBelow,qpd:T.qBelow,apd:T.aBelow,inf:T.infBelow*MONTHS}[metric];
+  if(T.onEnabled   &&value>=onV)   return 'badge badge-on';
+  if(T.nearEnabled &&value>=nearV) return 'badge badge-near';
+  if(T.belowEnabled&&value>=belowV)return 'badge badge-below';
+  return 'badge badge-neutral';
+}
+function refreshBadges(){
+  document.querySelectorAll('#perf-tbody tr, #wb-perf-tbody tr').forEach(row=>{
+    if(row.style.display==='none')return;
+    const tm=parseFloat(row.dataset.talkMins||0),qpd=parseFloat(row.dataset.qpd||0),
+          apd=parseFloat(row.dataset.apd||0),inf=parseFloat(row.dataset.inf||0);
+    row.querySelectorAll('[data-badge]').forEach(b=>{
+      const m=b.dataset.badge,val={talk:tm,qpd:qpd,apd:apd,inf:inf}[m]??0;
+      b.className=badgeClass(m,val);
+    });
+  });
+}
+
+function highlightTopInforce(){
+  document.querySelectorAll('.inf-crown').forEach(e=>e.remove());
+  ['perf-tbody','checks-tbody','wb-perf-tbody'].forEach(tbId=>{
+    const rows=[...document.querySelectorAll('#'+tbId+' .adviser-row')].filter(r=>r.style.display!=='none');
+    if(rows.length<2) return;
+    let maxVal=-1,maxRow=null;
+    rows.forEach(r=>{const v=parseFloat(r.dataset.inf||r.dataset.infVal||0);if(v>maxVal){maxVal=v;maxRow=r;}});
+    if(maxVal<=0||!maxRow) return;
+    const name=maxRow.querySelector('.adviser-name');
+    if(name){
+      const crown=document.createElement('span');
+      crown.className='inf-crown';crown.textContent=' \uD83D\uDC51';crown.title='Top Inforce $ this period';
+      name.appendChild(crown);
+    }
+  });
+}
+
+// ── Beacon ──
+function setBeacon(id,value,onV,nearV){
+  const el=document.getElementById(id);if(!el)return;
+  if(T.onEnabled&&value>=onV)        el.className='beacon beacon-on';
+  else if(T.nearEnabled&&value>=nearV)el.className='beacon beacon-near';
+  else if(T.belowEnabled)            el.className='beacon beacon-below';
+  else                               el.className='beacon';
+}
+
+// ── Charts ──
+Chart.defaults.font.family="'Inter',sans-serif";Chart.defaults.font.size=11;
+const ORANGE='#D7490D';
+const SLATE='#4d6175';
+let labels;
+if(CHART_MODE==='hourly'){
+  labels=dates.map(h=>{const hr=parseInt(h);return hr===0?'12am':hr<12?hr+'am':hr===12?'12pm':(hr-12)+'pm';});
+}else if(CHART_MODE==='weekly'){
+  labels=dates.map(d=>{const dn=new Date(d+'T00:00:00').getDay();return['Sun','Mon','Tue','Wed','Thu','Fri','Sat'][dn];});
+}else if(CHART_MODE==='by_week'){
+  labels=dates.map(d=>{const p=d.split('-');return 'w/c '+p[2]+'/'+p[1];});
+}else if(CHART_MODE==='by_month'){
+  labels=dates.map(d=>{const p=d.split('-');return['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'][parseInt(p[1])-1]+' '+p[0].slice(2);});
+}else{
+  labels=dates.map(d=>{const p=d.split('-');return p[2]+'/'+p[1];});
+}
+const ttBase={backgroundColor:'#101828',titleColor:'#fff',bodyColor:'rgba(255,255,255,.85)',borderColor:'rgba(255,255,255,.1)',borderWidth:1,padding:10,cornerRadius:6,displayColors:false};
+const chartInst={};
+
+function hexToRgb(hex){const r=parseInt(hex.slice(1,3),16),g=parseInt(hex.slice(3,5),16),b=parseInt(hex.slice(5,7),16);return`${r},${g},${b}`;}
+function makeGradient(ctx,hex){
+  const g=ctx.createLinearGradient(0,0,0,210);
+  const rgb=hexToRgb(hex||'#4d6175');
+  g.addColorStop(0,`rgba(${rgb},0.18)`);
+  g.addColorStop(0.6,`rgba(${rgb},0.06)`);
+  g.addColorStop(1,`rgba(${rgb},0)`);
+  return g;
+}
+
+function buildLine(cid,data,name,yFmt,tgtVal,showTgt,lineColor,tgtColor,avgVal,avgColor,showAvg){
+  const ctx=document.getElementById(cid);if(!ctx)return;
+  if(chartInst[cid])chartInst[cid].destroy();
+  const lc=lineColor||SLATE;
+  const tc=tgtColor||'#D7490D';
+  const ac=avgColor||'#1570EF';
+  const gradient=makeGradient(ctx.getContext('2d'),lc);
+  const ds=[{label:name,data,borderColor:lc,backgroundColor:gradient,borderWidth:2,
+    pointRadius:3,pointHoverRadius:5,pointBackgroundColor:lc,pointBorderColor:lc,pointBorderWidth:0,
+    tension:0.4,fill:true}];
+  if(showTgt&&tgtVal!=null)
+    ds.push({label:'Target',data:dates.map(()=>tgtVal),borderColor:tc,borderWidth:1.5,
+      pointRadius:0,pointHoverRadius:0,tension:0,fill:false});
+  if(showAvg&&avgVal!=null&&avgVal>0)
+    ds.push({label:'Avg',data:dates.map(()=>avgVal),borderColor:ac,borderWidth:1.5,
+      borderDash:[3,3],pointRadius:0,pointHoverRadius:0,tension:0,fill:false});
+  chartInst[cid]=new Chart(ctx,{type:'line',data:{labels,datasets:ds},options:{
+    responsive:true,maintainAspectRatio:false,interaction:{mode:'index',intersect:false},
+    plugins:{legend:{display:false},tooltip:{...ttBase,callbacks:{label:item=>{
+      const lbl=item.dataset.label;
+      if(lbl==='Target') return ' Target: '+yFmt(item.parsed.y);
+      if(lbl==='Avg')    return ' Avg: '+yFmt(item.parsed.y);
+      return ' '+name+': '+yFmt(item.parsed.y);
+    }}}},
+    scales:{
+      x:{grid:{display:false},ticks:{color:'#98A2B3',maxTicksLimit:(CHART_MODE==='daily'||CHART_MODE==='by_week')?8:20,maxRotation:0},border:{display:false}},
+      y:{grid:{color:'#F2F4F7'},ticks:{color:'#98A2B3',callback:v=>yFmt(v)},border:{display:false},beginAtZero:true}
+    }
+  }});
+}
+
+// ── Cumulative helper ──
+function cumulative(arr){
+  return arr.reduce((acc,v,i)=>{acc.push((acc[i-1]||0)+v);return acc;},[]);
+}
+
+// ── Aggregation: multi-select aware ──
+function getPerfS(){
+  const chosen = allAdvisers.filter(a=>selectedAdvisers.has(a.uid));
+  if(!chosen.length) return{name:'—',talk_mins:[],quotes_cnt:[],apps_cnt:[],apps_val:[],inforce_val:[],calls_cnt:[]};
+  const n=chosen.length;
+  return{
+    name: n===1 ? chosen[0].name : 'Team',
+    talk_mins:   dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.talk_mins[i]||0),0)/n),
+    quotes_cnt:  dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.quotes_cnt[i]||0),0)/n),
+    apps_cnt:    dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.apps_cnt[i]||0),0)/n),
+    apps_val:    dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.apps_val[i]||0),0)),
+    inforce_val: dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.inforce_val[i]||0),0)),
+    calls_cnt:   dates.map((_,i)=>chosen.reduce((s,a)=>s+(a.calls_cnt[i]||0),0)/n),
+  };
+}
+
+/* ══════════════════════════════════════════════════════════════════════
+   MODULAR DASHBOARD — Layout engine, edit mode, drag-and-drop
+   ══════════════════════════════════════════════════════════════════════ */
+const WB_REGISTRY={
+  'wb-table':   {label:'Performance Table', desc:'Adviser KPI summary with targets and badges',     full:true,  icon:'tbl',   svg:'<svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>'},
+  'wb-chart':   {label:'Chart',             desc:'Cumulative Applications $ and Inforce $ line chart', full:false, icon:'chart', svg:'<svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><polyline points="22 12 18 12 15 21 9 3 6 12 2 12"/></svg>'},
+  'wb-pipeline':{label:'Lead Pipeline',     desc:'Metric tiles, Fresh and Stale lead lists',           full:false, icon:'pipe',  svg:'<svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><rect x="3" y="3" width="7" height="7"/><rect x="14" y="3" width="7" height="7"/><rect x="3" y="14" width="7" height="7"/><rect x="14" y="14" width="7" height="7"/></svg>'},
+  'wb-pipeline2':{label:'Lead Pipeline (Full)',desc:'Full-width pipeline with metric tiles, Fresh and Stale leads', full:true, icon:'pipe2', svg:'<svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><rect x="2" y="3" width="20" height="5" rx="1"/><rect x="2" y="10" width="9" height="11" rx="1"/><rect x="13" y="10" width="9" height="11" rx="1"/></svg>'},
+  'wb-lead-table':{label:'Lead Table',    desc:'Full list of all referrals with search, filters and sorting', full:true, icon:'ltbl', svg:'<svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><path d="M16 4h2a2 2 0 012 2v14a2 2 0 01-2 2H6a2 2 0 01-2-2V6a2 2 0 012-2h2"/><rect x="8" y="2" width="8" height="4" rx="1"/><line x1="8" y1="12" x2="16" y2="12"/><line x1="8" y1="16" x2="16" y2="16"/></svg>'}
+};
+const WB_DEFAULT_LAYOUT=['wb-table','wb-chart','wb-pipeline'];
+const WB_LS_KEY='lip_wb_layout';
+
+let _wbLayout=[];
+let _wbEditing=false;
+
+function wbLoadLayout(){
+  try{
+    const raw=localStorage.getItem(WB_LS_KEY);
+    if(raw){const arr=JSON.parse(raw);if(Array.isArray(arr)&&arr.length)return arr.filter(id=>WB_REGISTRY[id]);}
+  }catch(e){}
+  return [...WB_DEFAULT_LAYOUT];
+}
+function wbSaveLayout(){
+  try{localStorage.setItem(WB_LS_KEY,JSON.stringify(_wbLayout));}catch(e){}
+}
+
+function wbApplyLayout(){
+  const container=document.getElementById('wb-container');
+  if(!container) return;
+
+  /* Collect all widget elements */
+  const allWidgets={};
+  container.querySelectorAll('.wb-widget').forEach(el=>{
+    allWidgets[el.dataset.widgetId]=el;
+    el.classList.remove('wb-hidden');
+    el.remove();
+  });
+  /* Remove any dynamic grid wrappers and placeholders */
+  container.querySelectorAll('.wb-container-grid,.wb-add-placeholder,.wb-drop-indicator').forEach(el=>el.remove());
+
+  /* Append in layout order, grouping consecutive half-width widgets */
+  let halfBuf=[];
+  function flushHalves(){
+    if(!halfBuf.length) return;
+    const grid=document.createElement('div');
+    grid.className='wb-container-grid';
+    halfBuf.forEach(w=>grid.appendChild(w));
+    container.appendChild(grid);
+    halfBuf=[];
+  }
+
+  _wbLayout.forEach(id=>{
+    const w=allWidgets[id];
+    if(!w) return;
+    const reg=WB_REGISTRY[id];
+    if(reg&&!reg.full){
+      halfBuf.push(w);
+      if(halfBuf.length===2) flushHalves();
+    } else {
+      flushHalves();
+      container.appendChild(w);
+    }
+    delete allWidgets[id]; /* mark as placed */
+  });
+  flushHalves();
+
+  /* Hide widgets not in layout (keep in DOM for re-adding) */
+  Object.values(allWidgets).forEach(w=>{
+    w.classList.add('wb-hidden');
+    container.appendChild(w);
+  });
+
+  /* Add "+" placeholder if in edit mode and there are hidden widgets */
+  const hiddenCount=Object.keys(WB_REGISTRY).length - _wbLayout.length;
+  if(_wbEditing && hiddenCount>0){
+    const ph=document.createElement('div');
+    ph.className='wb-add-placeholder';
+    ph.onclick=wbOpenPicker;
+    ph.innerHTML='<svg width="32" height="32" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round"><line x1="12" y1="5" x2="12" y2="19"/><line x1="5" y1="12" x2="19" y2="12"/></svg><span>Add widget</span>';
+    container.appendChild(ph);
+  }
+}
+
+/* ── Edit mode ── */
+function wbEnterEdit(){
+  _wbEditing=true;
+  document.body.classList.add('wb-editing');
+  wbApplyLayout();
+  wbInitDrag();
+}
+function wbExitEdit(){
+  _wbEditing=false;
+  document.body.classList.remove('wb-editing');
+  wbSaveLayout();
+  wbApplyLayout();
+  /* Re-render charts & metrics after DOM moves */
+  try{rebuildWbChart(getPerfS());}catch(e){}
+  try{computeWbMetrics();}catch(e){}
+  try{computeWbMetricsP2();}catch(e){}
+  try{wbLtRender();}catch(e){}
+}
+function wbResetLayout(){
+  _wbLayout=[...WB_DEFAULT_LAYOUT];
+  wbApplyLayout();
+}
+
+/* ── Add / Remove ── */
+function wbRemoveWidget(id){
+  _wbLayout=_wbLayout.filter(x=>x!==id);
+  wbSaveLayout();
+  wbApplyLayout();
+}
+function wbAddWidget(id){
+  if(!_wbLayout.includes(id)){
+    _wbLayout.push(id);
+    wbSaveLayout();
+    wbApplyLayout();
+  }
+  wbClosePicker();
+}
+
+/* ── Widget Picker ── */
+function wbOpenPicker(){
+  const grid=document.getElementById('wb-picker-grid');
+  const empty=document.getElementById('wb-picker-empty');
+  grid.innerHTML='';
+  const available=Object.keys(WB_REGISTRY).filter(id=>!_wbLayout.includes(id));
+  if(!available.length){
+    grid.style.display='none';
+    empty.style.display='flex';
+  } else {
+    grid.style.display='grid';
+    empty.style.display='none';
+    available.forEach(id=>{
+      const r=WB_REGISTRY[id];
+      const card=document.createElement('div');
+      card.className='wb-picker-card';
+      card.onclick=()=>wbAddWidget(id);
+      card.innerHTML=`<div class="wb-picker-icon ${r.icon}">${r.svg}</div><div class="wb-picker-info"><h4>${r.label}</h4><p>${r.desc}</p></div><span class="wb-picker-add">+ Add</span>`;
+      grid.appendChild(card);
+    });
+  }
+  document.getElementById('wb-picker-modal').classList.add('open');
+}
+function wbClosePicker(){
+  document.getElementById('wb-picker-modal').classList.remove('open');
+}
+function wbClosePickerOutside(e){
+  if(e.target===e.currentTarget) wbClosePicker();
+}
+
+/* ── Drag-and-Drop ── */
+let _dragWidget=null;
+function wbInitDrag(){
+  const container=document.getElementById('wb-container');
+  if(!container) return;
+
+  container.addEventListener('dragstart',e=>{
+    const w=e.target.closest('.wb-widget');
+    if(!w||!_wbEditing) return;
+    _dragWidget=w;
+    w.classList.add('dragging');
+    e.dataTransfer.effectAllowed='move';
+    e.dataTransfer.setData('text/plain',w.dataset.widgetId);
+  });
+
+  container.addEventListener('dragend',e=>{
+    if(_dragWidget) _dragWidget.classList.remove('dragging');
+    _dragWidget=null;
+    container.querySelectorAll('.wb-drop-indicator').forEach(el=>el.classList.remove('active'));
+  });
+
+  container.addEventListener('dragover',e=>{
+    if(!_wbEditing||!_dragWidget) return;
+    e.preventDefault();
+    e.dataTransfer.dropEffect='move';
+
+    /* Find the widget we're hovering over */
+    const target=e.target.closest('.wb-widget');
+    if(!target||target===_dragWidget) return;
+
+    const rect=target.getBoundingClientRect();
+    const midY=rect.top+rect.height/2;
+    const insertBefore=e.clientY<midY;
+
+    /* Show drop indicator */
+    container.querySelectorAll('.wb-drop-indicator').forEach(el=>el.remove());
+    const indicator=document.createElement('div');
+    indicator.className='wb-drop-indicator active';
+    if(insertBefore){
+      target.parentElement.insertBefore(indicator,target);
+    } else {
+      target.parentElement.insertBefore(indicator,target.nextSibling);
+    }
+  });
+
+  container.addEventListener('drop',e=>{
+    e.preventDefault();
+    if(!_dragWidget||!_wbEditing) return;
+    const dragId=_dragWidget.dataset.widgetId;
+    const target=e.target.closest('.wb-widget');
+    if(!target) return;
+
+    const targetId=target.dataset.widgetId;
+    if(dragId===targetId) return;
+
+    /* Reorder _wbLayout */
+    const fromIdx=_wbLayout.indexOf(dragId);
+    let toIdx=_wbLayout.indexOf(targetId);
+    if(fromIdx<0||toIdx<0) return;
+
+    /* Remove dragged item */
+    _wbLayout.splice(fromIdx,1);
+    /* Re-find target index after removal */
+    toIdx=_wbLayout.indexOf(targetId);
+
+    const rect=target.getBoundingClientRect();
+    const insertBefore=e.clientY<(rect.top+rect.height/2);
+    if(insertBefore){
+      _wbLayout.splice(toIdx,0,dragId);
+    } else {
+      _wbLayout.splice(toIdx+1,0,dragId);
+    }
+
+    _dragWidget.classList.remove('dragging');
+    _dragWidget=null;
+    wbSaveLayout();
+    wbApplyLayout();
+    wbInitDrag(); /* re-bind on new DOM */
+  });
+
+  /* Make widgets draggable in edit mode */
+  container.querySelectorAll('.wb-widget:not(.wb-hidden)').forEach(w=>{
+    w.setAttribute('draggable','true');
+  });
+}
+
+/* ══════════════════════════════════════════════════════════════════════
+   LEAD TABLE WIDGET — full referral list with filters
+   ══════════════════════════════════════════════════════════════════════ */
+const WB_LT_STATUS={0:'Not Contacted',1:'Contacted',3:'Quoted',4:'Submitted',5:'Won',6:'Lost'};
+let _wbLtPage=1;
+const WB_LT_PAGE_SIZE=25;
+
+/* Build the adviser <select> options */
+function wbLtInitAdviserFilter(){
+  const sel=document.getElementById('wb-lt-adviser');
+  if(!sel) return;
+  while(sel.options.length>1) sel.remove(1);
+  allAdvisers.forEach(a=>{
+    if(!selectedAdvisers.has(a.uid)) return;
+    const opt=document.createElement('option');
+    opt.value=a.uid;
+    opt.textContent=a.name;
+    sel.appendChild(opt);
+  });
+}
+
+function wbLtInitDynamicFilters(){
+  const all=wbLtGetAllLeads();
+  const srcSel=document.getElementById('wb-lt-source');
+  const refSel=document.getElementById('wb-lt-referrer');
+  const curSrc=srcSel?srcSel.value:'all';
+  const curRef=refSel?refSel.value:'all';
+
+  /* Referral Partner dropdown — filtered by current referrer selection */
+  if(srcSel){
+    const pool=curRef!=='all'?all.filter(l=>(l.referrer||'').trim()===curRef):all;
+    while(srcSel.options.length>1) srcSel.remove(1);
+    const sources=[...new Set(pool.map(l=>(l.source||'').trim()).filter(Boolean))].sort((a,b)=>a.localeCompare(b));
+    sources.forEach(s=>{const o=document.createElement('option');o.value=s;o.textContent=s;srcSel.appendChild(o);});
+    if([...srcSel.options].some(o=>o.value===curSrc)) srcSel.value=curSrc; else srcSel.value='all';
+  }
+
+  /* Referrer dropdown — filtered by current referral partner selection */
+  if(refSel){
+    const pool=curSrc!=='all'?all.filter(l=>(l.source||'').trim()===curSrc):all;
+    while(refSel.options.length>1) refSel.remove(1);
+    const referrers=[...new Set(pool.map(l=>(l.referrer||'').trim()).filter(Boolean))].sort((a,b)=>a.localeCompare(b));
+    referrers.forEach(r=>{const o=document.createElement('option');o.value=r;o.textContent=r;refSel.appendChild(o);});
+    if([...refSel.options].some(o=>o.value===curRef)) refSel.value=curRef; else refSel.value='all';
+  }
+}
+
+/* Get all leads flattened with adviser info */
+function wbLtGetAllLeads(){
+  let all=[];
+  selectedAdvisers.forEach(uid=>{
+    const leads=assignedDetails[uid]||[];
+    const adv=advisersById.get(uid);
+    const advName=adv?adv.name:'Unknown';
+    const advInit=adv?adv.initials:'??';
+    const advColor=adv?.avatar_color||'#667085';
+    const advAvatar=adv?.avatar_url||'';
+    leads.forEach(l=>{
+      all.push({...l,_uid:uid,_advName:advName,_advInit:advInit,_advColor:advColor,_advAvatar:advAvatar});
+    });
+  });
+  return all;
+}
+
+/* Open/Not Open check: uses is_closed flag from close/open actions */
+function wbLtIsOpen(lead){ return !lead.is_closed; }
+
+/* Pipeline tile → table filter state */
+let _wbLtPipelineFilter=null;
+let _wbLtPipelineStage=null;
+
+/* Apply filters + sort */
+function wbLtFilter(leads){
+  const q=(document.getElementById('wb-lt-search').value||'').toLowerCase().trim();
+  const openVal=document.getElementById('wb-lt-open').value;
+  const statusVal=document.getElementById('wb-lt-status').value;
+  const srcVal=document.getElementById('wb-lt-source').value;
+  const refVal=document.getElementById('wb-lt-referrer').value;
+  const advVal=document.getElementById('wb-lt-adviser').value;
+  const sortVal=document.getElementById('wb-lt-sort').value;
+
+  let filtered=leads;
+  if(_wbLtPipelineFilter) filtered=filtered.filter(l=>_wbLtPipelineFilter.has(l.lead_id));
+  if(q){
+    filtered=filtered.filter(l=>
+      (l.client_name||'').toLowerCase().includes(q)||
+      (l.source||'').toLowerCase().includes(q)||
+      (l.referrer||'').toLowerCase().includes(q)||
+      (l._advName||'').toLowerCase().includes(q)||
+      String(l.lead_id).includes(q)
+    );
+  }
+  if(openVal==='open')   filtered=filtered.filter(l=>wbLtIsOpen(l));
+  if(openVal==='closed') filtered=filtered.filter(l=>!wbLtIsOpen(l));
+  if(statusVal!=='all')  filtered=filtered.filter(l=>(l.working_stage??l.status)===parseInt(statusVal));
+  if(srcVal!=='all')     filtered=filtered.filter(l=>(l.source||'').trim()===srcVal);
+  if(refVal!=='all')     filtered=filtered.filter(l=>(l.referrer||'').trim()===refVal);
+  if(advVal!=='all')     filtered=filtered.filter(l=>l._uid===parseInt(advVal));
+
+  /* Sort */
+  filtered.sort((a,b)=>{
+    if(sortVal==='newest')      return (b.assigned_at||'').localeCompare(a.assigned_at||'');
+    if(sortVal==='oldest')      return (a.assigned_at||'').localeCompare(b.assigned_at||'');
+    if(sortVal==='created-new') return (b.created_at||'').localeCompare(a.created_at||'');
+    if(sortVal==='created-old') return (a.created_at||'').localeCompare(b.created_at||'');
+    if(sortVal==='name')        return (a.client_name||'').localeCompare(b.client_name||'');
+    if(sortVal==='status')      return a.status-b.status;
+    return 0;
+  });
+  return filtered;
+}
+
+/* Time since assigned — human-readable with days/hours/mins */
+function wbLtTimeSince(dateStr){
+  if(!dateStr) return '—';
+  const d=new Date(dateStr);
+  const now=new Date();
+  const diffMs=now-d;
+  if(diffMs<0) return '—';
+  const mins=Math.floor(diffMs/60000);
+  const hrs=Math.floor(mins/60);
+  const days=Math.floor(hrs/24);
+  if(days>0){
+    const remHrs=hrs%24;
+    return days+'d'+(remHrs?' '+remHrs+'h':'');
+  }
+  if(hrs>0){
+    const remMins=mins%60;
+    return hrs+'h'+(remMins?' '+remMins+'m':'');
+  }
+  return mins+'m';
+}
+
+/* Build a single table row for a lead */
+function wbLtBuildRow(l){
+  const ws=l.working_stage??l.status;
+  const wsLabel=WB_LT_STATUS[ws]||'Unknown';
+  const isOpen=wbLtIsOpen(l);
+  const openLabel=isOpen?'Open':'Not Open';
+  const openCls=isOpen?'open':'closed';
+  const callCount=pipelineCallCounts[l.lead_id]||0;
+  const callTd=callCount>0
+    ?'<td><a href="#" class="wb-calls-link assigned-link" data-lead-id="'+l.lead_id+'" data-client="'+esc(l.client_name||'Unnamed')+'">'+callCount+'</a></td>'
+    :'<td>0</td>';
+  const tr=document.createElement('tr');
+  tr.onclick=function(){window.open(CRM_BASE+'/leads/'+l.lead_id+'/','_blank');};
+  tr.innerHTML=
+    '<td>'+(l.created_date||'—')+'</td>'+
+    '<td><div class="wb-lt-lead-name">'+esc(l.client_name||'Unnamed')+'</div><div class="wb-lt-lead-id">#'+l.lead_id+'</div></td>'+
+    '<td><span class="wb-lt-open-badge '+openCls+'">'+openLabel+'</span></td>'+
+    '<td><span class="wb-lt-badge s'+ws+'">'+wsLabel+'</span></td>'+
+    callTd+
+    '<td>'+esc(l.source||'—')+'</td>'+
+    '<td>'+esc(l.referrer||'—')+'</td>'+
+    '<td><div class="wb-lt-adviser-cell">'+
+      (l._advAvatar
+        ? '<img class="wb-lt-avatar-img" src="'+l._advAvatar+'" alt="'+esc(l._advName)+'" onerror="this.style.display=\'none\';this.nextElementSibling.style.display=\'flex\'"><div class="wb-lt-avatar" style="display:none;background:'+l._advColor+'">'+esc(l._advInit)+'</div>'
+        : '<div class="wb-lt-avatar" style="background:'+l._advColor+'">'+esc(l._advInit)+'</div>'
+      )+esc(l._advName)+'</div></td>'+
+    '<td>'+(l.assigned_date||'—')+'</td>'+
+    '<td>'+wbLtTimeSince(l.assigned_at)+'</td>';
+  return tr;
+}
+
+/* Render the table */
+function wbLtRender(){
+  _wbLtPage=1;
+  wbLtInitAdviserFilter();
+  wbLtInitDynamicFilters();
+  const all=wbLtGetAllLeads();
+  const filtered=wbLtFilter(all);
+  const tbody=document.getElementById('wb-lt-tbody');
+  if(!tbody) return;
+
+  const countEl=document.getElementById('wb-lt-count');
+  if(countEl) countEl.textContent=filtered.length+' lead'+(filtered.length!==1?'s':'');
+
+  const showing=filtered.slice(0,_wbLtPage*WB_LT_PAGE_SIZE);
+  tbody.innerHTML='';
+
+  if(!showing.length){
+    tbody.innerHTML='<tr><td colspan="10" class="wb-lt-empty">No leads match your filters</td></tr>';
+    document.getElementById('wb-lt-load-more').style.display='none';
+    return;
+  }
+
+  showing.forEach(l=>tbody.appendChild(wbLtBuildRow(l)));
+
+  const more=document.getElementById('wb-lt-load-more');
+  if(filtered.length>showing.length){
+    more.style.display='inline-block';
+    more.textContent='Show more ('+showing.length+' of '+filtered.length+')';
+  } else {
+    more.style.display='none';
+  }
+}
+
+function wbLtShowMore(){
+  _wbLtPage++;
+  const all=wbLtGetAllLeads();
+  const filtered=wbLtFilter(all);
+  const tbody=document.getElementById('wb-lt-tbody');
+  if(!tbody) return;
+
+  const start=(_wbLtPage-1)*WB_LT_PAGE_SIZE;
+  const page=filtered.slice(start,start+WB_LT_PAGE_SIZE);
+  page.forEach(l=>tbody.appendChild(wbLtBuildRow(l)));
+
+  const showing=_wbLtPage*WB_LT_PAGE_SIZE;
+  const more=document.getElementById('wb-lt-load-more');
+  if(filtered.length>showing){
+    more.style.display='inline-block';
+    more.textContent='Show more ('+Math.min(showing,filtered.length)+' of '+filtered.length+')';
+  } else {
+    more.style.display='none';
+  }
+}
+
+/* Helper — escape HTML */
+function esc(s){const d=document.createElement('div');d.textContent=s;return d.innerHTML;}
+
+/* ── Init ── */
+(function wbLayoutInit(){
+  _wbLayout=wbLoadLayout();
+  wbApplyLayout();
+})();
+
+function fmtMins(m){const h=Math.floor(m/60),mn=Math.round(m%60);return h+':'+String(mn).padStart(2,'0');}
+function fmtMoney(v){if(v>=1e6)return'$'+(v/1e6).toFixed(1)+'M';if(v>=1000)return'$'+(v/1000).toFixed(1)+'k';return'$'+v.toFixed(0);}
+function avg(arr){const nz=arr.filter(v=>v>0);return nz.length?nz.reduce((s,v)=>s+v,0)/nz.length:0;}
+function total(arr){return arr.reduce((s,v)=>s+v,0);}
+
+function rebuildCharts(){
+  applyCSS();
+  const ps=getPerfS();
+
+  // ── Cumulative data ──
+  const cumAppsVal = cumulative(ps.apps_val);
+  const cumInfVal  = cumulative(ps.inforce_val);
+  const totApps = total(ps.apps_val);
+  const totInf  = total(ps.inforce_val);
+
+  // ── Inforce target (multi-select aware) ──
+  const chosen = allAdvisers.filter(a=>selectedAdvisers.has(a.uid));
+  let infScaledTgt;
+  if(chosen.length>1){
+    infScaledTgt = chosen.reduce((s,a)=>s+(T.infTgts[a.uid]||20000),0);
+  } else if(chosen.length===1){
+    infScaledTgt = T.infTgts[chosen[0].uid]||20000;
+  } else {
+    infScaledTgt = 20000;
+  }
+
+  // ── Performance tab charts ──
+  buildLine('chart-perf-apps',cumAppsVal,ps.name,fmtMoney,null,false,T.aLineColor);
+  const el1=document.getElementById('kpi-perf-apps');if(el1)el1.textContent=fmtMoney(totApps);
+
+  buildLine('chart-perf-inf',cumInfVal,ps.name,fmtMoney,infScaledTgt,T.showInfTgt,T.infLineColor,T.infTgtColor);
+  const el2=document.getElementById('kpi-perf-inf');if(el2)el2.textContent=fmtMoney(totInf);
+  setBeacon('beacon-perf-inf',totInf,infScaledTgt,infScaledTgt*0.75);
+
+  // ── Checks tab charts (same cumulative data) ──
+  buildLine('chart-checks-apps',cumAppsVal,ps.name,fmtMoney,null,false,T.aLineColor);
+  const el3=document.getElementById('kpi-checks-apps');if(el3)el3.textContent=fmtMoney(totApps);
+
+  buildLine('chart-checks-inf',cumInfVal,ps.name,fmtMoney,infScaledTgt,T.showInfTgt,T.infLineColor,T.infTgtColor);
+  const el4=document.getElementById('kpi-checks-inf');if(el4)el4.textContent=fmtMoney(totInf);
+  setBeacon('beacon-checks-inf',totInf,infScaledTgt,infScaledTgt*0.75);
+
+  // ── Workbench tab chart + metrics ──
+  rebuildWbChart(ps);
+  computeWbMetrics();
+  computeWbMetricsP2();
+  try{wbLtRender();}catch(e){}
+
+  refreshBadges();
+  highlightTopInforce();
+}
+
+// ── Workbench chart toggle ──
+let _wbChartMode='apps';
+
+function wbSwitchChart(mode){
+  _wbChartMode=mode;
+  document.getElementById('wb-toggle-apps').classList.toggle('active',mode==='apps');
+  document.getElementById('wb-toggle-inf').classList.toggle('active',mode==='inforce');
+  rebuildWbChart(getPerfS());
+}
+
+function rebuildWbChart(ps){
+  if(!document.getElementById('wb-chart-canvas')) return;
+  if(!ps) ps=getPerfS();
+  const cumApps=cumulative(ps.apps_val);
+  const cumInf=cumulative(ps.inforce_val);
+  const totApps=total(ps.apps_val);
+  const totInf=total(ps.inforce_val);
+  // Inforce target (same logic as Performance tab)
+  const chosen=allAdvisers.filter(a=>selectedAdvisers.has(a.uid));
+  let infTgt;
+  if(chosen.length>1) infTgt=chosen.reduce((s,a)=>s+(T.infTgts[a.uid]||20000),0);
+  else if(chosen.length===1) infTgt=T.infTgts[chosen[0].uid]||20000;
+  else infTgt=20000;
+
+  if(_wbChartMode==='apps'){
+    document.getElementById('wb-chart-label').textContent='APPLICATIONS $';
+    document.getElementById('wb-chart-sub').textContent='cumulative application commission';
+    document.getElementById('wb-chart-total').textContent=fmtMoney(totApps);
+    buildLine('wb-chart-canvas',cumApps,ps.name,fmtMoney,null,false,T.aLineColor);
+  } else {
+    document.getElementById('wb-chart-label').textContent='INFORCE $';
+    document.getElementById('wb-chart-sub').textContent='cumulative inforce commission';
+    document.getElementById('wb-chart-total').textContent=fmtMoney(totInf);
+    buildLine('wb-chart-canvas',cumInf,ps.name,fmtMoney,infTgt,T.showInfTgt,T.infLineColor,T.infTgtColor);
+  }
+}
+
+// ── Workbench metric widgets ──
+function getAllWbLeads(){
+  let allLeads=[];
+  selectedAdvisers.forEach(uid=>{
+    const leads=assignedDetails[uid]||[];
+    allLeads=allLeads.concat(leads.map(l=>({...l,_uid:uid})));
+  });
+  return allLeads;
+}
+
+const AVATAR_COLORS=['#6366F1','#8B5CF6','#EC4899','#F97316','#14B8A6','#3B82F6','#EF4444','#10B981','#F59E0B','#6D28D9'];
+function leadAvatarColor(name){return AVATAR_COLORS[Math.abs([...name].reduce((a,c)=>a+c.charCodeAt(0),0))%AVATAR_COLORS.length];}
+function leadInitials(name){const p=(name||'?').split(/\s+/);return p.length>=2?(p[0][0]+p[p.length-1][0]).toUpperCase():(p[0]||'?').slice(0,2).toUpperCase();}
+function timeAgo(isoStr){
+  if(!isoStr) return '';
+  const d=new Date(isoStr),now=new Date(),ms=now-d;
+  if(ms<0) return 'just now';
+  const mins=Math.floor(ms/60000);
+  if(mins<1) return 'just now';
+  if(mins<60) return mins+'m ago';
+  const hrs=Math.floor(mins/60);
+  if(hrs<24) return hrs+'h ago';
+  const days=Math.floor(hrs/24);
+  return days+'d ago';
+}
+
+/* Stage dropdown stays enabled — uses working_stage which tracks
+   the last meaningful stage a lead reached before closing. */
+
+function computeWbMetrics(){
+  const allLeads=getAllWbLeads();
+  const el=id=>document.getElementById(id);
+  if(!el('wb-count-not-contacted')) return;
+  el('wb-count-not-contacted').textContent=allLeads.filter(l=>l.status===0).length;
+  el('wb-count-contacted').textContent=allLeads.filter(l=>l.status===1).length;
+  el('wb-count-quoted').textContent=allLeads.filter(l=>l.status===3).length;
+  el('wb-count-submitted').textContent=allLeads.filter(l=>l.status===4).length;
+
+  // New Leads & Stale Leads — thresholds + stage + open/closed filters
+  /* Open/closed now uses is_closed flag from close/open actions */
+  const now=new Date();
+  const toMs=(val,unit)=>{const v=parseInt(val)||1;return unit==='min'?v*60000:unit==='hrs'?v*3600000:v*86400000;};
+  const newMs=toMs(el('wb-new-val')?.value,el('wb-new-unit')?.value||'min');
+  const negMs=toMs(el('wb-neglected-val')?.value,el('wb-neglected-unit')?.value||'hrs');
+  const newStage=el('wb-new-stage')?.value||'all';
+  const staleStage=el('wb-stale-stage')?.value||'all';
+  const newOpen=el('wb-new-open')?.value||'open';
+  const staleOpen=el('wb-stale-open')?.value||'open';
+  const openFilter=(leads,mode)=>{
+    if(mode==='open')   return leads.filter(l=>!l.is_closed);
+    if(mode==='closed') return leads.filter(l=>l.is_closed);
+    return leads;
+  };
+  const stageFilter=(leads,stage)=>stage==='all'?leads:leads.filter(l=>(l.working_stage??l.status)===parseInt(stage));
+
+  const freshPool=stageFilter(openFilter(allLeads,newOpen),newStage);
+  const newLeads=freshPool.filter(l=>{
+    if(!l.assigned_at) return false;
+    return (now-new Date(l.assigned_at))<newMs;
+  }).sort((a,b)=>new Date(b.assigned_at)-new Date(a.assigned_at));
+
+  const stalePool=stageFilter(openFilter(allLeads,staleOpen),staleStage);
+  const staleLeads=stalePool.filter(l=>{
+    if(!l.assigned_at) return false;
+    return (now-new Date(l.assigned_at))>negMs;
+  }).sort((a,b)=>new Date(a.assigned_at)-new Date(b.assigned_at));
+
+  el('wb-new-badge').textContent=newLeads.length;
+  el('wb-neglected-badge').textContent=staleLeads.length;
+  document.getElementById('wb-widget-new')?.classList.toggle('has-leads',newLeads.length>0);
+  document.getElementById('wb-widget-neglected')?.classList.toggle('has-leads',staleLeads.length>0);
+  renderWbListWidget('wb-new-body',newLeads.slice(0,3),'No fresh leads in this period',WB_GREENS);
+  renderWbListWidget('wb-neglected-body',staleLeads.slice(0,3),'No stale leads',WB_REDS);
+}
+
+/* ── Pipeline 2 (full-width clone) ── */
+function computeWbMetricsP2(){
+  const allLeads=getAllWbLeads();
+  const el=id=>document.getElementById(id);
+  if(!el('wb-count-not-contacted-p2')) return;
+  el('wb-count-not-contacted-p2').textContent=allLeads.filter(l=>l.status===0).length;
+  el('wb-count-contacted-p2').textContent=allLeads.filter(l=>l.status===1).length;
+  el('wb-count-quoted-p2').textContent=allLeads.filter(l=>l.status===3).length;
+  el('wb-count-submitted-p2').textContent=allLeads.filter(l=>l.status===4).length;
+
+  const now=new Date();
+  const toMs=(val,unit)=>{const v=parseInt(val)||1;return unit==='min'?v*60000:unit==='hrs'?v*3600000:v*86400000;};
+  const newMs=toMs(el('wb-new-val-p2')?.value,el('wb-new-unit-p2')?.value||'min');
+  const negMs=toMs(el('wb-neglected-val-p2')?.value,el('wb-neglected-unit-p2')?.value||'hrs');
+  const newStage=el('wb-new-stage-p2')?.value||'all';
+  const staleStage=el('wb-stale-stage-p2')?.value||'all';
+  const newOpen=el('wb-new-open-p2')?.value||'open';
+  const staleOpen=el('wb-stale-open-p2')?.value||'open';
+  const openFilter=(leads,mode)=>{
+    if(mode==='open')   return leads.filter(l=>!l.is_closed);
+    if(mode==='closed') return leads.filter(l=>l.is_closed);
+    return leads;
+  };
+  const stageFilter=(leads,stage)=>stage==='all'?leads:leads.filter(l=>(l.working_stage??l.status)===parseInt(stage));
+
+  const freshPool=stageFilter(openFilter(allLeads,newOpen),newStage);
+  const newLeads=freshPool.filter(l=>{
+    if(!l.assigned_at) return false;
+    return (now-new Date(l.assigned_at))<newMs;
+  }).sort((a,b)=>new Date(b.assigned_at)-new Date(a.assigned_at));
+
+  const stalePool=stageFilter(openFilter(allLeads,staleOpen),staleStage);
+  const staleLeads=stalePool.filter(l=>{
+    if(!l.assigned_at) return false;
+    return (now-new Date(l.assigned_at))>negMs;
+  }).sort((a,b)=>new Date(a.assigned_at)-new Date(b.assigned_at));
+
+  el('wb-new-badge-p2').textContent=newLeads.length;
+  el('wb-neglected-badge-p2').textContent=staleLeads.length;
+  document.getElementById('wb-widget-new-p2')?.classList.toggle('has-leads',newLeads.length>0);
+  document.getElementById('wb-widget-neglected-p2')?.classList.toggle('has-leads',staleLeads.length>0);
+  renderWbListWidget('wb-new-body-p2',newLeads.slice(0,3),'No fresh leads in this period',WB_GREENS);
+  renderWbListWidget('wb-neglected-body-p2',staleLeads.slice(0,3),'No stale leads',WB_REDS);
+}
+
+// Gradient avatar palettes: dark → light (Untitled UI green / red)
+const WB_GREENS=['#087443','#12B76A','#47CD89'];
+const WB_REDS=['#912018','#D92D20','#F04438'];
+
+function renderWbListWidget(bodyId,items,emptyMsg,palette){
+  const body=document.getElementById(bodyId);
+  if(!body) return;
+  if(!items.length){body.innerHTML=`<div class="wb-list-empty">${emptyMsg}</div>`;return;}
+  body.innerHTML=items.map((it,i)=>{
+    const name=it.client_name||'Lead #'+it.lead_id;
+    const ini=leadInitials(name);
+    const bg=palette?palette[Math.min(i,palette.length-1)]:leadAvatarColor(name);
+    const advName=advisersById.get(it._uid)?.name||'';
+    const sub=[it.source,advName].filter(Boolean).join(' · ')||'Lead #'+it.lead_id;
+    const ago=timeAgo(it.assigned_at);
+    const url=`${CRM_BASE}/leads/${it.lead_id}/`;
+    return `<a class="wb-list-item" href="${url}" target="_blank" style="--i:${i}">
+      <div class="wb-list-avatar" style="background:${bg}">${ini}</div>
+      <div class="wb-list-info">
+        <div class="wb-list-name">${name}</div>
+        <div class="wb-list-sub">${sub}</div>
+      </div>
+      <div class="wb-list-time">${ago}</div>
+    </a>`;
+  }).join('');
+}
+
+// ── Workbench slider panel ──
+let _wbMetric=null;
+let _wbFilter='all';
+let _wbSortAsc=true;
+let _wbExpandTimers={};
+
+const WB_LABELS={contacted:'Contacted',not_contacted:'Not Contacted',quoted:'Quoted',submitted:'Submitted'};
+
+function getWbLeads(filter){
+  const allLeads=getAllWbLeads();
+  switch(filter){
+    case 'contacted':    return allLeads.filter(l=>l.status===1);
+    case 'not_contacted':return allLeads.filter(l=>l.status===0);
+    case 'quoted':       return allLeads.filter(l=>l.status===3);
+    case 'submitted':    return allLeads.filter(l=>l.status===4);
+    case 'all': default: return [...allLeads];
+  }
+}
+
+function openWbPanel(metric){
+  _wbMetric=metric;
+  _wbFilter=metric;
+  _wbSortAsc=true;
+  document.getElementById('wb-sort-label').textContent='Oldest first';
+  document.getElementById('wb-panel-title').textContent=WB_LABELS[metric]||'All Leads';
+  // Set active filter tab
+  document.querySelectorAll('.wb-filter-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.wbf===metric);
+  });
+  updateWbFilterCounts();
+  updateWbPanel();
+  document.getElementById('wb-backdrop').classList.add('open');
+  document.getElementById('wb-panel').classList.add('open');
+  document.body.style.overflow='hidden';
+}
+
+function switchWbFilter(filter){
+  _wbFilter=filter;
+  document.querySelectorAll('.wb-filter-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.wbf===filter);
+  });
+  document.getElementById('wb-panel-title').textContent=
+    filter==='all'?'All Leads':(WB_LABELS[filter]||'Leads');
+  updateWbPanel();
+}
+
+function updateWbFilterCounts(){
+  const all=getAllWbLeads();
+  const el=id=>document.getElementById(id);
+  if(el('wbf-cnt-all')) el('wbf-cnt-all').textContent=all.length;
+  if(el('wbf-cnt-contacted')) el('wbf-cnt-contacted').textContent=all.filter(l=>l.status===1).length;
+  if(el('wbf-cnt-not_contacted')) el('wbf-cnt-not_contacted').textContent=all.filter(l=>l.status===0).length;
+  if(el('wbf-cnt-quoted')) el('wbf-cnt-quoted').textContent=all.filter(l=>l.status===3).length;
+  if(el('wbf-cnt-submitted')) el('wbf-cnt-submitted').textContent=all.filter(l=>l.status===4).length;
+}
+
+function updateWbPanel(){
+  let items=getWbLeads(_wbFilter);
+  items.sort((a,b)=>_wbSortAsc
+    ? a.assigned_date.localeCompare(b.assigned_date)
+    : b.assigned_date.localeCompare(a.assigned_date));
+  document.getElementById('wb-panel-sub').textContent=items.length+' lead'+(items.length!==1?'s':'');
+  renderWbCards(items);
+}
+
+function renderWbCards(items){
+  const body=document.getElementById('wb-panel-body');
+  Object.values(_wbExpandTimers).forEach(clearTimeout);
+  _wbExpandTimers={};
+  if(!items.length){
+    body.innerHTML='<div class="remed-empty">No leads found for this category.</div>';
+    return;
+  }
+  body.innerHTML=items.map((it,idx)=>{
+    const stLbl=LEAD_STATUS[it.status]||'Unknown';
+    const stCls=LEAD_STATUS_CLS[it.status]||'';
+    const clientName=it.client_name||'Client #'+it.lead_id;
+    const beaconCls=remedAgeBeacon(it.assigned_date);
+    const advName=advisersById.get(it._uid)?.name||'';
+    const src=it.source||'';
+    const url=`${CRM_BASE}/leads/${it.lead_id}/`;
+    return `<a class="remed-card" href="${url}" target="_blank">
+      <div class="remed-card-top">
+        <div class="remed-card-client">${clientName}</div>
+        <div class="remed-card-date-wrap">
+          <span class="${beaconCls}"></span>
+          <span class="remed-card-date">${it.assigned_date}</span>
+        </div>
+      </div>
+      <div class="remed-card-field">
+        <div class="remed-card-label">Status</div>
+        <div class="remed-card-value"><span class="remed-status ${stCls}">${stLbl}</span></div>
+      </div>
+      ${advName?`<div class="remed-card-field">
+        <div class="remed-card-label">Adviser</div>
+        <div class="remed-card-value">${advName}</div>
+      </div>`:''}
+      ${src?`<div class="remed-card-field">
+        <div class="remed-card-label">Source</div>
+        <div class="remed-card-value">${src}</div>
+      </div>`:''}
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-wbidx="u${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last user generated note
+        </button>
+        <div class="remed-accordion-body" id="wb-note-u${idx}">
+          <div class="remed-accordion-text">${it.user_note||'No information provided'}</div>
+        </div>
+      </div>
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-wbidx="s${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last system generated note
+        </button>
+        <div class="remed-accordion-body" id="wb-note-s${idx}">
+          <div class="remed-accordion-text">${it.system_note||'No information provided'}</div>
+        </div>
+      </div>
+    </a>`;
+  }).join('');
+}
+
+document.addEventListener('click',function(e){
+  const btn=e.target.closest('[data-wbidx]');
+  if(!btn||!btn.classList.contains('remed-accordion-btn')) return;
+  e.preventDefault();e.stopPropagation();
+  const idx=btn.dataset.wbidx;
+  const body=document.getElementById('wb-note-'+idx);
+  if(!body) return;
+  const isOpen=btn.classList.toggle('open');
+  body.classList.toggle('open',isOpen);
+  if(_wbExpandTimers[idx]){clearTimeout(_wbExpandTimers[idx]);delete _wbExpandTimers[idx];}
+  if(isOpen){
+    _wbExpandTimers[idx]=setTimeout(()=>{
+      btn.classList.remove('open');body.classList.remove('open');
+      delete _wbExpandTimers[idx];
+    },20000);
+  }
+});
+
+function toggleWbSort(){
+  _wbSortAsc=!_wbSortAsc;
+  document.getElementById('wb-sort-label').textContent=_wbSortAsc?'Oldest first':'Newest first';
+  updateWbPanel();
+}
+
+function closeWbPanel(){
+  document.getElementById('wb-backdrop').classList.remove('open');
+  document.getElementById('wb-panel').classList.remove('open');
+  document.body.style.overflow='';
+  Object.values(_wbExpandTimers).forEach(clearTimeout);
+  _wbExpandTimers={};
+}
+
+// Hide loading overlay — always remove on load regardless of errors
+function hideLoading(){ const o=document.getElementById('loading-overlay'); if(o) o.classList.remove('active'); }
+window.addEventListener('load', hideLoading);
+// Fallback: force-hide after 8s in case load event is delayed
+setTimeout(hideLoading, 8000);
+try { rebuildCharts(); } catch(e) {
+  console.error('Chart build error:', e);
+  hideLoading();
+}
+
+function openTargets(){
+  document.getElementById('t-talk-tgt').value=T.talkTgt;
+  document.getElementById('t-q-tgt').value=T.qTgt;
+  document.getElementById('t-a-tgt').value=T.aTgt;
+  allAdvisers.forEach(a=>{ const el=document.getElementById('t-inf-tgt-'+a.uid); if(el) el.value=T.infTgts[a.uid]||20000; });
+  document.getElementById('t-inf-tgt-show').checked=T.showInfTgt;
+  document.getElementById('inf-tgt-hint').textContent=`Team target = sum of individual targets`;
+  document.getElementById('t-inf-line-color').value=T.infLineColor;
+  document.getElementById('t-inf-tgt-color').value=T.infTgtColor;
+  previewTgtColor('inf-line',T.infLineColor);
+  previewTgtColor('inf-tgt',T.infTgtColor);
+  document.getElementById('thr-on-color').value=T.onColor;
+  document.getElementById('thr-on-enabled').checked=T.onEnabled;
+  document.getElementById('thr-near-color').value=T.nearColor;
+  document.getElementById('thr-near-enabled').checked=T.nearEnabled;
+  document.getElementById('thr-below-color').value=T.belowColor;
+  document.getElementById('thr-below-enabled').checked=T.belowEnabled;
+  document.getElementById('thr-talk-on').value=T.talkOn;
+  document.getElementById('thr-talk-near').value=T.talkNear;
+  document.getElementById('thr-q-on').value=T.qOn;
+  document.getElementById('thr-q-near').value=T.qNear;
+  document.getElementById('thr-a-on').value=T.aOn;
+  document.getElementById('thr-a-near').value=T.aNear;
+  document.getElementById('thr-inf-on').value=T.infOn;
+  document.getElementById('thr-inf-near').value=T.infNear;
+  document.getElementById('thr-talk-below').value=T.talkBelow;
+  document.getElementById('thr-q-below').value=T.qBelow;
+  document.getElementById('thr-a-below').value=T.aBelow;
+  document.getElementById('thr-inf-below').value=T.infBelow;
+  ['on','near','below'].forEach(k=>previewColor(k,T[k+'Color']));
+  document.getElementById('targets-modal').classList.add('open');
+}
+function closeTargets(){document.getElementById('targets-modal').classList.remove('open');}
+function closeTargetsOutside(e){if(e.target===document.getElementById('targets-modal'))closeTargets();}
+
+// ── Remediation slide-in panel ──
+const REMED_STATUS={0:'Pending',1:'In Progress',2:'Resolved'};
+const REMED_CLS={0:'remed-status-pending',1:'remed-status-inprogress',2:'remed-status-resolved'};
+let _remedUid=null;
+let _remedTab='pending';
+let _remedSortAsc=true;  // true=oldest first, false=newest first
+let _remedFilter='';     // task_name filter
+let _remedExpandTimers={};
+
+function remedAgeBeacon(dateStr){
+  const created=new Date(dateStr+'T00:00:00');
+  const now=new Date();
+  const diffDays=Math.floor((now-created)/(1000*60*60*24));
+  if(diffDays>=7) return 'beacon beacon-red';
+  if(diffDays>=2) return 'beacon beacon-yellow';
+  return 'beacon beacon-green';
+}
+
+function getFilteredItems(){
+  const allItems=remedDetails[_remedUid]||[];
+  let items=_remedTab==='pending'
+    ? allItems.filter(it=>it.status===0||it.status===1)
+    : allItems.filter(it=>it.status===2);
+  if(_remedFilter) items=items.filter(it=>it.task_name===_remedFilter);
+  items.sort((a,b)=>_remedSortAsc
+    ? a.created_date.localeCompare(b.created_date)
+    : b.created_date.localeCompare(a.created_date));
+  return items;
+}
+
+function renderRemedCards(items){
+  const body=document.getElementById('remed-panel-body');
+  // Clear any pending expand timers
+  Object.values(_remedExpandTimers).forEach(clearTimeout);
+  _remedExpandTimers={};
+  if(!items.length){
+    const msg=_remedTab==='pending'?'No pending remediations in this period.':'No resolved remediations in this period.';
+    body.innerHTML=`<div class="remed-empty">${msg}</div>`;
+    return;
+  }
+  body.innerHTML=items.map((it,idx)=>{
+    const stLbl=REMED_STATUS[it.status]||'Unknown';
+    const stCls=REMED_CLS[it.status]||'';
+    const clientName=it.client_name||'Client #'+it.lead_id;
+    const beaconCls=remedAgeBeacon(it.created_date);
+    const userNote=it.description||'';
+    const sysNote=it.last_note||'';
+    const url=`${CRM_BASE}/leads/${it.lead_id}/`;
+    return `<a class="remed-card" href="${url}" target="_blank">
+      <div class="remed-card-top">
+        <div class="remed-card-client">${clientName}</div>
+        <div class="remed-card-date-wrap">
+          <span class="${beaconCls}"></span>
+          <span class="remed-card-date">${it.created_date}</span>
+        </div>
+      </div>
+      <div class="remed-card-field">
+        <div class="remed-card-label">Status</div>
+        <div class="remed-card-value"><span class="remed-status ${stCls}">${stLbl}</span></div>
+      </div>
+      <div class="remed-card-field">
+        <div class="remed-card-label">Task</div>
+        <div class="remed-card-value">${it.task_name}</div>
+      </div>
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-idx="u${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last user generated note
+        </button>
+        <div class="remed-accordion-body" id="remed-note-u${idx}">
+          <div class="remed-accordion-text">${userNote||'No information provided'}</div>
+        </div>
+      </div>
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-idx="s${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last system generated note
+        </button>
+        <div class="remed-accordion-body" id="remed-note-s${idx}">
+          <div class="remed-accordion-text">${sysNote||'No information provided'}</div>
+        </div>
+      </div>
+    </a>`;
+  }).join('');
+}
+
+function toggleRemedAccordion(e){
+  const btn=e.target.closest('.remed-accordion-btn');
+  if(!btn) return;
+  e.preventDefault();e.stopPropagation();
+  const idx=btn.dataset.idx;
+  const body=document.getElementById('remed-note-'+idx);
+  if(!body) return;
+  const isOpen=btn.classList.toggle('open');
+  body.classList.toggle('open',isOpen);
+  // Clear existing timer
+  if(_remedExpandTimers[idx]){clearTimeout(_remedExpandTimers[idx]);delete _remedExpandTimers[idx];}
+  if(isOpen){
+    _remedExpandTimers[idx]=setTimeout(()=>{
+      btn.classList.remove('open');
+      body.classList.remove('open');
+      delete _remedExpandTimers[idx];
+    },20000);
+  }
+}
+document.addEventListener('click',toggleRemedAccordion);
+
+function populateRemedFilter(){
+  const allItems=remedDetails[_remedUid]||[];
+  const tabItems=_remedTab==='pending'
+    ? allItems.filter(it=>it.status===0||it.status===1)
+    : allItems.filter(it=>it.status===2);
+  const types=[...new Set(tabItems.map(it=>it.task_name))].sort();
+  const sel=document.getElementById('remed-filter');
+  const prev=sel.value;
+  sel.innerHTML='<option value="">All types</option>'+types.map(t=>`<option value="${t}">${t}</option>`).join('');
+  sel.value=types.includes(prev)?prev:'';
+  _remedFilter=sel.value;
+}
+
+function toggleRemedSort(){
+  _remedSortAsc=!_remedSortAsc;
+  document.getElementById('remed-sort-label').textContent=_remedSortAsc?'Oldest first':'Newest first';
+  updateRemedPanel();
+}
+function applyRemedFilter(){
+  _remedFilter=document.getElementById('remed-filter').value;
+  updateRemedPanel();
+}
+
+function openRemed(uid){
+  _remedUid=uid;
+  _remedTab='pending';
+  _remedSortAsc=true;
+  _remedFilter='';
+  document.getElementById('remed-sort-label').textContent='Oldest first';
+  const advName=advisersById.get(uid)?.name||'Adviser';
+  document.getElementById('remed-panel-title').textContent='Remediations — '+advName;
+  document.querySelectorAll('.remed-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.remedTab==='pending');
+  });
+  populateRemedFilter();
+  updateRemedPanel();
+  document.getElementById('remed-backdrop').classList.add('open');
+  document.getElementById('remed-panel').classList.add('open');
+  document.body.style.overflow='hidden';
+}
+
+function updateRemedPanel(){
+  const allItems=remedDetails[_remedUid]||[];
+  const pending=allItems.filter(it=>it.status===0||it.status===1);
+  const resolved=allItems.filter(it=>it.status===2);
+  document.getElementById('remed-cnt-pending').textContent=pending.length;
+  document.getElementById('remed-cnt-resolved').textContent=resolved.length;
+  const items=getFilteredItems();
+  document.getElementById('remed-panel-sub').textContent=items.length+' item'+(items.length!==1?'s':'');
+  renderRemedCards(items);
+}
+
+function switchRemedTab(tab){
+  _remedTab=tab;
+  _remedFilter='';
+  document.querySelectorAll('.remed-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.remedTab===tab);
+  });
+  populateRemedFilter();
+  updateRemedPanel();
+  document.getElementById('remed-panel-body').scrollTop=0;
+}
+
+function closeRemed(){
+  document.getElementById('remed-backdrop').classList.remove('open');
+  document.getElementById('remed-panel').classList.remove('open');
+  document.body.style.overflow='';
+  Object.values(_remedExpandTimers).forEach(clearTimeout);
+  _remedExpandTimers={};
+}
+document.addEventListener('click',function(e){
+  const link=e.target.closest('.remed-pending-link');
+  if(link){e.preventDefault();ensureRemediations().then(()=>openRemed(parseInt(link.dataset.uid)));}
+});
+
+// ── Assigned Leads slide-in panel ──
+const LEAD_STATUS_CLS={0:'lead-status-prospect',1:'lead-status-contacted',2:'lead-status-booked',3:'lead-status-quoted',4:'lead-status-applied',5:'lead-status-won',6:'lead-status-lost'};
+const LEAD_ACTIVE=new Set([0,1,2,3,4]);
+const LEAD_CLOSED=new Set([5,6]);
+let _assignedUid=null;
+let _assignedTab='active';
+let _assignedSortAsc=true;
+let _assignedFilter='';
+let _assignedExpandTimers={};
+
+function getFilteredAssigned(){
+  const allItems=assignedDetails[_assignedUid]||[];
+  const tabSet=_assignedTab==='active'?LEAD_ACTIVE:LEAD_CLOSED;
+  let items=allItems.filter(it=>tabSet.has(it.status));
+  if(_assignedFilter) items=items.filter(it=>String(it.status)===_assignedFilter);
+  items.sort((a,b)=>_assignedSortAsc
+    ? a.assigned_date.localeCompare(b.assigned_date)
+    : b.assigned_date.localeCompare(a.assigned_date));
+  return items;
+}
+
+function renderAssignedCards(items){
+  const body=document.getElementById('assigned-panel-body');
+  Object.values(_assignedExpandTimers).forEach(clearTimeout);
+  _assignedExpandTimers={};
+  if(!items.length){
+    const msg=_assignedTab==='active'?'No active leads in this period.':'No closed leads in this period.';
+    body.innerHTML=`<div class="remed-empty">${msg}</div>`;
+    return;
+  }
+  body.innerHTML=items.map((it,idx)=>{
+    const stLbl=LEAD_STATUS[it.status]||'Unknown';
+    const stCls=LEAD_STATUS_CLS[it.status]||'';
+    const clientName=it.client_name||'Client #'+it.lead_id;
+    const beaconCls=remedAgeBeacon(it.assigned_date);
+    const userNote=it.user_note||'';
+    const sysNote=it.system_note||'';
+    const src=it.source||'';
+    const url=`${CRM_BASE}/leads/${it.lead_id}/`;
+    return `<a class="remed-card" href="${url}" target="_blank">
+      <div class="remed-card-top">
+        <div class="remed-card-client">${clientName}</div>
+        <div class="remed-card-date-wrap">
+          <span class="${beaconCls}"></span>
+          <span class="remed-card-date">${it.assigned_date}</span>
+        </div>
+      </div>
+      <div class="remed-card-field">
+        <div class="remed-card-label">Status</div>
+        <div class="remed-card-value"><span class="remed-status ${stCls}">${stLbl}</span></div>
+      </div>
+      ${src?`<div class="remed-card-field">
+        <div class="remed-card-label">Source</div>
+        <div class="remed-card-value">${src}</div>
+      </div>`:''}
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-aidx="u${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last user generated note
+        </button>
+        <div class="remed-accordion-body" id="assigned-note-u${idx}">
+          <div class="remed-accordion-text">${userNote||'No information provided'}</div>
+        </div>
+      </div>
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-aidx="s${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last system generated note
+        </button>
+        <div class="remed-accordion-body" id="assigned-note-s${idx}">
+          <div class="remed-accordion-text">${sysNote||'No information provided'}</div>
+        </div>
+      </div>
+    </a>`;
+  }).join('');
+}
+
+function toggleAssignedAccordion(e){
+  const btn=e.target.closest('[data-aidx]');
+  if(!btn||!btn.classList.contains('remed-accordion-btn')) return;
+  e.preventDefault();e.stopPropagation();
+  const idx=btn.dataset.aidx;
+  const body=document.getElementById('assigned-note-'+idx);
+  if(!body) return;
+  const isOpen=btn.classList.toggle('open');
+  body.classList.toggle('open',isOpen);
+  if(_assignedExpandTimers[idx]){clearTimeout(_assignedExpandTimers[idx]);delete _assignedExpandTimers[idx];}
+  if(isOpen){
+    _assignedExpandTimers[idx]=setTimeout(()=>{
+      btn.classList.remove('open');
+      body.classList.remove('open');
+      delete _assignedExpandTimers[idx];
+    },20000);
+  }
+}
+document.addEventListener('click',toggleAssignedAccordion);
+
+function populateAssignedFilter(){
+  const allItems=assignedDetails[_assignedUid]||[];
+  const tabSet=_assignedTab==='active'?LEAD_ACTIVE:LEAD_CLOSED;
+  const tabItems=allItems.filter(it=>tabSet.has(it.status));
+  const statuses=[...new Set(tabItems.map(it=>it.status))].sort();
+  const sel=document.getElementById('assigned-filter');
+  const prev=sel.value;
+  sel.innerHTML='<option value="">All statuses</option>'+statuses.map(s=>`<option value="${s}">${LEAD_STATUS[s]||'Unknown'}</option>`).join('');
+  sel.value=statuses.map(String).includes(prev)?prev:'';
+  _assignedFilter=sel.value;
+}
+
+function toggleAssignedSort(){
+  _assignedSortAsc=!_assignedSortAsc;
+  document.getElementById('assigned-sort-label').textContent=_assignedSortAsc?'Oldest first':'Newest first';
+  updateAssignedPanel();
+}
+function applyAssignedFilter(){
+  _assignedFilter=document.getElementById('assigned-filter').value;
+  updateAssignedPanel();
+}
+
+function openAssigned(uid){
+  _assignedUid=uid;
+  _assignedTab='active';
+  _assignedSortAsc=true;
+  _assignedFilter='';
+  document.getElementById('assigned-sort-label').textContent='Oldest first';
+  const advName=advisersById.get(uid)?.name||'Adviser';
+  document.getElementById('assigned-panel-title').textContent='Assigned Leads — '+advName;
+  document.querySelectorAll('#assigned-panel .remed-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.assignedTab==='active');
+  });
+  populateAssignedFilter();
+  updateAssignedPanel();
+  document.getElementById('assigned-backdrop').classList.add('open');
+  document.getElementById('assigned-panel').classList.add('open');
+  document.body.style.overflow='hidden';
+}
+
+function updateAssignedPanel(){
+  const allItems=assignedDetails[_assignedUid]||[];
+  const active=allItems.filter(it=>LEAD_ACTIVE.has(it.status));
+  const closed=allItems.filter(it=>LEAD_CLOSED.has(it.status));
+  document.getElementById('assigned-cnt-active').textContent=active.length;
+  document.getElementById('assigned-cnt-closed').textContent=closed.length;
+  const items=getFilteredAssigned();
+  document.getElementById('assigned-panel-sub').textContent=items.length+' lead'+(items.length!==1?'s':'');
+  renderAssignedCards(items);
+}
+
+function switchAssignedTab(tab){
+  _assignedTab=tab;
+  _assignedFilter='';
+  document.querySelectorAll('#assigned-panel .remed-tab').forEach(t=>{
+    t.classList.toggle('active',t.dataset.assignedTab===tab);
+  });
+  populateAssignedFilter();
+  updateAssignedPanel();
+  document.getElementById('assigned-panel-body').scrollTop=0;
+}
+
+function closeAssigned(){
+  document.getElementById('assigned-backdrop').classList.remove('open');
+  document.getElementById('assigned-panel').classList.remove('open');
+  document.body.style.overflow='';
+  Object.values(_assignedExpandTimers).forEach(clearTimeout);
+  _assignedExpandTimers={};
+}
+document.addEventListener('click',function(e){
+  const link=e.target.closest('.assigned-link');
+  if(link){e.preventDefault();ensureLeadDetails().then(()=>openAssigned(parseInt(link.dataset.uid)));}
+});
+
+// ── Unassigned Leads badge beacon ──
+function updateUnassignedBadge(){
+  const cnt=unassignedLeads.length;
+  const lbl=document.getElementById('unassigned-label');
+  if(lbl) lbl.textContent='Unassigned: '+cnt;
+  const el=document.getElementById('beacon-unassigned');
+  if(el) el.className='beacon '+(cnt>0?'beacon-red':'beacon-green');
+}
+
+// ── Unassigned Leads slide-in panel ──
+let _unassignedSortAsc=true;
+let _unassignedFilter='';
+let _unassignedExpandTimers={};
+
+function getFilteredUnassigned(){
+  let items=[...unassignedLeads];
+  if(_unassignedFilter) items=items.filter(it=>String(it.status)===_unassignedFilter);
+  items.sort((a,b)=>_unassignedSortAsc
+    ? a.assigned_date.localeCompare(b.assigned_date)
+    : b.assigned_date.localeCompare(a.assigned_date));
+  return items;
+}
+
+function renderUnassignedCards(items){
+  const body=document.getElementById('unassigned-panel-body');
+  Object.values(_unassignedExpandTimers).forEach(clearTimeout);
+  _unassignedExpandTimers={};
+  if(!items.length){
+    body.innerHTML='<div class="remed-empty">No unassigned leads found.</div>';
+    return;
+  }
+  body.innerHTML=items.map((it,idx)=>{
+    const stLbl=LEAD_STATUS[it.status]||'Unknown';
+    const stCls=LEAD_STATUS_CLS[it.status]||'';
+    const clientName=it.client_name||'Client #'+it.lead_id;
+    const beaconCls=remedAgeBeacon(it.assigned_date);
+    const url=`${CRM_BASE}/leads/${it.lead_id}/`;
+    const userNote=it.user_note||'';
+    const sysNote=it.system_note||'';
+    return `<a class="remed-card" href="${url}" target="_blank">
+      <div class="remed-card-top">
+        <div class="remed-card-client">${clientName}</div>
+        <div class="remed-card-date-wrap">
+          <span class="${beaconCls}"></span>
+          <span class="remed-card-date">${it.assigned_date}</span>
+        </div>
+      </div>
+      <div class="remed-card-field">
+        <div class="remed-card-label">Status</div>
+        <div class="remed-card-value"><span class="remed-status ${stCls}">${stLbl}</span></div>
+      </div>
+      ${it.source?`<div class="remed-card-field">
+        <div class="remed-card-label">Source</div>
+        <div class="remed-card-value">${it.source}</div>
+      </div>`:''}
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-uidx="u${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last user generated note
+        </button>
+        <div class="remed-accordion-body" id="unassigned-note-u${idx}">
+          <div class="remed-accordion-text">${userNote||'No information provided'}</div>
+        </div>
+      </div>
+      <div class="remed-accordion">
+        <button class="remed-accordion-btn" data-uidx="s${idx}">
+          <svg viewBox="0 0 16 16" fill="none"><path d="M4 6l4 4 4-4" stroke="currentColor" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round"/></svg>
+          Last system generated note
+        </button>
+        <div class="remed-accordion-body" id="unassigned-note-s${idx}">
+          <div class="remed-accordion-text">${sysNote||'No information provided'}</div>
+        </div>
+      </div>
+    </a>`;
+  }).join('');
+}
+
+function toggleUnassignedAccordion(e){
+  const btn=e.target.closest('[data-uidx]');
+  if(!btn||!btn.classList.contains('remed-accordion-btn')) return;
+  e.preventDefault();e.stopPropagation();
+  const idx=btn.dataset.uidx;
+  const body=document.getElementById('unassigned-note-'+idx);
+  if(!body) return;
+  const isOpen=btn.classList.toggle('open');
+  body.classList.toggle('open',isOpen);
+  if(_unassignedExpandTimers[idx]){clearTimeout(_unassignedExpandTimers[idx]);delete _unassignedExpandTimers[idx];}
+  if(isOpen){
+    _unassignedExpandTimers[idx]=setTimeout(()=>{
+      btn.classList.remove('open');body.classList.remove('open');
+      delete _unassignedExpandTimers[idx];
+    },20000);
+  }
+}
+document.addEventListener('click',toggleUnassignedAccordion);
+
+function populateUnassignedFilter(){
+  const statuses=[...new Set(unassignedLeads.map(it=>it.status))].sort();
+  const sel=document.getElementById('unassigned-filter');
+  const prev=sel.value;
+  sel.innerHTML='<option value="">All statuses</option>'+statuses.map(s=>`<option value="${s}">${LEAD_STATUS[s]||'Unknown'}</option>`).join('');
+  sel.value=statuses.map(String).includes(prev)?prev:'';
+  _unassignedFilter=sel.value;
+}
+
+function toggleUnassignedSort(){
+  _unassignedSortAsc=!_unassignedSortAsc;
+  document.getElementById('unassigned-sort-label').textContent=_unassignedSortAsc?'Oldest first':'Newest first';
+  updateUnassignedPanel();
+}
+function applyUnassignedFilter(){
+  _unassignedFilter=document.getElementById('unassigned-filter').value;
+  updateUnassignedPanel();
+}
+
+function openUnassigned(){
+  ensureUnassigned().then(_openUnassignedPanel);
+}
+function _openUnassignedPanel(){
+  _unassignedSortAsc=true;
+  _unassignedFilter='';
+  document.getElementById('unassigned-sort-label').textContent='Oldest first';
+  populateUnassignedFilter();
+  updateUnassignedPanel();
+  document.getElementById('unassigned-backdrop').classList.add('open');
+  document.getElementById('unassigned-panel').classList.add('open');
+  document.body.style.overflow='hidden';
+}
+
+function updateUnassignedPanel(){
+  const items=getFilteredUnassigned();
+  document.getElementById('unassigned-panel-sub').textContent=items.length+' lead'+(items.length!==1?'s':'')+' not assigned to a consultant';
+  renderUnassignedCards(items);
+}
+
+function closeUnassigned(){
+  document.getElementById('unassigned-backdrop').classList.remove('open');
+  document.getElementById('unassigned-panel').classList.remove('open');
+  document.body.style.overflow='';
+  Object.values(_unassignedExpandTimers).forEach(clearTimeout);
+  _unassignedExpandTimers={};
+}
+
+// ── Pipeline Tiles ──
+const STAGE_LABELS={'not_contacted':'Not Contacted','contacted':'Contacted','quoted':'Quoted','submitted':'Submitted'};
+const STAGE_STATUS_CLS={'not_contacted':'lead-status-prospect','contacted':'lead-status-contacted','quoted':'lead-status-quoted','submitted':'lead-status-applied'};
+
+// Compute tile counts (team totals across all advisers)
+function computeTileCounts(){
+  const counts={not_contacted:0,contacted:0,quoted:0,submitted:0};
+  for(const uid in pipelineTiles){
+    const t=pipelineTiles[uid];
+    for(const stage in counts){
+      counts[stage]+=(t[stage]||[]).length;
+    }
+  }
+  return counts;
+}
+
+function initTiles(){
+  const counts=computeTileCounts();
+  for(const stage in counts){
+    const el=document.getElementById('tile-'+stage.replace('_','-'));
+    if(el) el.textContent=counts[stage];
+  }
+}
+
+// ── Pipeline tile → lead table filter ──
+function filterLeadTable(stage){
+  if(_wbLtPipelineStage===stage){
+    _wbLtPipelineStage=null;
+    _wbLtPipelineFilter=null;
+    document.querySelectorAll('.pipeline-tile').forEach(t=>t.classList.remove('active'));
+  } else {
+    _wbLtPipelineStage=stage;
+    const ids=new Set();
+    for(const uid in pipelineTiles){
+      (pipelineTiles[uid][stage]||[]).forEach(l=>ids.add(l.lead_id));
+    }
+    _wbLtPipelineFilter=ids;
+    document.querySelectorAll('.pipeline-tile').forEach(t=>t.classList.remove('active'));
+    const cls='.tile-'+stage.replace('_','-');
+    document.querySelector(cls)?.classList.add('active');
+  }
+  document.getElementById('wb-lt-status').value='all';
+  wbLtRender();
+  document.getElementById('wb-w-lead-table')?.scrollIntoView({behavior:'smooth',block:'start'});
+}
+
+// ── Calls Detail slider ──
+function openCallsSlider(leadId, clientName){
+  lazyJSON('/api/calls/'+leadId).then(calls=>_renderCallsSlider(calls, clientName));
+}
+function _renderCallsSlider(calls, clientName){
+  document.getElementById('calls-panel-title').textContent='Calls — '+clientName;
+  document.getElementById('calls-panel-sub').textContent=calls.length+' call'+(calls.length!==1?'s':'');
+  const body=document.getElementById('calls-panel-body');
+  if(!calls.length){
+    body.innerHTML='<div class="remed-empty">No calls found for this lead.</div>';
+  } else {
+    body.innerHTML=calls.map(c=>{
+      const durMins=Math.floor(c.duration_secs/60);
+      const durSecs=Math.round(c.duration_secs%60);
+      const durFmt=durMins>0?`${durMins}m ${durSecs}s`:`${durSecs}s`;
+      const is45=c.duration_secs>=45;
+      const url=`${CRM_BASE}/leads/${c.lead_id}/`;
+      return `<a class="remed-card" href="${url}" target="_blank" style="text-decoration:none;color:inherit">
+        <div class="remed-card-top">
+          <div class="remed-card-client" style="font-size:13px">${c.call_time||'Unknown time'}</div>
+          <div class="remed-card-date-wrap">
+            <span class="beacon ${is45?'beacon-green':'beacon-red'}"></span>
+            <span class="remed-card-date">${durFmt}</span>
+          </div>
+        </div>
+        <div class="remed-card-field">
+          <div class="remed-card-label">Duration</div>
+          <div class="remed-card-value">${durFmt} ${is45?'<span style="color:#059669;font-size:11px;font-weight:600">(45s+)</span>':'<span style="color:#dc2626;font-size:11px;font-weight:600">(&lt;45s)</span>'}</div>
+        </div>
+      </a>`;
+    }).join('');
+  }
+  document.getElementById('calls-backdrop').classList.add('open');
+  document.getElementById('calls-panel').classList.add('open');
+  document.body.style.overflow='hidden';
+}
+
+function closeCallsSlider(){
+  document.getElementById('calls-backdrop').classList.remove('open');
+  document.getElementById('calls-panel').classList.remove('open');
+  document.body.style.overflow='';
+}
+
+// Delegate click on calls links (lead table + anywhere)
+document.addEventListener('click',function(e){
+  const link=e.target.closest('.wb-calls-link');
+  if(link){
+    e.preventDefault();
+    e.stopPropagation();
+    openCallsSlider(parseInt(link.dataset.leadId), link.dataset.client||'');
+  }
+});
+
+function resetTargets(){
+  T={...DEFAULTS};
+  fetch('/api/settings',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({})});
+  closeTargets();rebuildCharts();
+}
+function previewColor(key,hex){
+  const prev=document.getElementById(key+'-color-preview');
+  const hexEl=document.getElementById(key+'-color-hex');
+  if(prev)prev.style.background=hex;if(hexEl)hexEl.textContent=hex.toUpperCase();
+}
+function previewTgtColor(key,hex){
+  const prev=document.getElementById(key+'-color-preview');
+  if(prev)prev.style.background=hex;
+}
+function g(id){return document.getElementById(id);}
+function fv(id,def){return parseFloat(g(id).value)||def;}
+function bv(id){return g(id).checked;}
+
+function saveTargets(){
+  T={
+    talkTgt:fv('t-talk-tgt',150),
+    qTgt:fv('t-q-tgt',6),
+    aTgt:fv('t-a-tgt',2),
+    infTgts:Object.fromEntries(allAdvisers.map(a=>[a.uid,parseFloat(document.getElementById('t-inf-tgt-'+a.uid)?.value)||20000])),
+    showInfTgt:bv('t-inf-tgt-show'),
+    aLineColor:T.aLineColor||'#7f56d9',
+    infLineColor:g('t-inf-line-color').value,infTgtColor:g('t-inf-tgt-color').value,
+    onColor:g('thr-on-color').value,onEnabled:bv('thr-on-enabled'),
+    nearColor:g('thr-near-color').value,nearEnabled:bv('thr-near-enabled'),
+    belowColor:g('thr-below-color').value,belowEnabled:bv('thr-below-enabled'),
+    talkOn:fv('thr-talk-on',150),talkNear:fv('thr-talk-near',120),talkBelow:fv('thr-talk-below',0),
+    qOn:fv('thr-q-on',6),qNear:fv('thr-q-near',4),qBelow:fv('thr-q-below',0),
+    aOn:fv('thr-a-on',2),aNear:fv('thr-a-near',1),aBelow:fv('thr-a-below',0),
+    infOn:fv('thr-inf-on',20000),infNear:fv('thr-inf-near',15000),infBelow:fv('thr-inf-below',0),
+  };
+  fetch('/api/settings', {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify(T)});
+  closeTargets();rebuildCharts();
+}
+
+// ── Lazy data: initial fetches ──
+ensureUnassigned().then(updateUnassignedBadge).catch(()=>{});
+if(document.getElementById('workbench')?.classList.contains('active')) ensureWorkbenchData();
+
+// ── Live updates ──
+// Only ranges that include today can change.  While the page is visible it
+// listens on /api/stream and re-fetches just the widgets that changed: the
+// tables are swapped for freshly rendered ones from /api/performance and
+// /api/funnel, the charts redrawn from /api/charts, and lazily loaded widgets
+// re-fetched.  Only a chart axis that no longer matches reloads the page.
+(function(){
+  if(!window.EventSource || RANGE_END < TODAY_STR) return;
+  const TABLE_QS='partials=1'+(COMPARE?'&compare=1':'');
+  let version=POLL_VERSION, es=null, retry=null, reloadPending=false;
+
+  function panelOpen(){ return !!document.querySelector('[id$="-panel"].open'); }
+  function reloadShell(){
+    if(panelOpen()){ reloadPending=true; setTimeout(reloadShell, 5000); return; }
+    document.getElementById('filter-form').submit();
+  }
+  function swapTables(html){
+    Object.entries(html).forEach(([slot,markup])=>{
+      const el=document.querySelector('[data-section="'+slot+'"]');
+      if(!el) return;
+      const tpl=document.createElement('template');
+      tpl.innerHTML=markup;
+      el.replaceWith(tpl.content);
+    });
+    filterRows();
+    refreshBadges();
+    highlightTopInforce();
+  }
+  function refreshTables(widget){
+    return fetchJSON('/api/'+widget+'?'+TABLE_QS).then(d=>swapTables(d.html));
+  }
+  function refreshCharts(){
+    return fetchJSON('/api/charts'+(COMPARE?'?compare=1':'')).then(d=>{
+      if(d.chart_mode!==CHART_MODE || d.dates_list.length!==dates.length
+         || d.dates_list.some((x,i)=>x!==dates[i])){ reloadShell(); return; }
+      d.chart_advisers.forEach(a=>{
+        const cur=advisersById.get(a.uid);
+        if(cur) Object.assign(cur,a);
+      });
+      rebuildCharts();
+    });
+  }
+  function refetch(widgets){
+    if(reloadPending) return;
+    const failed=e=>console.error(e);   // the next change tries again
+    if(widgets.includes('performance')) refreshTables('performance').catch(failed);
+    if(widgets.includes('funnel')) refreshTables('funnel').catch(failed);
+    if(widgets.includes('charts')) refreshCharts().catch(failed);
+    if(widgets.includes('unassigned')){
+      delete _lazyCache['/api/unassigned'];
+      ensureUnassigned().then(updateUnassignedBadge).catch(()=>{});
+    }
+    if(widgets.includes('leads')||widgets.includes('pipeline-tiles')){
+      Object.keys(_lazyCache).filter(k=>k==='/api/leads'||k==='/api/pipeline-tiles'||k.startsWith('/api/calls/'))
+        .forEach(k=>delete _lazyCache[k]);
+      if(_wbDataPromise){ _wbDataPromise=null; ensureWorkbenchData(); }
+    }
+  }
+  // The server ends each stream after a short while and the browser
+  // reconnects on its own, resuming from the last event id; only a refused
+  // connection (EventSource closed) is retried here.
+  function connect(){
+    if(es||document.hidden) return;
+    es=new EventSource('/api/stream?since='+version);
+    es.addEventListener('changed',e=>{
+      const d=JSON.parse(e.data);
+      version=d.version;
+      refetch(d.widgets);
+    });
+    es.onerror=()=>{
+      if(es.readyState!==EventSource.CLOSED) return;
+      disconnect(); retry=setTimeout(connect, 5000);
+    };
+  }
+  function disconnect(){
+    clearTimeout(retry);
+    if(es){ es.close(); es=null; }
+  }
+  document.addEventListener('visibilitychange',()=>document.hidden?disconnect():connect());
+  connect();
+})();
@@ -0,0 +1,100 @@
+import os
+import bisect
+import logging
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+log = logging.getLogger("lip_analytics.tzbucket")
+
+# MySQL stores event times as naive UTC; the dashboard reports in local
+# (LOCAL_TZ) days and hours.  Instead of CONVERT_TZ on every row, queries
+# select raw UTC timestamps over UTC bounds computed here, stream them in
+# SCAN_BATCH_ROWS batches and locate each one by bisecting the UTC instants
+# at which local days/hours start — so AEDT/AEST changes land where the
+# zone rules say, not at a fixed offset.
+LOCAL_TZ_NAME   = os.environ.get("LOCAL_TZ", "Australia/Sydney")
+LOCAL_TZ        = ZoneInfo(LOCAL_TZ_NAME)
+SCAN_BATCH_ROWS = int(os.environ.get("SCAN_BATCH_ROWS", 5000))
+
+
+def utc_of(local_dt):
+    """Naive UTC datetime for a naive local wall time.
+
+    Ambiguous times (the repeated hour in autumn) resolve to their first
+    occurrence; skipped ones (spring) are read with the pre-change offset.
+    """
+    return local_dt.replace(tzinfo=LOCAL_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_local(utc_dt):
+    """Naive local wall time for a naive UTC datetime from MySQL."""
+    return utc_dt.replace(tzinfo=timezone.utc).astimezone(LOCAL_TZ).replace(tzinfo=None)
+
+
+def local_day(utc_dt):
+    return to_local(utc_dt).date()
+
+
+def tz_abbr(utc_dt):
+    """Zone abbreviation in force at ``utc_dt`` (AEDT / AEST)."""
+    return utc_dt.replace(tzinfo=timezone.utc).astimezone(LOCAL_TZ).tzname()
+
+
+def local_midnight(day):
+    return utc_of(datetime(day.year, day.month, day.day))
+
+
+def utc_bounds(start, end):
+    """UTC [from, to) covering local days start..end inclusive."""
+    return local_midnight(start), local_midnight(end + timedelta(days=1))
+
+
+class Buckets:
+    """Local "day" or "hour" buckets over local days start..end.
+
+    ``edges`` are the UTC instants at which each bucket starts plus the
+    exclusive end; ``locate`` maps a naive UTC timestamp to its bucket key —
+    the ISO day, or the local hour as an int (the repeated autumn hour is one
+    two-hour bucket, the skipped spring hour has none).
+    """
+
+    def __init__(self, start, end, unit):
+        edges, keys = [], []
+        day = start
+        while day <= end:
+            if unit == "day":
+                points = [(datetime(day.year, day.month, day.day), day.isoformat())]
+            elif unit == "hour":
+                points = [(datetime(day.year, day.month, day.day, h), h) for h in range(24)]
+            else:
+                raise ValueError(f"unknown bucket unit {unit!r}")
+            for local, key in points:
+                edge = utc_of(local)
+                if edges and edge <= edges[-1]:
+                    # Skipped local hour — it starts where the next one does
+                    edges.pop(); keys.pop()
+                edges.append(edge)
+                keys.append(key)
+            day += timedelta(days=1)
+        edges.append(local_midnight(end + timedelta(days=1)))
+        self.edges, self.keys = edges, keys
+        self.bounds = (edges[0], edges[-1])
+
+    def locate(self, utc_dt):
+        """Bucket key of ``utc_dt``, or None outside the range."""
+        i = bisect.bisect_right(self.edges, utc_dt) - 1
+        return self.keys[i] if 0 <= i < len(self.keys) else None
+
+
+def stream(cursor, size=None):
+    """Rows of the executed statement, fetched ``size`` at a time.
+
+    Pool cursors are unbuffered, so a large scan is never materialised as one
+    list — on the client or in the connector.
+    """
+    size = size or SCAN_BATCH_ROWS
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows